@@ -0,0 +1,421 @@
+"""
+Incremental analytics rollups for the visitor interaction log
+
+Instead of re-reading user_interactions.log on every /analytics request, the
+rollups consume only the bytes appended since the last read and keep:
+
+- per-minute, per-hour, per-day and per-month counters (UTC buckets); each
+  granularity but months is pruned past its retention
+- interaction-type totals
+- tallies for the most active visitors, in a Space-Saving summary of at most
+  VISITOR_CAPACITY visitors (see heavy_hitters.py for its error bounds)
+- HyperLogLog sketches of visitor IDs per bucket, for unique visitor counts
+  over any window in bounded memory (see hyperloglog.py for the error rate)
+- the most recent visitor details
+
+Listeners added to `listeners` are called with the details and count deltas
+of entries folded in by a catch-up (not by a rebuild from the start of the
+log), which is how the live dashboard feed hears about new interactions.
+
+State is checkpointed to JSON together with the global log offset it covers
+(see interaction_log.py), so a
+restarted server resumes from the checkpoint instead of re-parsing history.
+Checkpoints are copied under the lock but serialized and written by a
+background thread, so requests never wait on the file.
+Without a checkpoint (or after the log was truncated) the rollups are rebuilt
+from the columnar bulk parser, grouping with NumPy instead of folding in one
+entry at a time.
+"""
+
+import heapq
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from checkpoint_files import write_json_checkpoint
+from heavy_hitters import SpaceSaving
+from hyperloglog import BucketedSketches, standard_error
+from interaction_log import ACTION_USER_STORY, ACTION_SPRINT, EVENT_ACTIONS, interaction_log, load_columns, parse_line
+from tracking_schema import parse_tracking_time
+
+CHECKPOINT_PATH = 'data/analytics_rollups.json'
+
+# Bucket key formats and how long each granularity is kept
+GRANULARITIES = {
+    'minute': ('%Y-%m-%dT%H:%M', timedelta(days=1)),
+    'hour': ('%Y-%m-%dT%H', timedelta(days=31)),
+    'day': ('%Y-%m-%d', timedelta(days=400)),
+    'month': ('%Y-%m', None)
+}
+
+# Unique-visitor sketches are 4 KB each, so fine buckets are only kept while a
+# window can use them: minutes for the 1h window, hours up to MAX_MERGE_BUCKETS
+SKETCH_GRANULARITIES = {
+    'minute': ('%Y-%m-%dT%H:%M', timedelta(hours=2)),
+    'hour': ('%Y-%m-%dT%H', timedelta(days=5)),
+    'day': ('%Y-%m-%d', timedelta(days=120)),
+    'month': ('%Y-%m', None)
+}
+
+# NumPy datetime unit whose ISO form is each granularity's bucket key
+BUCKET_UNITS = {'minute': 'm', 'hour': 'h', 'day': 'D', 'month': 'M'}
+
+# Visitors with tallies; less active ones are evicted by newer visitors
+VISITOR_CAPACITY = 1000
+
+RECENT_DETAILS = 200
+
+WINDOWS = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(days=1),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30)
+}
+
+
+def empty_counts():
+    return {'interactions': 0, 'user_stories': 0, 'sprint_planning': 0}
+
+
+def add_counts(counts, action):
+    counts['interactions'] += 1
+    if action == ACTION_USER_STORY:
+        counts['user_stories'] += 1
+    elif action == ACTION_SPRINT:
+        counts['sprint_planning'] += 1
+
+
+def grouped_counts(groups, size, actions):
+    """empty_counts() for each of size groups, from per-row group indexes and actions"""
+    interactions = np.bincount(groups, minlength=size)
+    stories = np.bincount(groups, weights=actions == ACTION_USER_STORY, minlength=size)
+    sprints = np.bincount(groups, weights=actions == ACTION_SPRINT, minlength=size)
+    return [
+        {'interactions': total, 'user_stories': int(story), 'sprint_planning': int(sprint)}
+        for total, story, sprint in zip(interactions.tolist(), stories.tolist(), sprints.tolist())
+    ]
+
+
+def iso_time(value):
+    """datetime64 UTC value formatted like parse_tracking_time(...).isoformat()"""
+    return value.astype('datetime64[us]').item().replace(tzinfo=timezone.utc).isoformat()
+
+
+def parse_window(window=None, since=None, until=None, now=None):
+    """Resolve window/since/until request values into aware UTC datetimes"""
+    now = now or datetime.now(timezone.utc)
+    if window and window != 'all':
+        if window not in WINDOWS:
+            raise ValueError(f"Unsupported window '{window}'. Use one of: all, {', '.join(WINDOWS)}")
+        return now - WINDOWS[window], None
+    bounds = []
+    for name, value in (('since', since), ('until', until)):
+        parsed = parse_tracking_time(value)
+        if value and parsed is None:
+            raise ValueError(f"Invalid {name} '{value}'. Use an ISO-8601 time")
+        bounds.append(parsed)
+    return tuple(bounds)
+
+
+class AnalyticsRollups:
+    def __init__(self, log=None, checkpoint_path=CHECKPOINT_PATH,
+                 checkpoint_every=50, checkpoint_interval=30):
+        self.log = log or interaction_log
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.lock = threading.Lock()
+        self.listeners = []
+        self.saving = False  # a checkpoint write is in flight
+        self.reset()
+        self.load_checkpoint()
+
+    def reset(self):
+        self.log_offset = 0
+        self.totals = empty_counts()
+        self.buckets = {name: {} for name in GRANULARITIES}
+        self.visitors = SpaceSaving(VISITOR_CAPACITY)
+        self.visitor_details = {}  # per tracked visitor: counts by type, first/last seen
+        self.visitor_sketches = BucketedSketches(SKETCH_GRANULARITIES)
+        self.recent = deque(maxlen=RECENT_DETAILS)
+        self.pending = 0
+        self.last_checkpoint = time.monotonic()
+
+    def load_checkpoint(self):
+        """Restore rollups from the last checkpoint, if there is one"""
+        if not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.log_offset = state['log_offset']
+            self.totals = state['totals']
+            self.buckets = state['buckets']
+            self.visitors = SpaceSaving.from_dict(state['visitors'])
+            self.visitor_details = state['visitor_details']
+            self.visitor_sketches = BucketedSketches.from_dict(SKETCH_GRANULARITIES, state['visitor_sketches'])
+            self.recent = deque(state['recent'], maxlen=RECENT_DETAILS)
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable analytics checkpoint: {e}")
+            self.reset()
+
+    def checkpoint_state(self):
+        """Copy of the state to persist; taken under the lock, serialized outside it"""
+        self.pending = 0
+        self.last_checkpoint = time.monotonic()
+        return {
+            'log_offset': self.log_offset,
+            'totals': dict(self.totals),
+            'buckets': {name: {key: dict(counts) for key, counts in buckets.items()}
+                        for name, buckets in self.buckets.items()},
+            'visitors': self.visitors.to_dict(),
+            'visitor_details': {visitor_id: dict(tally) for visitor_id, tally in self.visitor_details.items()},
+            'visitor_sketches': self.visitor_sketches.copy(),
+            'recent': list(self.recent)
+        }
+
+    def checkpoint(self):
+        """Persist rollups and the log offset they cover"""
+        with self.lock:
+            state = self.checkpoint_state()
+        self.write_checkpoint(state)
+
+    def checkpoint_in_background(self, state):
+        def write():
+            try:
+                self.write_checkpoint(state)
+            except Exception as e:
+                print(f"⚠️  Could not write analytics checkpoint: {e}")
+            finally:
+                with self.lock:
+                    self.saving = False
+
+        threading.Thread(target=write, name='analytics-checkpoint', daemon=True).start()
+
+    def write_checkpoint(self, state):
+        state = dict(state, visitor_sketches=state['visitor_sketches'].to_dict(),
+                     saved_at=datetime.now(timezone.utc).isoformat())
+        write_json_checkpoint(self.checkpoint_path, state)
+
+    def apply(self, entry):
+        """Fold one parsed log entry into the rollups; returns its visitor detail"""
+        occurred = parse_tracking_time(entry['timestamp'])
+        if occurred is None:
+            return None
+        action = entry['action']
+        visitor_id = entry['visitor_id']
+        iso_time = occurred.isoformat()
+
+        add_counts(self.totals, action)
+        for name, (key_format, _) in GRANULARITIES.items():
+            key = occurred.strftime(key_format)
+            counts = self.buckets[name].setdefault(key, empty_counts())
+            add_counts(counts, action)
+
+        evicted = self.visitors.add(visitor_id)
+        if evicted is not None:
+            del self.visitor_details[evicted]
+        visitor = self.visitor_details.setdefault(
+            visitor_id, {'user_stories': 0, 'sprint_planning': 0, 'first_seen': iso_time}
+        )
+        if action == ACTION_USER_STORY:
+            visitor['user_stories'] += 1
+        elif action == ACTION_SPRINT:
+            visitor['sprint_planning'] += 1
+        visitor['last_seen'] = iso_time
+        self.visitor_sketches.add(visitor_id, occurred)
+
+        detail = {'timestamp': entry['timestamp'], 'visitor_id': visitor_id, 'action': action}
+        self.recent.append(detail)
+        self.pending += 1
+        return detail
+
+    def prune(self, now=None):
+        """Drop fine-grained buckets that are past their retention"""
+        now = now or datetime.now(timezone.utc)
+        for name, (key_format, retention) in GRANULARITIES.items():
+            if retention is None:
+                continue
+            cutoff = (now - retention).strftime(key_format)
+            for key in [key for key in self.buckets[name] if key < cutoff]:
+                del self.buckets[name][key]
+        self.visitor_sketches.prune(now)
+
+    def rebuild(self):
+        """Recompute the rollups from the whole log in bulk
+
+        Gives the same state as folding every entry in with apply() and then
+        pruning, but groups parsed columns with NumPy instead.
+        """
+        self.reset()
+        columns = load_columns(self.log)
+        valid = ~np.isnat(columns['timestamp'])
+        times = columns['timestamp'][valid]
+        visitors = columns['visitor'][valid].astype(str)
+        code_actions = np.array([EVENT_ACTIONS[event] for event in columns['event_types']], dtype=object)
+        actions = code_actions[columns['event'][valid]]
+        now = datetime.now(timezone.utc)
+
+        if len(times):
+            self.totals = grouped_counts(np.zeros(len(times), dtype=np.intp), 1, actions)[0]
+
+        visitor_ids, first, visitor_index = np.unique(visitors, return_index=True, return_inverse=True)
+        visitor_index = visitor_index.ravel()
+        last = len(visitors) - 1 - np.unique(visitors[::-1], return_index=True)[1]
+        tallies = grouped_counts(visitor_index, len(visitor_ids), actions)
+        # Exact counts are known here, so the summary keeps the most active visitors with no error
+        order = np.argsort(first, kind='stable').tolist()
+        tracked = set(heapq.nlargest(VISITOR_CAPACITY, order, key=lambda position: tallies[position]['interactions']))
+        counters = []
+        for position in order:
+            visitor_id = str(visitor_ids[position])
+            self.visitor_sketches.total.add(visitor_id)
+            if position not in tracked:
+                continue
+            tally = tallies[position]
+            counters.append([visitor_id, tally['interactions'], 0])
+            self.visitor_details[visitor_id] = {
+                'user_stories': tally['user_stories'],
+                'sprint_planning': tally['sprint_planning'],
+                'first_seen': iso_time(times[first[position]]),
+                'last_seen': iso_time(times[last[position]])
+            }
+        self.visitors = SpaceSaving.from_dict({'capacity': VISITOR_CAPACITY, 'total': len(times), 'counters': counters})
+
+        for name, (key_format, retention) in GRANULARITIES.items():
+            keys, bucket_index = np.unique(times.astype(f"datetime64[{BUCKET_UNITS[name]}]"), return_inverse=True)
+            bucket_index = bucket_index.ravel()
+            keys = [str(key) for key in keys]
+            cutoff = (now - retention).strftime(key_format) if retention else ''
+            for key, counts in zip(keys, grouped_counts(bucket_index, len(keys), actions)):
+                if key >= cutoff:
+                    self.buckets[name][key] = counts
+            sketch_retention = SKETCH_GRANULARITIES[name][1]
+            cutoff = (now - sketch_retention).strftime(key_format) if sketch_retention else ''
+            # A visitor only needs adding to a bucket's sketch once
+            pairs = np.unique(bucket_index.astype(np.int64) * len(visitor_ids) + visitor_index)
+            for bucket, visitor in zip((pairs // len(visitor_ids)).tolist(), (pairs % len(visitor_ids)).tolist()):
+                if keys[bucket] >= cutoff:
+                    self.visitor_sketches.add_to_bucket(name, keys[bucket], str(visitor_ids[visitor]))
+
+        self.recent.extend(self.recent_details(columns['end_offset']))
+        self.log_offset = columns['end_offset']
+        self.pending = int(valid.sum())
+
+    def recent_details(self, end_offset):
+        """Details of the last RECENT_DETAILS entries before end_offset, read from the tail"""
+        limit = RECENT_DETAILS
+        while True:
+            lines, start, _ = self.log.tail(limit, before=end_offset)
+            details = []
+            for line in lines:
+                entry = parse_line(line)
+                if entry and parse_tracking_time(entry['timestamp']) is not None:
+                    details.append({'timestamp': entry['timestamp'], 'visitor_id': entry['visitor_id'],
+                                    'action': entry['action']})
+            if len(details) >= RECENT_DETAILS or len(lines) < limit:
+                return details[-RECENT_DETAILS:]
+            limit *= 2
+
+    def catch_up(self):
+        """Consume log lines appended since the last read"""
+        with self.lock:
+            end_offset = self.log.end_offset()
+            rebuilding = end_offset < self.log_offset or (self.log_offset == 0 and end_offset > 0)
+            if rebuilding:
+                # No checkpoint yet, or the log was truncated or replaced
+                self.rebuild()
+
+            applied = []
+            for entry, offset in self.log.iter_entries(self.log_offset):
+                if entry:
+                    detail = self.apply(entry)
+                    if detail and self.listeners and not rebuilding:
+                        delta = empty_counts()
+                        add_counts(delta, detail['action'])
+                        applied.append((detail, delta))
+                self.log_offset = offset
+
+            state = None
+            due = time.monotonic() - self.last_checkpoint >= self.checkpoint_interval
+            if not self.saving and (self.pending >= self.checkpoint_every or (self.pending and due)):
+                self.prune()
+                state = self.checkpoint_state()
+                self.saving = True
+
+            unique_visitors = self.visitor_sketches.estimate(None, None) if applied else None
+
+        if state is not None:
+            self.checkpoint_in_background(state)
+        for listener in self.listeners:
+            for detail, delta in applied:
+                listener(detail, delta, unique_visitors)
+
+    def window_counts(self, since=None, until=None):
+        """Sum counters over [since, until) using the finest retained granularity"""
+        if since is None and until is None:
+            return dict(self.totals)
+
+        now = datetime.now(timezone.utc)
+        name = next(
+            name for name, (_, retention) in GRANULARITIES.items()
+            if retention is None or (since is not None and now - since <= retention)
+        )
+
+        key_format = GRANULARITIES[name][0]
+        low = since.strftime(key_format) if since else None
+        high = until.strftime(key_format) if until else None
+
+        counts = empty_counts()
+        for key, bucket in self.buckets[name].items():
+            if (low is None or key >= low) and (high is None or key < high):
+                for field in counts:
+                    counts[field] += bucket[field]
+        return counts
+
+    def summary(self, since=None, until=None, details_limit=50):
+        """Answer an /analytics query from the rollups"""
+        self.catch_up()
+        with self.lock:
+            counts = self.window_counts(since, until)
+            now = datetime.now(timezone.utc)
+            unique_visitors = self.visitor_sketches.estimate(since, until, now)
+            unique_by_window = {
+                name: self.visitor_sketches.estimate(now - span, None, now)
+                for name, span in WINDOWS.items()
+            }
+
+            details = list(self.recent)[-details_limit:] if details_limit > 0 else []
+            return {
+                'total_interactions': counts['interactions'],
+                'unique_visitors': unique_visitors,
+                'unique_visitors_by_window': unique_by_window,
+                'unique_visitors_error': round(standard_error(self.visitor_sketches.precision), 4),
+                'visitor_details': details,
+                'interaction_types': {
+                    'user_stories': counts['user_stories'],
+                    'sprint_planning': counts['sprint_planning']
+                },
+                'window': {
+                    'since': since.isoformat() if since else None,
+                    'until': until.isoformat() if until else None
+                }
+            }
+
+    def visitor_tallies(self, limit=50):
+        """Visitors with the most interactions
+
+        interactions overcounts by at most interactions_error (the count the
+        visitor inherited when it took over an evicted visitor's slot); the
+        per-type counts and first_seen cover the time since then.
+        """
+        with self.lock:
+            ranked = heapq.nlargest(limit, self.visitors.counters.items(), key=lambda item: item[1][0])
+            return [
+                dict(self.visitor_details[visitor_id], visitor_id=visitor_id,
+                     interactions=count, interactions_error=error)
+                for visitor_id, (count, error) in ranked
+            ]
@@ -0,0 +1,42 @@
+"""
+Synthetic tracking data for benchmarks and tests
+
+write_sample_csv produces user_behavior_tracking.csv-shaped files with
+deterministic contents, so benchmark runs and test fixtures are repeatable.
+"""
+
+import random
+from tracking_schema import TRACKING_HEADERS
+
+
+def write_sample_csv(path, rows, seed=7, start=0):
+    """Synthetic tracking CSV in the live file's shape, for benchmarks
+
+    With start > 0 the rows are appended to an existing file instead.
+    """
+    rng = random.Random(seed + start)
+    targets = ['admin', 'customer', 'guest', 'seller']
+    teams = ['1 dev, 1 QC', '2 devs, 1 QC', '3 devs, 2 QC']
+    timelines = ['1 week', '2 weeks', '1 month']
+    questions = ['Who are you?', 'What projects have you worked on?',
+                 'What are your career goals?', 'What are your strengths and weaknesses?', 'null']
+    with open(path, 'a' if start else 'w', encoding='utf-8', newline='') as f:
+        if not start:
+            f.write(','.join(TRACKING_HEADERS) + '\n')
+        for index in range(start, start + rows):
+            minute = index % 60
+            description = f'"gen the {rng.choice(["checkout", "login", "search"])} flow, step {index}"'
+            f.write(','.join([
+                f"{index:06d}",
+                f"07:{minute:02d} - 06Aug25",
+                f"07:{minute:02d} - 06Aug25",
+                f"conv-{index % 500}",
+                rng.choice(targets),
+                description,
+                rng.choice(['Completed', 'null']),
+                f'"{rng.choice(teams)}"',
+                rng.choice(timelines),
+                rng.choice(['Completed', 'null']),
+                *[rng.choice(questions) for _ in range(4)],
+                'null'
+            ]) + '\n')
@@ -41,9 +41,9 @@ def check_csv_data():
 def check_google_sheets_data():
     """Check latest Google Sheets data"""
     try:
-        if sheets_tracker.sheet:
-            # Get all values from the sheet
-            all_values = sheets_tracker.sheet.get_all_values()
+        if sheets_tracker.wait_until_ready(timeout=30):
+            # Get all values from the sheet (via the quota-scheduled snapshot)
+            all_values = sheets_tracker.get_snapshot()
             
             if len(all_values) > 1:  # Has data beyond headers
                 headers = all_values[0]
@@ -0,0 +1,30 @@
+"""
+Atomic JSON checkpoint files
+
+csv_api and gemini_server run as separate processes and both checkpoint the
+same sketch and stats files. Each write goes to its own temporary file in the
+target directory and is then renamed over the checkpoint, so concurrent
+writers never interleave inside one file: the last rename wins whole.
+"""
+
+import json
+import os
+import tempfile
+
+
+def write_json_checkpoint(path, state):
+    """Write state as JSON to path via a uniquely named temporary file"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory or '.',
+                                     prefix=f"{os.path.basename(path)}.", suffix='.tmp',
+                                     delete=False) as f:
+        tmp_path = f.name
+        try:
+            json.dump(state, f)
+        except Exception:
+            f.close()
+            os.unlink(tmp_path)
+            raise
+    os.replace(tmp_path, path)
@@ -3,13 +3,26 @@
 CSV API Server for remote CSV viewing
 """
 
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, jsonify, request
 from flask_cors import CORS
+import base64
 import csv
+import hashlib
 import os
 import json
+import threading
+import time
 from datetime import datetime
-import pandas as pd
+import numpy as np
+from analytics_rollups import parse_window
+from file_responses import send_csv_file
+from recent_activity import CsvRecentActivity
+from tracking_cache import TrackingFrameCache
+from tracking_query import compile_query
+from tracking_search import TrackingSearchIndex
+from tracking_sketches import TrackingSketches
+from tracking_stats import SKETCHED_COLUMNS, TIME_COLUMNS, ColumnStatsCatalog
+from tracking_stream import STREAM_FORMATS, frame_batches, stream_records
 
 app = Flask(__name__)
 CORS(app)
@@ -17,6 +30,24 @@ CORS(app)
 # CSV file path
 CSV_PATH = '../public/user_behavior_tracking.csv'
 
+# Unique-user sketches shared with the tracking write path
+user_sketches = TrackingSketches(CSV_PATH)
+
+# Per-column counts, nulls and time ranges, also maintained by the write path
+column_stats = ColumnStatsCatalog(CSV_PATH)
+
+# Parsed tracking data shared by every endpoint, reloaded when the file changes
+frame_cache = TrackingFrameCache(CSV_PATH)
+
+# Newest rows for /recent, seeded from the end of the CSV
+recent_activity = CsvRecentActivity(CSV_PATH)
+
+# Full-text index over the cached frame, extended as rows are appended
+search_index = TrackingSearchIndex()
+
+# Cache generations restart at 0 with the process, so cursors also carry the boot
+CURSOR_BOOT = format(int(time.time() * 1000), 'x')
+
 @app.route('/api/csv/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -26,6 +57,14 @@ def health_check():
         'service': 'CSV API Server'
     })
 
+@app.route('/api/csv/cache', methods=['GET'])
+def cache_stats():
+    """Hit rate and load times of the shared DataFrame cache"""
+    stats = frame_cache.stats()
+    stats['search_index'] = search_index.stats()
+    stats['recent_activity'] = recent_activity.stats()
+    return jsonify(stats)
+
 @app.route('/api/csv/stats', methods=['GET'])
 def get_stats():
     """Get CSV statistics"""
@@ -33,62 +72,120 @@ def get_stats():
         if not os.path.exists(CSV_PATH):
             return jsonify({'error': 'CSV file not found'}), 404
         
-        # Read CSV with pandas for better handling
-        df = pd.read_csv(CSV_PATH)
+        # Counts and time range come from the incrementally maintained catalog
+        summary = column_stats.summary()
         
         stats = {
-            'total_records': len(df),
-            'total_columns': len(df.columns),
-            'columns': list(df.columns),
+            'total_records': summary['rows'],
+            'total_columns': len(summary['columns']),
+            'columns': summary['columns'],
             'last_updated': datetime.now().isoformat(),
             'file_size': f"{os.path.getsize(CSV_PATH) / 1024:.2f} KB"
         }
         
         # Add some data insights
-        if len(df) > 0:
-            stats['unique_users'] = df['user-id'].nunique() if 'user-id' in df.columns else 0
+        if summary['rows'] > 0:
+            stats.update(user_sketches.summary())
             stats['date_range'] = {
-                'earliest': df['start-time'].min() if 'start-time' in df.columns else 'N/A',
-                'latest': df['start-time'].max() if 'start-time' in df.columns else 'N/A'
+                'earliest': summary['date_range']['earliest'] or 'N/A',
+                'latest': summary['date_range']['latest'] or 'N/A'
             }
+            stats['null_counts'] = summary['null_counts']
         
         return jsonify(stats)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def encode_cursor(state):
+    raw = json.dumps(state, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        state = json.loads(raw)
+        return {key: int(state[key]) for key in ('g', 'n', 'a')} | {key: str(state[key]) for key in ('b', 'q')}
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def search_key(search):
+    return hashlib.blake2b(search.encode('utf-8'), digest_size=6).hexdigest()
+
 @app.route('/api/csv/data', methods=['GET'])
 def get_csv_data():
-    """Get CSV data with pagination and filtering"""
+    """Get CSV data with pagination and filtering
+    
+    Pass the returned next_cursor as ?cursor= to page through a stable
+    snapshot: rows are keyed by their position in the file, which only grows,
+    and the snapshot is fixed at the row count when the first page was served,
+    so appended rows never shift later pages. Each page costs the same however
+    deep it is. A cursor stops working (410) if the CSV is rewritten or the
+    server restarts.
+    """
     try:
         if not os.path.exists(CSV_PATH):
             return jsonify({'error': 'CSV file not found'}), 404
         
         # Get query parameters
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
+        try:
+            page = int(request.args.get('page', 1))
+            per_page = int(request.args.get('per_page', 20))
+        except ValueError:
+            return jsonify({'error': 'page and per_page must be integers'}), 400
+        if page < 1 or per_page < 1:
+            return jsonify({'error': 'page and per_page must be at least 1'}), 400
         search = request.args.get('search', '').lower()
+        cursor = request.args.get('cursor')
         
-        # Read CSV
-        df = pd.read_csv(CSV_PATH)
+        df, generation = frame_cache.get_versioned()
         
-        # Apply search filter if provided
-        if search:
-            mask = df.astype(str).apply(lambda x: x.str.lower().str.contains(search, na=False)).any(axis=1)
-            df = df[mask]
+        # Snapshot size and the last row position already served
+        snapshot_rows = len(df)
+        after = None
+        if cursor:
+            try:
+                state = decode_cursor(cursor)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if state['q'] != search_key(search):
+                return jsonify({'error': 'Cursor belongs to a different search'}), 400
+            if state['b'] != CURSOR_BOOT or state['g'] != generation or state['n'] > len(df):
+                return jsonify({'error': 'CSV was rewritten; restart from the first page'}), 410
+            snapshot_rows, after = state['n'], state['a']
+        
+        # Row positions matching the search (terms, prefix*, "phrases", column:term)
+        rows = search_index.search(search, df, generation) if search else None
+        if rows is not None:
+            rows = rows[:np.searchsorted(rows, snapshot_rows)]
         
         # Calculate pagination
-        total_records = len(df)
+        total_records = len(rows) if rows is not None else snapshot_rows
         total_pages = (total_records + per_page - 1) // per_page
         
-        # Get page data
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        page_data = df.iloc[start_idx:end_idx]
+        # Get page data: seek past the cursor's row, or to the page number
+        if after is not None:
+            start_idx = int(np.searchsorted(rows, after, side='right')) if rows is not None else after + 1
+            page = start_idx // per_page + 1
+        else:
+            start_idx = (page - 1) * per_page
+        end_idx = min(start_idx + per_page, total_records)
+        if rows is not None:
+            positions = rows[start_idx:end_idx]
+        else:
+            positions = np.arange(start_idx, max(start_idx, end_idx))
+        page_data = df.iloc[positions]
         
         # Convert to list of dictionaries
         records = page_data.to_dict('records')
         
+        has_next = end_idx < total_records
+        next_cursor = None
+        if has_next and len(positions):
+            next_cursor = encode_cursor({
+                'b': CURSOR_BOOT, 'g': generation, 'n': snapshot_rows, 'a': int(positions[-1]), 'q': search_key(search)
+            })
+        
         return jsonify({
             'data': records,
             'pagination': {
@@ -96,8 +193,9 @@ def get_csv_data():
                 'per_page': per_page,
                 'total_records': total_records,
                 'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
+                'has_next': has_next,
+                'has_prev': start_idx > 0,
+                'next_cursor': next_cursor
             },
             'search': search
         })
@@ -112,37 +210,75 @@ def download_csv():
         if not os.path.exists(CSV_PATH):
             return jsonify({'error': 'CSV file not found'}), 404
         
-        return send_file(
-            CSV_PATH,
-            as_attachment=True,
-            download_name=f'user_tracking_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
-            mimetype='text/csv'
-        )
+        # Conditional (ETag/304), Range and gzip handling live in send_csv_file
+        return send_csv_file(CSV_PATH, f'user_tracking_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv')
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/csv/columns/<column_name>', methods=['GET'])
 def get_column_data(column_name):
-    """Get unique values and counts for a specific column"""
+    """Get unique values and counts for a specific column
+    
+    Counts come from the stats catalog. Free-text columns (target,
+    description, timeline) also answer from top-K sketches: ?top=N values
+    (default 20), optionally for window (1h, 24h, 7d, 30d) or since/until,
+    each with a count, its maximum overcount and whether its rank is certain.
+    Columns with too many distinct values for exact counts (IDs, times) get
+    their all-time top values the same way. Pass ?exact=1 to count every
+    value from the data.
+    """
     try:
         if not os.path.exists(CSV_PATH):
             return jsonify({'error': 'CSV file not found'}), 404
         
-        df = pd.read_csv(CSV_PATH)
-        
-        if column_name not in df.columns:
+        column = column_stats.column(column_name)
+        if column is None:
             return jsonify({'error': f'Column {column_name} not found'}), 404
         
-        # Get value counts
-        value_counts = df[column_name].value_counts().to_dict()
-        
-        return jsonify({
+        result = {
             'column': column_name,
-            'total_values': len(df[column_name]),
+            'total_values': column['rows'],
+            'null_values': column['nulls']
+        }
+        if column_name in TIME_COLUMNS:
+            result.update({'min': column['min'], 'max': column['max']})
+        
+        exact = request.args.get('exact') in ('1', 'true')
+        windowed = any(request.args.get(name) for name in ('window', 'since', 'until'))
+        sketched = column_name in SKETCHED_COLUMNS and ('top' in request.args or windowed)
+        if not exact and (sketched or column['value_counts'] is None):
+            try:
+                limit = int(request.args.get('top', 20))
+                since, until = parse_window(
+                    request.args.get('window'),
+                    request.args.get('since'),
+                    request.args.get('until')
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            top = column_stats.top(column_name, max(1, limit), since, until)
+            result.update({
+                'approximate': True,
+                'top_values': top['values'],
+                'counted_values': top['total'],
+                'max_error': top['max_error'],
+                'sketch_capacity': top['capacity']
+            })
+            return jsonify(result)
+        
+        # Only ?exact=1 reads the frame
+        value_counts = None if exact else column['value_counts']
+        if value_counts is None:
+            df = frame_cache.get([column_name])
+            value_counts = df[column_name].value_counts().to_dict()
+        
+        result.update({
+            'approximate': False,
             'unique_values': len(value_counts),
             'value_counts': value_counts
         })
+        return jsonify(result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -156,10 +292,17 @@ def get_recent_data():
         
         limit = int(request.args.get('limit', 10))
         
-        df = pd.read_csv(CSV_PATH)
-        
-        # Get recent records (assuming they're in order)
-        recent_data = df.tail(limit).to_dict('records')
+        # The ring buffer covers the usual limits; larger ones read the frame.
+        # Either way empty and 'null' cells come back as None.
+        if limit <= recent_activity.capacity:
+            recent_data = [
+                {column: None if value in ('', 'null') else value for column, value in row.items()}
+                for row in recent_activity.latest(limit)
+            ]
+        else:
+            df = frame_cache.get()
+            positions = np.arange(max(0, len(df) - limit), len(df))
+            recent_data = [row for batch in frame_batches(df, positions) for row in batch]
         
         return jsonify({
             'recent_records': recent_data,
@@ -172,49 +315,76 @@ def get_recent_data():
 
 @app.route('/api/csv/search', methods=['POST'])
 def search_csv():
-    """Advanced search with multiple criteria"""
+    """Advanced search with multiple criteria
+    
+    Criteria are compiled into a query plan (see tracking_query); pass
+    "columns" to project the results and "explain": true (or ?explain=1)
+    to get the plan with per-step row counts and timings. With "format"
+    ndjson, csv or json the matching rows are streamed instead of returned
+    in one document (json streams a bare array of records).
+    """
     try:
         if not os.path.exists(CSV_PATH):
             return jsonify({'error': 'CSV file not found'}), 404
         
-        data = request.get_json()
+        data = request.get_json() or {}
         search_criteria = data.get('criteria', {})
+        explain = data.get('explain') or request.args.get('explain') in ('1', 'true')
+        stream_format = data.get('format') or request.args.get('format')
+        if stream_format and stream_format not in STREAM_FORMATS:
+            return jsonify({'error': f"Unsupported format. Use {', '.join(STREAM_FORMATS)}"}), 400
         
-        df = pd.read_csv(CSV_PATH)
+        df, generation = frame_cache.get_versioned()
         
-        # Apply multiple search criteria
-        for column, value in search_criteria.items():
-            if column in df.columns and value:
-                if isinstance(value, str):
-                    mask = df[column].astype(str).str.contains(value, case=False, na=False)
-                    df = df[mask]
-                elif isinstance(value, dict):
-                    # Handle range searches
-                    if 'min' in value and 'max' in value:
-                        mask = (df[column] >= value['min']) & (df[column] <= value['max'])
-                        df = df[mask]
+        try:
+            plan = compile_query(search_criteria, list(df.columns), data.get('columns'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        results = df.to_dict('records')
+        if stream_format:
+            rows, plan_info = plan.select(df, generation, search_index)
+            columns = plan.projection or list(df.columns)
+            return stream_records(
+                frame_batches(df, rows, plan.projection), stream_format, columns,
+                filename=f'search_results.{stream_format}' if stream_format == 'csv' else None,
+                headers={'X-Total-Results': str(len(rows)), 'X-Query-Ms': str(plan_info['ms'])}
+            )
         
-        return jsonify({
+        results_df, plan_info = plan.execute(df, generation, search_index)
+        results = results_df.to_dict('records')
+        
+        response = {
             'search_results': results,
             'total_results': len(results),
             'criteria_used': search_criteria
-        })
+        }
+        if explain:
+            response['plan'] = plan_info
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def warm_search_index():
+    """Load the frame and build the search index before the first request needs it"""
+    try:
+        search_index.update(*frame_cache.get_versioned())
+        print(f"📚 Search index ready: {search_index.stats()['rows']:,} rows")
+    except Exception as e:
+        print(f"⚠️  Search index warm-up failed: {e}")
+
 if __name__ == '__main__':
     print("🚀 Starting CSV API Server...")
+    threading.Thread(target=warm_search_index, daemon=True).start()
     print("📊 Available endpoints:")
     print("  GET  /api/csv/health - Health check")
+    print("  GET  /api/csv/cache - DataFrame cache stats")
     print("  GET  /api/csv/stats - Get CSV statistics")
-    print("  GET  /api/csv/data - Get paginated data")
+    print("  GET  /api/csv/data - Get paginated data (?cursor= for stable keyset pages)")
     print("  GET  /api/csv/download - Download CSV")
     print("  GET  /api/csv/columns/<name> - Get column analysis")
     print("  GET  /api/csv/recent - Get recent records")
-    print("  POST /api/csv/search - Advanced search")
+    print("  POST /api/csv/search - Advanced search (format=ndjson|csv|json streams rows)")
     print("\n💡 Access your CSV data at:")
     print("  http://localhost:5001/api/csv/stats")
     print("  http://localhost:5001/api/csv/data?page=1&per_page=20")
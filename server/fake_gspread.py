@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+In-process fake of the gspread surface used by the Sheets code
+
+Implements open_by_key, get_worksheet/worksheet/add_worksheet, append_row,
+append_rows, get_all_values, get, update and clear on an in-memory grid, with
+configurable per-call latency, per-minute read/write quotas that answer with
+429 errors, and random or scripted failures. A scripted failure can also hit a
+write after it was applied, like a response lost once the server committed.
+Randomness comes from a seeded generator and time from an injectable clock,
+so runs are reproducible.
+
+Run the server against it with SHEETS_FAKE=1 (see googleSheetsTracker.py);
+SHEETS_FAKE_LATENCY, SHEETS_FAKE_READ_QUOTA, SHEETS_FAKE_WRITE_QUOTA,
+SHEETS_FAKE_FAILURE_RATE and SHEETS_FAKE_SEED tune it. `python
+fake_gspread.py` benchmarks session writes through the tracker.
+"""
+
+import argparse
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+
+A1_PATTERN = re.compile(r'^([A-Z]*)(\d*)$')
+QUOTA_WINDOW = 60.0
+
+# Spreadsheets live here so every client in the process sees the same data
+_spreadsheets = {}
+_registry_lock = threading.Lock()
+
+
+class FakeResponse:
+    def __init__(self, status_code, reason):
+        self.status_code = status_code
+        self.reason = reason
+
+    def json(self):
+        return {'error': {'code': self.status_code, 'status': self.reason, 'message': self.reason}}
+
+
+class FakeAPIError(Exception):
+    """Looks like gspread.exceptions.APIError to code that checks the status"""
+
+    def __init__(self, status_code, reason):
+        super().__init__(f"APIError: [{status_code}]: {reason}")
+        self.response = FakeResponse(status_code, reason)
+        self.code = status_code
+
+
+def column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index
+
+
+def column_letter(index):
+    letters = ''
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def parse_a1(range_name):
+    """Return 1-based (row1, col1, row2, col2); None means open-ended"""
+    if '!' in range_name:
+        range_name = range_name.split('!', 1)[1]
+    corners = range_name.upper().split(':')
+    parsed = []
+    for corner in corners:
+        match = A1_PATTERN.match(corner)
+        if not match:
+            raise FakeAPIError(400, f"Unable to parse range: {range_name}")
+        letters, digits = match.groups()
+        parsed.append((int(digits) if digits else None, column_index(letters) if letters else None))
+    (row1, col1), (row2, col2) = parsed[0], parsed[-1]
+    if len(corners) == 1:
+        row2, col2 = row1, col1
+    return row1 or 1, col1 or 1, row2, col2
+
+
+class FakeBehavior:
+    """Latency, quota and failure settings shared by a fake client's calls"""
+
+    def __init__(self, latency=0.0, jitter=0.0, read_quota=None, write_quota=None,
+                 failure_rate=0.0, seed=0, clock=time.monotonic, sleep=time.sleep):
+        self.latency = latency
+        self.jitter = jitter
+        self.quotas = {'read': read_quota, 'write': write_quota}
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.windows = {'read': deque(), 'write': deque()}
+        self.scripted_failures = deque()
+        self.calls = {}
+        self.counts = {'read': 0, 'write': 0, 'quota_errors': 0, 'failures': 0}
+
+    @classmethod
+    def from_env(cls):
+        def number(name, default=None, cast=float):
+            value = os.environ.get(name)
+            return cast(value) if value not in (None, '') else default
+
+        return cls(
+            latency=number('SHEETS_FAKE_LATENCY', 0.0),
+            jitter=number('SHEETS_FAKE_JITTER', 0.0),
+            read_quota=number('SHEETS_FAKE_READ_QUOTA', None, int),
+            write_quota=number('SHEETS_FAKE_WRITE_QUOTA', None, int),
+            failure_rate=number('SHEETS_FAKE_FAILURE_RATE', 0.0),
+            seed=number('SHEETS_FAKE_SEED', 0, int)
+        )
+
+    def fail_next(self, count=1, status_code=500, reason='backendError', applied=False):
+        """Make the next `count` calls fail with the given status
+
+        With applied=True a failing write still takes effect before the error
+        is raised.
+        """
+        with self.lock:
+            for _ in range(count):
+                self.scripted_failures.append((status_code, reason, applied))
+
+    def before_call(self, method, kind):
+        """Apply latency, quota and failure injection for one API call
+
+        Returns an error for the caller to raise after applying the call, for
+        scripted failures of writes with applied=True.
+        """
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failure = self.scripted_failures.popleft() if self.scripted_failures else None
+            if failure is None and self.failure_rate and self.random.random() < self.failure_rate:
+                failure = (500, 'backendError', False)
+
+        if delay:
+            self.sleep(delay)
+
+        with self.lock:
+            quota = self.quotas[kind]
+            if quota is not None:
+                now = self.clock()
+                window = self.windows[kind]
+                while window and now - window[0] >= QUOTA_WINDOW:
+                    window.popleft()
+                if len(window) >= quota:
+                    self.counts['quota_errors'] += 1
+                    raise FakeAPIError(429, f"RESOURCE_EXHAUSTED: {kind} requests per minute exceeded")
+                window.append(now)
+            if failure is not None:
+                self.counts['failures'] += 1
+                status_code, reason, applied = failure
+                if not (applied and kind == 'write'):
+                    raise FakeAPIError(status_code, reason)
+                self.counts[kind] += 1
+                return FakeAPIError(status_code, reason)
+            self.counts[kind] += 1
+        return None
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, calls=dict(self.calls))
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title, rows=1000, cols=26, index=0):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.index = index
+        self.id = index
+        self.cells = []
+        self.lock = threading.Lock()
+
+    @property
+    def behavior(self):
+        return self.spreadsheet.client.behavior
+
+    def last_data_row(self):
+        for index in range(len(self.cells) - 1, -1, -1):
+            if any(cell != '' for cell in self.cells[index]):
+                return index + 1
+        return 0
+
+    def write_block(self, row, col, values):
+        for row_offset, values_row in enumerate(values):
+            target = row - 1 + row_offset
+            while len(self.cells) <= target:
+                self.cells.append([])
+            cells = self.cells[target]
+            end = col - 1 + len(values_row)
+            if len(cells) < end:
+                cells.extend([''] * (end - len(cells)))
+            for col_offset, value in enumerate(values_row):
+                cells[col - 1 + col_offset] = '' if value is None else str(value)
+        self.row_count = max(self.row_count, len(self.cells))
+        self.col_count = max(self.col_count, max((len(cells) for cells in self.cells), default=0))
+
+    def get_all_values(self, **kwargs):
+        self.behavior.before_call('get_all_values', 'read')
+        with self.lock:
+            height = self.last_data_row()
+            width = max((len(cells) for cells in self.cells[:height]), default=0)
+            return [cells + [''] * (width - len(cells)) for cells in self.cells[:height]]
+
+    def get(self, range_name=None, **kwargs):
+        """Values in an A1 range, trimmed of trailing empty rows and cells like the API"""
+        self.behavior.before_call('get', 'read')
+        row1, col1, row2, col2 = parse_a1(range_name) if range_name else (1, 1, None, None)
+        with self.lock:
+            rows = self.cells[row1 - 1:row2]
+            result = []
+            for cells in rows:
+                values = cells[col1 - 1:col2]
+                while values and values[-1] == '':
+                    values.pop()
+                result.append(values)
+            while result and not result[-1]:
+                result.pop()
+            return result
+
+    def row_values(self, row, **kwargs):
+        self.behavior.before_call('row_values', 'read')
+        with self.lock:
+            cells = list(self.cells[row - 1]) if row <= len(self.cells) else []
+        while cells and cells[-1] == '':
+            cells.pop()
+        return cells
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], method='append_row')
+
+    def append_rows(self, values, method='append_rows', **kwargs):
+        late_error = self.behavior.before_call(method, 'write')
+        with self.lock:
+            start = self.last_data_row() + 1
+            self.write_block(start, 1, values)
+            end = start + len(values) - 1
+        if late_error:
+            raise late_error
+        width = max((len(row) for row in values), default=1)
+        return {'updates': {'updatedRange': f"{self.title}!A{start}:{column_letter(width)}{end}",
+                            'updatedRows': len(values)}}
+
+    def update(self, values=None, range_name=None, **kwargs):
+        """Write values at an A1 range, with gspread 6's (values, range_name) order"""
+        late_error = self.behavior.before_call('update', 'write')
+        if isinstance(values, str) or not isinstance(range_name, (str, type(None))):
+            # gspread 6 would send the range string as the values; the API rejects it
+            raise FakeAPIError(400, "Invalid values: update() takes (values, range_name) since gspread 6")
+        row, col, _, _ = parse_a1(range_name or 'A1')
+        with self.lock:
+            self.write_block(row, col, values or [])
+        if late_error:
+            raise late_error
+        return {'updatedRange': f"{self.title}!{range_name or 'A1'}", 'updatedRows': len(values or [])}
+
+    def clear(self):
+        late_error = self.behavior.before_call('clear', 'write')
+        with self.lock:
+            self.cells = []
+        if late_error:
+            raise late_error
+        return {}
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, key):
+        self.client = client
+        self.id = key
+        self.url = f"https://docs.google.com/spreadsheets/d/{key}"
+        self.title = 'Fake tracking sheet'
+        self.sheets = [FakeWorksheet(self, 'Sheet1')]
+
+    def get_worksheet(self, index):
+        self.client.behavior.before_call('get_worksheet', 'read')
+        return self.sheets[index] if index < len(self.sheets) else None
+
+    def worksheet(self, title):
+        self.client.behavior.before_call('worksheet', 'read')
+        for sheet in self.sheets:
+            if sheet.title == title:
+                return sheet
+        raise FakeAPIError(404, f"WorksheetNotFound: {title}")
+
+    def worksheets(self):
+        self.client.behavior.before_call('worksheets', 'read')
+        return list(self.sheets)
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        self.client.behavior.before_call('add_worksheet', 'write')
+        if any(sheet.title == title for sheet in self.sheets):
+            raise FakeAPIError(400, f'A sheet with the name "{title}" already exists')
+        sheet = FakeWorksheet(self, title, rows, cols, len(self.sheets))
+        self.sheets.append(sheet)
+        return sheet
+
+
+class FakeClient:
+    def __init__(self, behavior=None):
+        self.behavior = behavior or FakeBehavior()
+
+    @classmethod
+    def from_env(cls):
+        return cls(FakeBehavior.from_env())
+
+    def open_by_key(self, key):
+        self.behavior.before_call('open_by_key', 'read')
+        with _registry_lock:
+            spreadsheet = _spreadsheets.get(key)
+            if spreadsheet is None:
+                spreadsheet = _spreadsheets[key] = FakeSpreadsheet(self, key)
+            spreadsheet.client = self
+            return spreadsheet
+
+
+def reset():
+    """Forget every fake spreadsheet"""
+    with _registry_lock:
+        _spreadsheets.clear()
+
+
+def benchmark(sessions=500, latency=0.2, write_quota=60, failure_rate=0.0, batch_size=50, batch_interval=0.5):
+    """Write sessions through the tracker against the fake and report throughput"""
+    from googleSheetsTracker import GoogleSheetsTracker
+    from sheets_quota import SheetsScheduler
+
+    reset()
+    behavior = FakeBehavior(latency=latency, write_quota=write_quota, failure_rate=failure_rate)
+    tracker = GoogleSheetsTracker(
+        batch_size=batch_size,
+        batch_interval=batch_interval,
+        scheduler=SheetsScheduler(write_per_minute=write_quota),
+        client_factory=lambda: FakeClient(behavior),
+        connect_in_background=False
+    )
+
+    started = time.perf_counter()
+    futures = [tracker.submit_user_session({'chat_bubble_1': f'question {i}'}) for i in range(sessions)]
+    submitted = time.perf_counter() - started
+    written = 0
+    for future in futures:
+        try:
+            future.result()
+            written += 1
+        except Exception:
+            pass
+    elapsed = time.perf_counter() - started
+
+    return {
+        'sessions': sessions,
+        'written': written,
+        'submit_seconds': round(submitted, 4),
+        'total_seconds': round(elapsed, 3),
+        'rows_per_second': round(written / elapsed, 1) if elapsed else None,
+        'writes': tracker.write_stats(),
+        'fake': behavior.stats()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Sheets session writes against the fake API')
+    parser.add_argument('--sessions', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds per API call')
+    parser.add_argument('--write-quota', type=int, default=60, help='Write requests per minute')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"⏱️  Writing {args.sessions} sessions (latency {args.latency}s, {args.write_quota} writes/min)...")
+    results = benchmark(args.sessions, args.latency, args.write_quota, args.failure_rate, args.batch_size)
+    writes = results['writes']
+    print(f"   written: {results['written']}/{results['sessions']} in {results['total_seconds']}s "
+          f"({results['rows_per_second']} rows/s)")
+    print(f"   submit latency: {results['submit_seconds']}s for all sessions")
+    print(f"   batches: {writes['batches']}, avg size {writes['avg_batch_size']}, "
+          f"{writes['rows_per_api_call']} rows per API call, {writes['retries']} retries")
+    print(f"   fake API: {results['fake']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,10 +3,22 @@ import re
 import json
 import csv
 from datetime import datetime
-from flask import Flask, request, jsonify, Response
+from flask import Flask, request, jsonify
 from flask_cors import CORS
 import google.generativeai as genai
 from googleSheetsTracker import sheets_tracker
+from sheets_quota import sheets_scheduler
+from tracking_schema import TRACKING_HEADERS, generate_record_id, format_timestamp
+from interaction_log import (
+    EVENT_USER_STORY, EVENT_SPRINT, append_interaction, interaction_log, encode_cursor, decode_cursor
+)
+from analytics_rollups import AnalyticsRollups, parse_window
+from live_feed import EventBroker
+from tracking_sketches import TrackingSketches
+from tracking_stats import ColumnStatsCatalog
+from recent_activity import CsvRecentActivity
+from tracking_stream import csv_batches, stream_records
+from file_responses import send_csv_file
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": ["http://localhost:8080", "http://localhost:8081", "https://*.netlify.app", "https://*.vercel.app"]}}, supports_credentials=True)
@@ -19,25 +31,14 @@ class UserTracker:
     def __init__(self):
         self.csv_path = '../public/user_behavior_tracking.csv'
         self.initialize_csv()
+        self.sketches = TrackingSketches(self.csv_path)
+        self.column_stats = ColumnStatsCatalog(self.csv_path)
+        # Last rows for the dashboard, seeded from the end of the CSV
+        self.recent = CsvRecentActivity(self.csv_path)
+        self.recent.catch_up()
     
     def initialize_csv(self):
-        headers = [
-            'user-id',
-            'start-time',
-            'end-time',
-            'playground-convo-id',
-            'playground-mess-target',
-            'playground-mess-description',
-            'playground-step1',
-            'playground-mess-team',
-            'playground-mess-timeline',
-            'playground-step2',
-            'chat-bubble-1',
-            'chat-bubble-2',
-            'chat-bubble-3',
-            'chat-bubble-4',
-            'chat-bubble-free'
-        ]
+        headers = TRACKING_HEADERS
         
         # Create directory if it doesn't exist
         csv_dir = os.path.dirname(self.csv_path)
@@ -50,16 +51,10 @@ class UserTracker:
                 writer.writerow(headers)
     
     def generate_user_id(self):
-        timestamp = int(datetime.now().timestamp() * 1000)
-        random_num = hash(str(timestamp)) % 1000
-        return f"{timestamp}{random_num}"[-6:]
+        return generate_record_id()
     
     def format_date_time(self, date):
-        hours = date.strftime('%H:%M')
-        day = date.strftime('%d')
-        month_abbr = date.strftime('%b')
-        year = date.strftime('%y')
-        return f"{hours} - {day}{month_abbr}{year}"
+        return format_timestamp(date)
     
     def escape_csv_value(self, value):
         if value is None or value == '':
@@ -101,6 +96,11 @@ class UserTracker:
                 writer = csv.writer(file)
                 writer.writerow(row)
             
+            # Fold the new row into the unique-user sketches, column stats and recent rows
+            self.sketches.catch_up()
+            self.column_stats.catch_up()
+            self.recent.catch_up()
+            
             print(f"📊 User session recorded: {user_id}")
             return user_id
         except Exception as e:
@@ -110,9 +110,56 @@ class UserTracker:
 # Initialize user tracker
 user_tracker = UserTracker()
 
+# Interaction rollups resume from their checkpoint and catch up on the log tail
+analytics_rollups = AnalyticsRollups()
+analytics_rollups.catch_up()
+
+# Live dashboard feed (server-sent events), fed by the write paths
+live_feed = EventBroker()
+
+def is_filled(value):
+    return value not in (None, '', 'null')
+
+def session_delta(row):
+    """Change to the dashboard's session counts caused by one tracking row"""
+    chat_columns = ('chat-bubble-1', 'chat-bubble-2', 'chat-bubble-3', 'chat-bubble-4', 'chat-bubble-free')
+    return {
+        'total_sessions': 1,
+        'chat_interactions': int(any(is_filled(row.get(column)) for column in chat_columns)),
+        'playground_interactions': int(is_filled(row.get('playground-convo-id')))
+    }
+
+def publish_session(source):
+    def publish(row):
+        live_feed.publish('session', {'source': source, 'row': row, 'delta': session_delta(row)})
+    return publish
+
+def publish_interaction(detail, delta, unique_visitors):
+    live_feed.publish('interaction', {'detail': detail, 'delta': delta, 'unique_visitors': unique_visitors})
+
+user_tracker.recent.listeners.append(publish_session('csv'))
+sheets_tracker.recent.listeners.append(publish_session('sheets'))
+analytics_rollups.listeners.append(publish_interaction)
+
+def track_interaction(event, fields):
+    """Log a visitor interaction and fold it into the analytics rollups"""
+    import hashlib
+    
+    # Get visitor IP (with fallback for Railway)
+    visitor_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
+    if visitor_ip and ',' in visitor_ip:
+        visitor_ip = visitor_ip.split(',')[0].strip()
+    
+    # Create visitor ID from IP (hashed for privacy)
+    visitor_id = hashlib.md5(visitor_ip.encode()).hexdigest()[:8] if visitor_ip else 'unknown'
+    
+    log_entry = append_interaction(visitor_id, visitor_ip, event, fields)
+    analytics_rollups.catch_up()
+    return log_entry
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'message': 'Server is running with tracking fixes v2'})
+    return jsonify({'status': 'healthy', 'message': 'Server is running with tracking fixes v2', 'sheets': sheets_tracker.state})
 
 @app.route('/test-simple', methods=['GET'])
 def test_simple():
@@ -139,24 +186,36 @@ def test_simple():
 
 @app.route('/check-log', methods=['GET'])
 def check_log():
-    """Check the user interactions log"""
+    """Tail the user interactions log
+    
+    Without a cursor, returns the last `limit` lines. With `cursor`, returns up
+    to `limit` lines written after it (use next_cursor to poll for new lines);
+    with `before`, returns the `limit` lines preceding it (use prev_cursor to
+    page backwards). Only the bytes needed for the page are read.
+    """
     try:
-        if os.path.exists('user_interactions.log'):
-            with open('user_interactions.log', 'r') as f:
-                content = f.read()
-            return jsonify({
-                'status': 'success',
-                'log_exists': True,
-                'content': content,
-                'lines': len(content.split('\n')) if content else 0
-            })
+        limit = max(1, min(int(request.args.get('limit', 100)), 1000))
+        cursor = request.args.get('cursor')
+        before = request.args.get('before')
+        
+        if cursor:
+            lines, next_offset = interaction_log.read_since(decode_cursor(cursor), limit)
+            start_offset = decode_cursor(cursor)
         else:
-            return jsonify({
-                'status': 'success',
-                'log_exists': False,
-                'content': '',
-                'lines': 0
-            })
+            before_offset = decode_cursor(before) if before else None
+            lines, start_offset, next_offset = interaction_log.tail(limit, before_offset)
+        
+        return jsonify({
+            'status': 'success',
+            'log_exists': interaction_log.end_offset() > 0,
+            'content': '\n'.join(lines),
+            'entries': lines,
+            'returned': len(lines),
+            'lines': interaction_log.line_count(),
+            'segments': len(interaction_log.segments()),
+            'next_cursor': encode_cursor(next_offset),
+            'prev_cursor': encode_cursor(start_offset) if start_offset > 0 else None
+        })
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -165,67 +224,30 @@ def check_log():
 
 @app.route('/analytics', methods=['GET'])
 def get_analytics():
-    """Get visitor analytics from the log"""
+    """Get visitor analytics from the incremental rollups
+    
+    Optional query parameters: window (1h, 24h, 7d, 30d, all) or since/until
+    (ISO-8601), and details_limit for the number of recent visitor_details.
+    """
     try:
-        if not os.path.exists('user_interactions.log'):
+        # Live feed clients resume from here, so nothing after this read is missed
+        live_event_id = live_feed.stats()['last_event_id']
+        try:
+            since, until = parse_window(
+                request.args.get('window'),
+                request.args.get('since'),
+                request.args.get('until')
+            )
+            details_limit = int(request.args.get('details_limit', 50))
+        except ValueError as e:
             return jsonify({
-                'status': 'success',
-                'total_interactions': 0,
-                'unique_visitors': 0,
-                'visitor_details': [],
-                'interaction_types': {'user_stories': 0, 'sprint_planning': 0}
-            })
-        
-        with open('user_interactions.log', 'r') as f:
-            lines = f.readlines()
-        
-        # Parse log entries
-        visitors = set()
-        user_stories = 0
-        sprint_planning = 0
-        visitor_details = []
-        
-        for line in lines:
-            if line.strip():
-                parts = line.strip().split(' | ')
-                if len(parts) >= 4:  # timestamp | visitor_info | ip_info | action_info
-                    timestamp = parts[0]
-                    visitor_info = parts[1]
-                    ip_info = parts[2]
-                    action_info = parts[3]
-                    
-                    # Extract visitor ID
-                    if 'Visitor:' in visitor_info:
-                        visitor_id = visitor_info.split('Visitor:')[1].strip()
-                        visitors.add(visitor_id)
-                        
-                        # Count interaction types
-                        if 'User Story:' in action_info:
-                            user_stories += 1
-                            action_type = 'User Story'
-                        elif 'Sprint:' in action_info:
-                            sprint_planning += 1
-                            action_type = 'Sprint Planning'
-                        else:
-                            action_type = 'Unknown'
-                        
-                        # Add to visitor details
-                        visitor_details.append({
-                            'timestamp': timestamp,
-                            'visitor_id': visitor_id,
-                            'action': action_type
-                        })
-        
-        return jsonify({
-            'status': 'success',
-            'total_interactions': len(lines),
-            'unique_visitors': len(visitors),
-            'visitor_details': visitor_details,
-            'interaction_types': {
-                'user_stories': user_stories,
-                'sprint_planning': sprint_planning
-            }
-        })
+                'status': 'error',
+                'message': f'Invalid analytics request: {str(e)}'
+            }), 400
+        summary = analytics_rollups.summary(since, until, details_limit)
+        summary['top_visitors'] = analytics_rollups.visitor_tallies(10)
+        summary['live_event_id'] = live_event_id
+        return jsonify(dict(summary, status='success'))
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -237,9 +259,7 @@ def get_tracking_data():
     """Private endpoint to view user tracking data"""
     try:
         if os.path.exists(user_tracker.csv_path):
-            with open(user_tracker.csv_path, 'r', encoding='utf-8') as file:
-                data = file.read()
-            return Response(data, mimetype='text/csv', headers={'Content-Disposition': 'attachment; filename=user_behavior_tracking.csv'})
+            return send_csv_file(user_tracker.csv_path, 'user_behavior_tracking.csv')
         else:
             return jsonify({'error': 'Tracking file not found'}), 404
     except Exception as e:
@@ -249,40 +269,61 @@ def get_tracking_data():
 def admin_dashboard():
     """Admin dashboard to view and export data"""
     try:
+        # Live feed clients resume from here, so nothing after this read is missed
+        live_stats = live_feed.stats()
+        
         # Try to get data from Google Sheets first
         stats = sheets_tracker.get_statistics()
         recent_activity = sheets_tracker.get_recent_data(10)
         sheet_url = sheets_tracker.get_sheet_url()
         
         # Fallback to CSV if Google Sheets is not available
+        stats_source = 'sheets'
         if stats['total_sessions'] == 0:
-            tracking_data = []
+            stats_source = 'csv'
+            stats = {'total_sessions': 0, 'chat_interactions': 0, 'playground_interactions': 0}
+            recent_activity = []
             if os.path.exists(user_tracker.csv_path):
-                with open(user_tracker.csv_path, 'r', encoding='utf-8') as file:
-                    import csv
-                    reader = csv.DictReader(file)
-                    tracking_data = list(reader)
-            
-            total_sessions = len(tracking_data)
-            chat_interactions = sum(1 for row in tracking_data if any(row.get(f'chat-bubble-{i}') for i in range(1, 5)) or row.get('chat-bubble-free'))
-            playground_interactions = sum(1 for row in tracking_data if row.get('playground-convo-id'))
-            
-            stats = {
-                'total_sessions': total_sessions,
-                'chat_interactions': chat_interactions,
-                'playground_interactions': playground_interactions
-            }
-            recent_activity = tracking_data[-10:] if tracking_data else []
+                # Counts from the column stats catalog, rows from the recent-activity buffer
+                summary = user_tracker.column_stats.summary()
+                stats = {
+                    'total_sessions': summary['rows'],
+                    'chat_interactions': summary['row_groups'].get('chat', 0),
+                    'playground_interactions': summary['rows'] - summary['null_counts'].get('playground-convo-id', summary['rows'])
+                }
+                recent_activity = user_tracker.recent.latest(10)
         
         return jsonify({
             'stats': stats,
+            'stats_source': stats_source,
             'recent_activity': recent_activity,
+            'live_url': '/api/admin/live',
+            'live_event_id': live_stats['last_event_id'],
+            'live_feed': live_stats,
             'download_url': '/api/tracking-data',
-            'sheet_url': sheet_url
+            'sheet_url': sheet_url,
+            'sheets_status': sheets_tracker.status(),
+            'sheets_snapshot': sheets_tracker.snapshot_stats(),
+            'sheets_writes': sheets_tracker.write_stats(),
+            'sheets_quota': sheets_scheduler.stats()
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/admin/live', methods=['GET'])
+def admin_live_feed():
+    """Server-sent events for the dashboards
+    
+    Events: session (a tracking row and its count delta, with the store it
+    was written to), interaction (a visitor interaction, its count delta and
+    the unique visitor estimate), reset (missed events are gone; reload the
+    dashboard) and overflow (the client fell too far behind and is
+    disconnected; it resumes on reconnect). Reconnects resume after the
+    Last-Event-ID header, or ?last_event_id= for clients that can't set it.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    return live_feed.response(last_event_id)
+
 @app.route('/api/admin/export/<format>', methods=['GET'])
 def export_data(format):
     """Export data in different formats"""
@@ -291,22 +332,14 @@ def export_data(format):
             return jsonify({'error': 'No data available'}), 404
         
         if format == 'csv':
-            with open(user_tracker.csv_path, 'r', encoding='utf-8') as file:
-                data = file.read()
-            return Response(data, mimetype='text/csv', 
-                          headers={'Content-Disposition': 'attachment; filename=user_behavior_tracking.csv'})
+            return send_csv_file(user_tracker.csv_path, 'user_behavior_tracking.csv')
         
-        elif format == 'json':
-            import csv
-            import json
-            data = []
-            with open(user_tracker.csv_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                data = list(reader)
-            return jsonify(data)
+        elif format in ('json', 'ndjson'):
+            # Streamed from the file a batch at a time instead of loading every row
+            return stream_records(csv_batches(user_tracker.csv_path), format, TRACKING_HEADERS)
         
         else:
-            return jsonify({'error': 'Unsupported format. Use csv or json'}), 400
+            return jsonify({'error': 'Unsupported format. Use csv, json or ndjson'}), 400
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -393,22 +426,10 @@ def chat():
             
             # Enhanced tracking with visitor analytics
             try:
-                from datetime import datetime
-                import hashlib
-                
-                # Get visitor IP (with fallback for Railway)
-                visitor_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
-                if visitor_ip and ',' in visitor_ip:
-                    visitor_ip = visitor_ip.split(',')[0].strip()
-                
-                # Create visitor ID from IP (hashed for privacy)
-                visitor_id = hashlib.md5(visitor_ip.encode()).hexdigest()[:8] if visitor_ip else 'unknown'
-                
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                log_entry = f"{timestamp} | Visitor:{visitor_id} | IP:{visitor_ip} | Sprint: {session_data.get('playground_mess_team', 'unknown')} - {session_data.get('playground_mess_timeline', 'unknown')}\n"
-                
-                with open('user_interactions.log', 'a') as f:
-                    f.write(log_entry)
+                log_entry = track_interaction(EVENT_SPRINT, {
+                    'team': session_data.get('playground_mess_team', 'unknown'),
+                    'timeline': session_data.get('playground_mess_timeline', 'unknown')
+                })
                 print(f"✅ Enhanced tracking: {log_entry.strip()}")
             except Exception as e:
                 print(f"❌ Enhanced tracking failed: {e}")
@@ -432,22 +453,10 @@ def chat():
     
         # Enhanced tracking with visitor analytics
         try:
-            from datetime import datetime
-            import hashlib
-            
-            # Get visitor IP (with fallback for Railway)
-            visitor_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
-            if visitor_ip and ',' in visitor_ip:
-                visitor_ip = visitor_ip.split(',')[0].strip()
-            
-            # Create visitor ID from IP (hashed for privacy)
-            visitor_id = hashlib.md5(visitor_ip.encode()).hexdigest()[:8] if visitor_ip else 'unknown'
-            
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            log_entry = f"{timestamp} | Visitor:{visitor_id} | IP:{visitor_ip} | User Story: {session_data.get('playground_mess_target', 'unknown')} - {session_data.get('playground_mess_description', 'unknown')}\n"
-            
-            with open('user_interactions.log', 'a') as f:
-                f.write(log_entry)
+            log_entry = track_interaction(EVENT_USER_STORY, {
+                'target': session_data.get('playground_mess_target', 'unknown'),
+                'description': session_data.get('playground_mess_description', 'unknown')
+            })
             print(f"✅ Enhanced tracking: {log_entry.strip()}")
         except Exception as e:
             print(f"❌ Enhanced tracking failed: {e}")
@@ -1,10 +1,118 @@
 import gspread
 from google.oauth2.service_account import Credentials
+from requests.exceptions import ConnectionError as RequestsConnectionError, ConnectTimeout
+from urllib3.exceptions import NewConnectionError
+from collections import deque
+from concurrent.futures import Future, wait
 from datetime import datetime
+import atexit
+import json
 import os
+import threading
+import time
+from sheets_quota import (
+    PRIORITY_DASHBOARD_READ,
+    PRIORITY_LIVE_WRITE,
+    QuotaExceeded,
+    is_rate_limited,
+    sheets_scheduler
+)
+from recent_activity import RecentActivity
+from tracking_schema import TRACKING_HEADERS, generate_record_id, format_timestamp
+
+# Worksheet snapshots are served as fresh for SNAPSHOT_TTL seconds. After that
+# the stale copy is still returned while a background fetch replaces it, unless
+# it is older than SNAPSHOT_MAX_STALE, in which case the caller waits.
+SNAPSHOT_TTL = 30
+SNAPSHOT_MAX_STALE = 300
+SNAPSHOT_HISTORY = 20
+
+# Refreshes read only rows past the last known count; the whole sheet is
+# re-read this often to catch manual edits and deletions
+RECONCILE_INTERVAL = 600
+
+# Rows we appended are merged into the snapshot unless a refresh that ran
+# meanwhile already fetched them; this many extra rows at its end are checked
+SNAPSHOT_MERGE_WINDOW = 1000
+
+# Session rows are buffered and written with append_rows by a background
+# thread once BATCH_SIZE rows are waiting or BATCH_INTERVAL seconds after the
+# oldest one was queued
+BATCH_SIZE = 50
+BATCH_INTERVAL = 2.0
+BATCH_RETRIES = 3
+BATCH_RETRY_BACKOFF = 1.0
+BATCH_HISTORY = 50
+
+# Connection setup runs on a background thread so importing this module never
+# blocks on the network. Until it succeeds, session rows are spooled to disk
+# and replayed through the batch writer once the sheet is ready.
+SHEET_ID = '1d_0rWHNf5p7-63kmLqbFeFq5BiWOo3pTplmt5rX5dxU'
+SPOOL_PATH = 'data/sheets_spool.jsonl'
+CONNECT_RETRY_INTERVAL = 30
+MAX_CONNECT_RETRY_INTERVAL = 300
+
+STATE_PENDING = 'pending'
+STATE_CONNECTING = 'connecting'
+STATE_READY = 'ready'
+STATE_RETRYING = 'retrying'
+STATE_DISABLED = 'disabled'  # no credentials; CSV tracking only
+
+# Last tracking column in A1 notation ('O' for the 15 tracking headers)
+LAST_COLUMN = gspread.utils.rowcol_to_a1(1, len(TRACKING_HEADERS)).rstrip('0123456789')
+
+
+def count_interactions(rows):
+    """Session, chat and playground counts for data rows"""
+    chat_interactions = 0
+    playground_interactions = 0
+    for row in rows:
+        # Check for chat interactions
+        if any(row[i] for i in range(10, 15) if i < len(row)):  # chat-bubble columns
+            chat_interactions += 1
+        
+        # Check for playground interactions
+        if len(row) > 3 and row[3]:  # playground-convo-id
+            playground_interactions += 1
+    
+    return {
+        'total_sessions': len(rows),
+        'chat_interactions': chat_interactions,
+        'playground_interactions': playground_interactions
+    }
+
+
+def never_sent(error):
+    """True if a failed call provably didn't reach the API, so resending can't duplicate it"""
+    if isinstance(error, (QuotaExceeded, ConnectTimeout)) or is_rate_limited(error):
+        return True
+    if isinstance(error, RequestsConnectionError):
+        # requests wraps urllib3's MaxRetryError, whose reason is the original error
+        reason = error.args[0] if error.args else None
+        return isinstance(getattr(reason, 'reason', reason), NewConnectionError)
+    return False
+
+
+def timed_call(func, *args):
+    """Return (func(*args), seconds spent in the call itself)"""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def add_stats(stats, other):
+    return {key: stats[key] + other[key] for key in stats}
+
+
+def subtract_stats(stats, other):
+    return {key: stats[key] - other[key] for key in stats}
+
 
 class GoogleSheetsTracker:
-    def __init__(self):
+    def __init__(self, snapshot_ttl=SNAPSHOT_TTL, snapshot_max_stale=SNAPSHOT_MAX_STALE,
+                 reconcile_interval=RECONCILE_INTERVAL, batch_size=BATCH_SIZE,
+                 batch_interval=BATCH_INTERVAL, scheduler=None, spool_path=SPOOL_PATH,
+                 connect_in_background=True, client_factory=None):
         # Google Sheets API setup
         self.scope = [
             'https://spreadsheets.google.com/feeds',
@@ -15,78 +123,574 @@ class GoogleSheetsTracker:
         # Path to your credentials file (you'll need to add this)
         self.credentials_path = 'credentials.json'
         
+        # Builds the gspread client; tests and benchmarks pass a fake here
+        self.client_factory = client_factory
+        
         # Initialize the tracker
         self.client = None
         self.sheet = None
-        self.initialize_sheets()
+        
+        # Every API call is queued against the shared read/write quotas
+        self.scheduler = scheduler or sheets_scheduler
+        
+        # Shared worksheet snapshot that all readers compute from
+        self.snapshot_ttl = snapshot_ttl
+        self.snapshot_max_stale = snapshot_max_stale
+        self.reconcile_interval = reconcile_interval
+        self.snapshot = None
+        self.snapshot_lock = threading.Lock()
+        self.refreshing = False
+        # Newest rows as dicts, kept in step with the snapshot for get_recent_data
+        self.recent = RecentActivity()
+        self.snapshot_metrics = {
+            'fetches': 0,
+            'failed_fetches': 0,
+            'background_refreshes': 0,
+            'full_fetches': 0,
+            'incremental_fetches': 0,
+            'rows_fetched': 0,
+            'fresh_hits': 0,
+            'stale_hits': 0,
+            'shed_refreshes': 0,
+            'total_fetch_seconds': 0.0,
+            'recent_fetches': deque(maxlen=SNAPSHOT_HISTORY)
+        }
+        
+        # Buffered session rows waiting for the batch writer
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.write_queue = []
+        self.write_condition = threading.Condition()
+        self.writer_thread = None
+        self.writes_in_flight = 0
+        self.flush_requested = False
+        self.write_metrics = {
+            'rows_queued': 0,
+            'rows_written': 0,
+            'rows_failed': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'api_calls': 0,
+            'retries': 0,
+            'landed_checks': 0,
+            'max_queue_depth': 0,
+            'total_flush_seconds': 0.0,
+            'max_flush_seconds': 0.0,
+            'recent_batches': deque(maxlen=BATCH_HISTORY)
+        }
+        atexit.register(self.flush)
+        
+        # Readiness of the background connection and its startup timing
+        self.state = STATE_PENDING
+        self.settled = threading.Event()  # set once ready or disabled
+        self.created_at = time.monotonic()
+        self.startup = {
+            'attempts': 0,
+            'connect_seconds': None,
+            'ready_after_seconds': None,
+            'ready_at': None,
+            'last_error': None
+        }
+        self.spool_path = spool_path
+        self.spool_lock = threading.Lock()
+        self.spool_futures = {}
+        
+        if connect_in_background:
+            threading.Thread(target=self.connect_loop, name='sheets-connect', daemon=True).start()
+        else:
+            self.connect_loop()
+    
+    def connect_loop(self):
+        """Connect to the sheet, retrying with backoff, then replay the spool"""
+        delay = CONNECT_RETRY_INTERVAL
+        while not self.initialize_sheets():
+            if self.state == STATE_DISABLED:
+                return
+            print(f"🔁 Retrying Google Sheets connection in {delay}s")
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_CONNECT_RETRY_INTERVAL)
+        self.drain_spool()
+    
+    def wait_until_ready(self, timeout=None):
+        """Block until the connection is up (True) or known to be unavailable"""
+        self.settled.wait(timeout)
+        return self.state == STATE_READY
+    
+    def status(self):
+        """Connection state, startup timing and spool size"""
+        return dict(
+            self.startup,
+            state=self.state,
+            ready=self.state == STATE_READY,
+            spooled_rows=self.spooled_rows()
+        )
     
     def initialize_sheets(self):
-        """Initialize Google Sheets connection"""
+        """Initialize Google Sheets connection; returns True once it is ready"""
+        if self.client_factory is None and not os.path.exists(self.credentials_path):
+            print("⚠️  credentials.json not found. Using fallback CSV tracking.")
+            self.client = None
+            self.state = STATE_DISABLED
+            self.settled.set()
+            return False
+        
+        self.state = STATE_CONNECTING
+        self.startup['attempts'] += 1
+        started = time.perf_counter()
         try:
-            if os.path.exists(self.credentials_path):
+            if self.client_factory is not None:
+                client = self.client_factory()
+            else:
                 creds = Credentials.from_service_account_file(
                     self.credentials_path, 
                     scopes=self.scope
                 )
-                self.client = gspread.authorize(creds)
-                
-                # Open the spreadsheet using direct sheet ID
-                sheet_id = '1d_0rWHNf5p7-63kmLqbFeFq5BiWOo3pTplmt5rX5dxU'
-                self.sheet = self.client.open_by_key(sheet_id)
-                
-                # Get the first worksheet
-                self.worksheet = self.sheet.get_worksheet(0)
-                
-                # Set up headers if sheet is empty
-                if not self.worksheet.get_all_values():
-                    self.setup_headers()
-                
-                print(f"✅ Google Sheets connected: {self.sheet.url}")
-                
-            else:
-                print("⚠️  credentials.json not found. Using fallback CSV tracking.")
-                self.client = None
-                
+                client = gspread.authorize(creds)
+            
+            # Open the spreadsheet using direct sheet ID. Setup calls use the
+            # live-write priority since queued session writes wait on them.
+            self.sheet = self.scheduler.read(PRIORITY_LIVE_WRITE, client.open_by_key, SHEET_ID)
+            
+            # Get the first worksheet
+            self.worksheet = self.scheduler.read(PRIORITY_LIVE_WRITE, self.sheet.get_worksheet, 0)
+            
+            # Set up headers if sheet is empty (this also primes the snapshot)
+            if not self.fetch_snapshot(full=True)['values']:
+                self.setup_headers()
+            
+            # Only now do readers and writers see the connection
+            self.client = client
+            connect_seconds = time.perf_counter() - started
+            self.startup.update({
+                'connect_seconds': round(connect_seconds, 3),
+                'ready_after_seconds': round(time.monotonic() - self.created_at, 3),
+                'ready_at': format_timestamp(),
+                'last_error': None
+            })
+            self.state = STATE_READY
+            self.settled.set()
+            print(f"✅ Google Sheets connected in {connect_seconds:.2f}s: {self.sheet.url}")
+            return True
+            
         except Exception as e:
             print(f"❌ Error initializing Google Sheets: {e}")
             self.client = None
+            self.state = STATE_RETRYING
+            self.startup['last_error'] = str(e)
+            return False
     
     def setup_headers(self):
         """Set up the headers for the tracking sheet"""
-        headers = [
-            'user-id',
-            'start-time',
-            'end-time',
-            'playground-convo-id',
-            'playground-mess-target',
-            'playground-mess-description',
-            'playground-step1',
-            'playground-mess-team',
-            'playground-mess-timeline',
-            'playground-step2',
-            'chat-bubble-1',
-            'chat-bubble-2',
-            'chat-bubble-3',
-            'chat-bubble-4',
-            'chat-bubble-free'
-        ]
+        headers = TRACKING_HEADERS
         
-        self.worksheet.append_row(headers)
+        self.scheduler.write(PRIORITY_LIVE_WRITE, self.worksheet.append_row, headers)
+        self.add_to_snapshot([list(headers)])
         print("📋 Headers set up in Google Sheet")
     
+    def fetch_snapshot(self, full=None):
+        """Bring the materialized worksheet copy up to date and return it
+        
+        Normally only rows past the last known row count are read, via an A1
+        range. The whole sheet is read when there is no copy yet or when a
+        full reconciliation is due, so manual edits and deletions are picked up.
+        """
+        with self.snapshot_lock:
+            base = self.snapshot
+        if full is None:
+            full = (base is None or not base['values']
+                    or time.monotonic() - base['reconciled_at'] >= self.reconcile_interval)
+        
+        try:
+            if full:
+                fetched, fetch_seconds = self.scheduler.read(
+                    PRIORITY_DASHBOARD_READ, timed_call, self.worksheet.get_all_values
+                )
+            else:
+                known_rows = len(base['values'])
+                fetched, fetch_seconds = self.scheduler.read(
+                    PRIORITY_DASHBOARD_READ, timed_call, self.worksheet.get, f"A{known_rows + 1}:{LAST_COLUMN}"
+                )
+        except Exception:
+            with self.snapshot_lock:
+                self.snapshot_metrics['failed_fetches'] += 1
+            raise
+        fetched = [list(row) for row in fetched]
+        
+        with self.snapshot_lock:
+            now = time.monotonic()
+            if full:
+                values = fetched
+                stats = count_interactions(values[1:])
+                reconciled_at = now
+            else:
+                # Rows fetched by position replace anything added locally past
+                # known_rows while the read was in flight
+                current = self.snapshot or base
+                values = current['values'][:known_rows] + fetched
+                stats = add_stats(
+                    subtract_stats(current['stats'], count_interactions(current['values'][known_rows:])),
+                    count_interactions(fetched)
+                )
+                reconciled_at = current['reconciled_at']
+            
+            snapshot = {
+                'values': values,
+                'stats': stats,
+                'fetched_at': now,
+                'fetched_at_iso': format_timestamp(),
+                'fetch_seconds': fetch_seconds,
+                'reconciled_at': reconciled_at,
+                'rows': max(0, len(values) - 1)
+            }
+            self.snapshot = snapshot
+            # An emptied sheet empties the buffer too
+            self.recent.replace(self.recent_record(values[0], row) for row in values[1:][-self.recent.capacity:])
+            metrics = self.snapshot_metrics
+            metrics['fetches'] += 1
+            metrics['full_fetches' if full else 'incremental_fetches'] += 1
+            metrics['rows_fetched'] += len(fetched)
+            metrics['total_fetch_seconds'] += fetch_seconds
+            metrics['recent_fetches'].append({
+                'kind': 'full' if full else 'incremental',
+                'fetched_at': snapshot['fetched_at_iso'],
+                'fetch_seconds': round(fetch_seconds, 4),
+                'rows_fetched': len(fetched),
+                'rows': snapshot['rows']
+            })
+        return snapshot
+    
+    def refresh_in_background(self):
+        """Start a background fetch unless one is already running"""
+        with self.snapshot_lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+            self.snapshot_metrics['background_refreshes'] += 1
+    
+        def refresh():
+            try:
+                self.fetch_snapshot()
+            except Exception as e:
+                print(f"⚠️  Background sheet refresh failed, keeping stale snapshot: {e}")
+            finally:
+                with self.snapshot_lock:
+                    self.refreshing = False
+        
+        threading.Thread(target=refresh, name='sheets-snapshot-refresh', daemon=True).start()
+    
+    def current_snapshot(self):
+        """The shared snapshot dict, refreshed according to the TTL rules"""
+        with self.snapshot_lock:
+            snapshot = self.snapshot
+            age = time.monotonic() - snapshot['fetched_at'] if snapshot else None
+            if snapshot and age < self.snapshot_ttl:
+                self.snapshot_metrics['fresh_hits'] += 1
+                return snapshot
+            if snapshot and age < self.snapshot_max_stale:
+                self.snapshot_metrics['stale_hits'] += 1
+        
+        if snapshot and age < self.snapshot_max_stale:
+            self.refresh_in_background()
+            return snapshot
+        try:
+            return self.fetch_snapshot()
+        except QuotaExceeded:
+            if snapshot is None:
+                raise
+            # Read quota is saturated; an old snapshot beats an error
+            with self.snapshot_lock:
+                self.snapshot_metrics['shed_refreshes'] += 1
+            return snapshot
+    
+    def get_snapshot(self):
+        """Worksheet values (header row first) from the shared snapshot
+        
+        Treat the returned rows as read-only; they are shared between callers.
+        """
+        return self.current_snapshot()['values']
+    
+    def add_to_snapshot(self, rows):
+        """Reflect rows we just appended without refetching the sheet
+        
+        A refresh running between the append and this call may already have
+        fetched some of them, so rows whose ID is in the snapshot's tail are skipped.
+        """
+        with self.snapshot_lock:
+            if self.snapshot is None:
+                return
+            current = self.snapshot['values']
+            tail = current[-(len(rows) + SNAPSHOT_MERGE_WINDOW):]
+            seen = {row[0] for row in tail if row}
+            rows = [row for row in rows if not row or row[0] not in seen]
+            if not rows:
+                return
+            # Copy on write so readers holding the old list are unaffected
+            values = current + rows
+            data_rows = rows if current else rows[1:]
+            stats = add_stats(self.snapshot['stats'], count_interactions(data_rows))
+            for row in data_rows:
+                self.recent.append(self.recent_record(values[0], row))
+            self.snapshot = dict(self.snapshot, values=values, stats=stats, rows=max(0, len(values) - 1))
+    
+    def invalidate_snapshot(self):
+        """Force the next read to fetch the whole sheet"""
+        with self.snapshot_lock:
+            self.snapshot = None
+    
+    def snapshot_stats(self):
+        """Fetch-time and hit metrics for the worksheet snapshot"""
+        with self.snapshot_lock:
+            metrics = dict(self.snapshot_metrics, recent_fetches=list(self.snapshot_metrics['recent_fetches']))
+            snapshot = self.snapshot
+            refreshing = self.refreshing
+        now = time.monotonic()
+        metrics['total_fetch_seconds'] = round(metrics['total_fetch_seconds'], 4)
+        metrics['avg_fetch_seconds'] = round(metrics['total_fetch_seconds'] / metrics['fetches'], 4) if metrics['fetches'] else None
+        metrics['refreshing'] = refreshing
+        metrics['ttl_seconds'] = self.snapshot_ttl
+        metrics['max_stale_seconds'] = self.snapshot_max_stale
+        metrics['reconcile_interval_seconds'] = self.reconcile_interval
+        metrics['current'] = {
+            'rows': snapshot['rows'],
+            'fetched_at': snapshot['fetched_at_iso'],
+            'fetch_seconds': round(snapshot['fetch_seconds'], 4),
+            'age_seconds': round(now - snapshot['fetched_at'], 2),
+            'since_reconcile_seconds': round(now - snapshot['reconciled_at'], 2)
+        } if snapshot else None
+        return metrics
+    
+    def queue_row(self, row):
+        """Buffer a row for the batch writer and return a Future for its write"""
+        future = Future()
+        with self.write_condition:
+            if self.writer_thread is None or not self.writer_thread.is_alive():
+                self.writer_thread = threading.Thread(target=self.write_loop, name='sheets-batch-writer', daemon=True)
+                self.writer_thread.start()
+            self.write_queue.append((row, future, time.monotonic()))
+            self.write_metrics['rows_queued'] += 1
+            self.write_metrics['max_queue_depth'] = max(self.write_metrics['max_queue_depth'], len(self.write_queue))
+            self.write_condition.notify_all()
+        return future
+    
+    def write_loop(self):
+        """Background thread: wait for a full batch or the interval, then write"""
+        while True:
+            with self.write_condition:
+                while not self.write_queue:
+                    self.write_condition.wait()
+                while len(self.write_queue) < self.batch_size and not self.flush_requested:
+                    remaining = self.batch_interval - (time.monotonic() - self.write_queue[0][2])
+                    if remaining <= 0:
+                        break
+                    self.write_condition.wait(remaining)
+                batch = self.write_queue[:self.batch_size]
+                del self.write_queue[:self.batch_size]
+                self.writes_in_flight += 1
+            try:
+                self.write_batch(batch)
+            finally:
+                with self.write_condition:
+                    self.writes_in_flight -= 1
+                    if not self.write_queue and not self.writes_in_flight:
+                        self.flush_requested = False
+                    self.write_condition.notify_all()
+    
+    def write_batch(self, batch):
+        """Append a batch of rows in one API call, retrying failures with backoff
+        
+        429s are retried by the scheduler; this loop covers other errors.
+        Only failures that mean the rows were never sent are resent blindly.
+        After any other error (a 5xx or timeout can arrive after the append
+        was applied) the sheet is checked for the batch's last ID first, so a
+        retry never duplicates rows.
+        """
+        rows = [row for row, _, _ in batch]
+        started = time.perf_counter()
+        error = None
+        unconfirmed = False  # an earlier attempt may have been applied
+        for attempt in range(BATCH_RETRIES):
+            if attempt:
+                time.sleep(BATCH_RETRY_BACKOFF * 2 ** (attempt - 1))
+            try:
+                if unconfirmed:
+                    landed = self.batch_landed(rows)
+                    unconfirmed = False
+                    if landed:
+                        error = None
+                        break
+                with self.write_condition:
+                    self.write_metrics['api_calls'] += 1
+                    if attempt:
+                        self.write_metrics['retries'] += 1
+                self.scheduler.write(PRIORITY_LIVE_WRITE, self.worksheet.append_rows, rows)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                unconfirmed = unconfirmed or not never_sent(e)
+        if error is not None and unconfirmed:
+            # Out of retries, but the rows may be there; don't report a write that happened as failed
+            try:
+                if self.batch_landed(rows):
+                    error = None
+            except Exception as e:
+                print(f"⚠️  Could not check whether the batch reached Google Sheets: {e}")
+        flush_seconds = time.perf_counter() - started
+        
+        if error is None:
+            self.add_to_snapshot(rows)
+        
+        with self.write_condition:
+            metrics = self.write_metrics
+            metrics['batches'] += 1
+            metrics['total_flush_seconds'] += flush_seconds
+            metrics['max_flush_seconds'] = max(metrics['max_flush_seconds'], flush_seconds)
+            metrics['recent_batches'].append({
+                'rows': len(rows),
+                'flush_seconds': round(flush_seconds, 4),
+                'ok': error is None
+            })
+            if error is None:
+                metrics['rows_written'] += len(rows)
+            else:
+                metrics['failed_batches'] += 1
+                metrics['rows_failed'] += len(rows)
+        
+        if error is None:
+            print(f"📊 Wrote {len(rows)} session rows to Google Sheets in {flush_seconds:.2f}s")
+            for row, future, _ in batch:
+                future.set_result(row[0])
+        else:
+            print(f"❌ Error writing {len(rows)} rows to Google Sheets: {error}")
+            for _, future, _ in batch:
+                future.set_exception(error)
+    
+    def batch_landed(self, rows):
+        """Whether an append that failed ambiguously reached the sheet (checks the last row's ID)"""
+        with self.write_condition:
+            self.write_metrics['landed_checks'] += 1
+        ids = self.scheduler.read(PRIORITY_LIVE_WRITE, self.worksheet.get, 'A:A')
+        landed = [rows[-1][0]] in ids
+        if landed:
+            print(f"ℹ️  Batch of {len(rows)} rows had reached Google Sheets; not resending")
+        return landed
+    
+    def flush(self, timeout=30):
+        """Write everything queued so far; returns False if it timed out"""
+        deadline = time.monotonic() + timeout
+        with self.write_condition:
+            if not self.write_queue and not self.writes_in_flight:
+                return True
+            self.flush_requested = True
+            self.write_condition.notify_all()
+            while self.write_queue or self.writes_in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.write_condition.wait(remaining)
+        return True
+    
+    def write_stats(self):
+        """Batch size, flush latency and rows-per-call metrics for session writes"""
+        with self.write_condition:
+            metrics = dict(self.write_metrics, recent_batches=list(self.write_metrics['recent_batches']))
+            metrics['queue_depth'] = len(self.write_queue)
+            metrics['in_flight'] = self.writes_in_flight
+        batches = metrics['batches']
+        metrics['avg_batch_size'] = round((metrics['rows_written'] + metrics['rows_failed']) / batches, 2) if batches else None
+        metrics['avg_flush_seconds'] = round(metrics['total_flush_seconds'] / batches, 4) if batches else None
+        metrics['rows_per_api_call'] = round(metrics['rows_written'] / metrics['api_calls'], 2) if metrics['api_calls'] else None
+        metrics['total_flush_seconds'] = round(metrics['total_flush_seconds'], 4)
+        metrics['max_flush_seconds'] = round(metrics['max_flush_seconds'], 4)
+        metrics['batch_size'] = self.batch_size
+        metrics['batch_interval_seconds'] = self.batch_interval
+        return metrics
+    
+    def spool_row(self, row):
+        """Keep a row on disk until the connection is ready"""
+        with self.spool_lock:
+            if self.client is not None:
+                # Connected while the row was being built
+                return self.queue_row(row)
+            spool_dir = os.path.dirname(self.spool_path)
+            if spool_dir:
+                os.makedirs(spool_dir, exist_ok=True)
+            with open(self.spool_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(row) + '\n')
+            future = Future()
+            self.spool_futures[row[0]] = future
+        print(f"📥 Google Sheets {self.state}; spooled session {row[0]}")
+        return future
+    
+    def spooled_rows(self):
+        count = 0
+        for path in (self.spool_path, f"{self.spool_path}.draining"):
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    count += sum(1 for line in f if line.strip())
+        return count
+    
+    def drain_spool(self):
+        """Replay spooled rows through the batch writer once connected
+        
+        The spool is renamed before replay, so rows spooled concurrently go to
+        a new file; rows that fail to write stay in the .draining file and are
+        retried on the next connection.
+        """
+        draining_path = f"{self.spool_path}.draining"
+        with self.spool_lock:
+            if os.path.exists(self.spool_path):
+                if os.path.exists(draining_path):
+                    with open(self.spool_path, 'r', encoding='utf-8') as src, open(draining_path, 'a', encoding='utf-8') as dst:
+                        dst.write(src.read())
+                    os.remove(self.spool_path)
+                else:
+                    os.replace(self.spool_path, draining_path)
+            if not os.path.exists(draining_path):
+                return 0
+            rows = []
+            with open(draining_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        continue  # torn write from a crash
+            waiting = self.spool_futures
+            self.spool_futures = {}
+        
+        def forward(done, target):
+            if done.exception():
+                target.set_exception(done.exception())
+            else:
+                target.set_result(done.result())
+        
+        futures = []
+        for row in rows:
+            future = self.queue_row(row)
+            caller_future = waiting.pop(row[0], None)
+            if caller_future is not None:
+                future.add_done_callback(lambda done, target=caller_future: forward(done, target))
+            futures.append(future)
+        wait(futures)
+        
+        failed = [row for row, future in zip(rows, futures) if future.exception()]
+        with self.spool_lock:
+            if failed:
+                with open(draining_path, 'w', encoding='utf-8') as f:
+                    f.writelines(json.dumps(row) + '\n' for row in failed)
+            else:
+                os.remove(draining_path)
+        print(f"📤 Replayed {len(rows) - len(failed)} spooled sessions to Google Sheets"
+              + (f" ({len(failed)} kept for retry)" if failed else ""))
+        return len(rows) - len(failed)
+    
     def generate_user_id(self):
-        """Generate a unique user ID"""
-        timestamp = int(datetime.now().timestamp() * 1000)
-        random_num = hash(str(timestamp)) % 1000
-        return f"{timestamp}{random_num}"[-6:]
+        """Generate a unique, time-ordered user ID (ULID)"""
+        return generate_record_id()
     
     def format_date_time(self, date):
-        """Format datetime for display"""
-        hours = date.strftime('%H:%M')
-        day = date.strftime('%d')
-        month_abbr = date.strftime('%b')
-        year = date.strftime('%y')
-        return f"{hours} - {day}{month_abbr}{year}"
+        """Format datetime as sortable ISO-8601 UTC"""
+        return format_timestamp(date)
     
     def escape_value(self, value):
         """Escape and format values for Google Sheets"""
@@ -103,9 +707,18 @@ class GoogleSheetsTracker:
         return value_str
     
     def record_user_session(self, session_data):
-        """Record user session to Google Sheets"""
+        """Queue a user session for Google Sheets and return its user ID
+        
+        The row is written by the batch writer; use submit_user_session to get
+        a Future for the write itself.
+        """
+        future = self.submit_user_session(session_data)
+        return future.user_id if future else None
+    
+    def submit_user_session(self, session_data):
+        """Queue a user session and return a Future resolving to its user ID once written"""
         try:
-            if self.client is None:
+            if self.state == STATE_DISABLED:
                 print("⚠️  Google Sheets not available, skipping recording")
                 return None
             
@@ -135,11 +748,14 @@ class GoogleSheetsTracker:
                 self.escape_value(session_data.get('chat_bubble_free'))
             ]
             
-            # Append to Google Sheet
-            self.worksheet.append_row(row)
-            
-            print(f"📊 User session recorded to Google Sheets: {user_id}")
-            return user_id
+            # Buffer for the next append_rows batch, or spool until connected
+            if self.client is None:
+                future = self.spool_row(row)
+            else:
+                future = self.queue_row(row)
+                print(f"📊 User session queued for Google Sheets: {user_id}")
+            future.user_id = user_id
+            return future
             
         except Exception as e:
             print(f"❌ Error recording to Google Sheets: {e}")
@@ -151,13 +767,26 @@ class GoogleSheetsTracker:
             return self.sheet.url
         return None
     
+    @staticmethod
+    def recent_record(headers, row):
+        """A sheet row as a dict keyed by the header row"""
+        # Pad row if it's shorter than headers (without touching the shared snapshot)
+        row = row + [''] * (len(headers) - len(row))
+        return dict(zip(headers, row))
+    
     def get_recent_data(self, limit=10):
         """Get recent data from the sheet"""
         try:
             if self.client is None:
                 return []
             
-            all_values = self.worksheet.get_all_values()
+            # Goes through the snapshot TTL rules first, so a stale copy is
+            # refreshed; the buffer is re-seeded by every snapshot fetch and
+            # extended by every appended row
+            all_values = self.get_snapshot()
+            if limit <= self.recent.capacity:
+                return self.recent.latest(limit)
+            
             if len(all_values) <= 1:  # Only headers
                 return []
             
@@ -172,13 +801,7 @@ class GoogleSheetsTracker:
             recent_data = []
             
             for row in recent_rows:
-                # Pad row if it's shorter than headers
-                while len(row) < len(headers):
-                    row.append('')
-                
-                # Create dictionary
-                row_dict = dict(zip(headers, row))
-                recent_data.append(row_dict)
+                recent_data.append(self.recent_record(headers, row))
             
             return recent_data
             
@@ -196,36 +819,8 @@ class GoogleSheetsTracker:
                     'playground_interactions': 0
                 }
             
-            all_values = self.worksheet.get_all_values()
-            if len(all_values) <= 1:  # Only headers
-                return {
-                    'total_sessions': 0,
-                    'chat_interactions': 0,
-                    'playground_interactions': 0
-                }
-            
-            # Get data rows (skip header)
-            data_rows = all_values[1:]
-            total_sessions = len(data_rows)
-            
-            # Count interactions
-            chat_interactions = 0
-            playground_interactions = 0
-            
-            for row in data_rows:
-                # Check for chat interactions
-                if any(row[i] for i in range(10, 15) if i < len(row)):  # chat-bubble columns
-                    chat_interactions += 1
-                
-                # Check for playground interactions
-                if len(row) > 3 and row[3]:  # playground-convo-id
-                    playground_interactions += 1
-            
-            return {
-                'total_sessions': total_sessions,
-                'chat_interactions': chat_interactions,
-                'playground_interactions': playground_interactions
-            }
+            # Counts are kept up to date as rows are merged into the snapshot
+            return dict(self.current_snapshot()['stats'])
             
         except Exception as e:
             print(f"❌ Error getting statistics: {e}")
@@ -235,5 +830,9 @@ class GoogleSheetsTracker:
                 'playground_interactions': 0
             }
 
-# Create global instance
-sheets_tracker = GoogleSheetsTracker() 
\ No newline at end of file
+# Create global instance (SHEETS_FAKE=1 runs against the in-process fake API)
+if os.environ.get('SHEETS_FAKE'):
+    from fake_gspread import FakeClient
+    sheets_tracker = GoogleSheetsTracker(client_factory=FakeClient.from_env)
+else:
+    sheets_tracker = GoogleSheetsTracker() 
\ No newline at end of file
@@ -0,0 +1,249 @@
+"""
+Heavy-hitter sketches for top-K value counts
+
+SpaceSaving keeps at most `capacity` counters. A value that isn't tracked
+takes over the smallest counter and inherits its count as error, so every
+reported count is an overestimate by at most its error, and any value seen
+more than N / capacity times is guaranteed to be tracked.
+
+CountMinSketch answers "how often did this value occur" for any value in
+depth x width counters: estimates never undercount and, with probability
+1 - e**-depth, overcount by at most e / width * N.
+
+Both use fixed memory however many distinct values the stream has.
+BucketedTopK keeps one SpaceSaving per time bucket so top-K lists can be
+answered for a window by merging the buckets it covers.
+"""
+
+import base64
+import hashlib
+import heapq
+import math
+import zlib
+from array import array
+
+DEFAULT_CAPACITY = 64
+DEFAULT_WIDTH = 2048
+DEFAULT_DEPTH = 4
+
+
+class SpaceSaving:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        self.counters = {}  # value -> [count, error]
+        self.heap = []  # (count, value), with stale entries skipped lazily
+
+    def add(self, value, weight=1):
+        """Count value; returns the value it evicted, if any"""
+        self.total += weight
+        evicted = None
+        counter = self.counters.get(value)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            counter = self.counters[value] = [weight, 0]
+        else:
+            evicted = self.pop_smallest()
+            floor = self.counters.pop(evicted)[0]
+            counter = self.counters[value] = [floor + weight, floor]
+        heapq.heappush(self.heap, (counter[0], value))
+        if len(self.heap) > 4 * self.capacity + 64:
+            self.heap = [(count, item) for item, (count, _) in self.counters.items()]
+            heapq.heapify(self.heap)
+        return evicted
+
+    def pop_smallest(self):
+        while True:
+            count, value = heapq.heappop(self.heap)
+            counter = self.counters.get(value)
+            if counter is not None and counter[0] == count:
+                return value
+
+    def min_count(self):
+        """Largest count an untracked value could have"""
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def top(self, limit=10):
+        """[(value, count, error)] by count; count - error is a guaranteed lower bound"""
+        ranked = sorted(self.counters.items(), key=lambda item: (-item[1][0], item[0]))
+        return [(value, count, error) for value, (count, error) in ranked[:limit]]
+
+    def ranked(self, limit=10):
+        """Top values with counts, error bounds and whether their rank is certain"""
+        ranked = self.top(limit + 1)
+        values = []
+        for index, (value, count, error) in enumerate(ranked[:limit]):
+            runner_up = ranked[index + 1][1] if index + 1 < len(ranked) else self.min_count()
+            values.append({
+                'value': value,
+                'count': count,
+                'error': error,
+                'guaranteed': count - error >= runner_up
+            })
+        return {
+            'values': values,
+            'total': self.total,
+            'max_error': self.min_count(),
+            'capacity': self.capacity
+        }
+
+    def merge(self, other):
+        """Fold another summary in (counts of values missing on one side are bounded by its min)"""
+        own_floor, other_floor = self.min_count(), other.min_count()
+        merged = {}
+        for value in set(self.counters) | set(other.counters):
+            count, error = self.counters.get(value, [own_floor, own_floor])
+            other_count, other_error = other.counters.get(value, [other_floor, other_floor])
+            merged[value] = [count + other_count, error + other_error]
+        kept = sorted(merged.items(), key=lambda item: (-item[1][0], item[0]))[:self.capacity]
+        self.counters = {value: counter for value, counter in kept}
+        self.total += other.total
+        self.heap = [(count, value) for value, (count, _) in self.counters.items()]
+        heapq.heapify(self.heap)
+        return self
+
+    def to_dict(self):
+        return {
+            'capacity': self.capacity,
+            'total': self.total,
+            'counters': [[value, count, error] for value, (count, error) in self.counters.items()]
+        }
+
+    @classmethod
+    def from_counts(cls, counts, capacity=DEFAULT_CAPACITY):
+        """Summary of exact counts: the largest are kept exactly, the rest are below their minimum"""
+        kept = heapq.nlargest(capacity, counts.items(), key=lambda item: item[1])
+        return cls.from_dict({
+            'capacity': capacity,
+            'total': sum(counts.values()),
+            'counters': [[value, count, 0] for value, count in kept]
+        })
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls(data['capacity'])
+        summary.total = data['total']
+        summary.counters = {value: [count, error] for value, count, error in data['counters']}
+        summary.heap = [(count, value) for value, (count, _) in summary.counters.items()]
+        heapq.heapify(summary.heap)
+        return summary
+
+
+class CountMinSketch:
+    def __init__(self, width=DEFAULT_WIDTH, depth=DEFAULT_DEPTH, tables=None):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.tables = tables or [array('I', bytes(4 * width)) for _ in range(depth)]
+
+    def positions(self, value):
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        return [(first + row * second) % self.width for row in range(self.depth)]
+
+    def add(self, value, weight=1):
+        """Conservative update: only raise counters that are below the new estimate"""
+        self.total += weight
+        positions = self.positions(value)
+        estimate = min(table[position] for table, position in zip(self.tables, positions)) + weight
+        for table, position in zip(self.tables, positions):
+            if table[position] < estimate:
+                table[position] = estimate
+
+    def estimate(self, value):
+        return min(table[position] for table, position in zip(self.tables, self.positions(value)))
+
+    def error_bound(self):
+        """(epsilon * N, confidence) for estimate()"""
+        return math.e / self.width * self.total, 1 - math.exp(-self.depth)
+
+    def to_dict(self):
+        raw = b''.join(table.tobytes() for table in self.tables)
+        return {
+            'width': self.width,
+            'depth': self.depth,
+            'total': self.total,
+            'tables': base64.b64encode(zlib.compress(raw)).decode('ascii')
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        raw = zlib.decompress(base64.b64decode(data['tables']))
+        size = 4 * data['width']
+        tables = [array('I', raw[index * size:(index + 1) * size]) for index in range(data['depth'])]
+        sketch = cls(data['width'], data['depth'], tables)
+        sketch.total = data['total']
+        return sketch
+
+
+class BucketedTopK:
+    """A SpaceSaving summary overall and per time bucket, plus a Count-Min sketch
+
+    key_format is the strftime format of a bucket key (e.g. '%Y-%m-%d').
+    """
+
+    def __init__(self, key_format='%Y-%m-%d', capacity=DEFAULT_CAPACITY):
+        self.key_format = key_format
+        self.capacity = capacity
+        self.total = SpaceSaving(capacity)
+        self.frequencies = CountMinSketch()
+        self.buckets = {}
+
+    def add(self, value, occurred=None):
+        self.total.add(value)
+        self.frequencies.add(value)
+        if occurred is not None:
+            key = occurred.strftime(self.key_format)
+            summary = self.buckets.get(key)
+            if summary is None:
+                summary = self.buckets[key] = SpaceSaving(self.capacity)
+            summary.add(value)
+
+    def window(self, since=None, until=None):
+        """SpaceSaving summary for [since, until), aligned to bucket edges"""
+        if since is None and until is None:
+            return self.total
+        low = since.strftime(self.key_format) if since else None
+        high = until.strftime(self.key_format) if until else None
+        merged = SpaceSaving(self.capacity)
+        for key, summary in self.buckets.items():
+            if (low is None or key >= low) and (high is None or key < high):
+                merged.merge(summary)
+        return merged
+
+    def top(self, limit=10, since=None, until=None):
+        """Top values with counts, error bounds and whether their rank is certain"""
+        return self.window(since, until).ranked(limit)
+
+    def prune(self, before):
+        """Drop buckets that end before the datetime before (the overall summary keeps their counts)"""
+        cutoff = before.strftime(self.key_format)
+        for key in [key for key in self.buckets if key < cutoff]:
+            del self.buckets[key]
+
+    def estimate(self, value):
+        """Count-Min frequency estimate for any value, with its error bound"""
+        bound, confidence = self.frequencies.error_bound()
+        return {'count': self.frequencies.estimate(value), 'max_error': int(math.ceil(bound)),
+                'confidence': round(confidence, 4)}
+
+    def to_dict(self):
+        return {
+            'key_format': self.key_format,
+            'capacity': self.capacity,
+            'total': self.total.to_dict(),
+            'frequencies': self.frequencies.to_dict(),
+            'buckets': {key: summary.to_dict() for key, summary in self.buckets.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['key_format'], data['capacity'])
+        sketch.total = SpaceSaving.from_dict(data['total'])
+        sketch.frequencies = CountMinSketch.from_dict(data['frequencies'])
+        sketch.buckets = {key: SpaceSaving.from_dict(value) for key, value in data['buckets'].items()}
+        return sketch
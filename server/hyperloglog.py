@@ -0,0 +1,181 @@
+"""
+HyperLogLog cardinality sketches
+
+A sketch with precision p keeps 2**p one-byte registers and estimates the
+number of distinct values added with a relative standard error of about
+1.04 / sqrt(2**p). The default p=12 uses 4 KB and has ~1.6% standard error
+(so ~95% of estimates fall within ±3.3%), no matter how many values are added.
+Sketches with the same precision merge losslessly by taking register maxima,
+which is what makes per-bucket sketches combinable into arbitrary windows.
+Registers are NumPy uint8 arrays, so merges and estimates are vectorized.
+"""
+
+import base64
+import hashlib
+import math
+import zlib
+from datetime import datetime, timezone
+import numpy as np
+
+DEFAULT_PRECISION = 12
+
+# Window queries move to a coarser granularity rather than merge more buckets
+MAX_MERGE_BUCKETS = 120
+
+
+def standard_error(precision=DEFAULT_PRECISION):
+    """Relative standard error of a sketch with the given precision"""
+    return 1.04 / math.sqrt(1 << precision)
+
+
+class HyperLogLog:
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be between 4 and 16")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    def add(self, value):
+        """Add a value (anything with a stable str()) to the sketch"""
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        remainder = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        """Estimated number of distinct values"""
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / float(np.ldexp(1.0, -self.registers.astype(np.int32)).sum())
+
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting is more accurate here
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other):
+        """Fold another sketch into this one (union of the value sets)"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def copy(self):
+        return HyperLogLog(self.precision, self.registers.copy())
+
+    def to_dict(self):
+        return {
+            'p': self.precision,
+            'registers': base64.b64encode(zlib.compress(self.registers.tobytes())).decode('ascii')
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        registers = np.frombuffer(zlib.decompress(base64.b64decode(data['registers'])), dtype=np.uint8).copy()
+        return cls(data['p'], registers)
+
+
+class BucketedSketches:
+    """HyperLogLog sketches per time bucket at several granularities
+
+    granularities maps a name to (strftime key format, retention timedelta or
+    None), ordered finest first. Window answers are aligned to bucket edges.
+    """
+
+    def __init__(self, granularities, precision=DEFAULT_PRECISION):
+        self.granularities = granularities
+        self.precision = precision
+        self.total = HyperLogLog(precision)
+        self.buckets = {name: {} for name in granularities}
+
+    def add(self, value, occurred):
+        """Add a value seen at an aware datetime"""
+        self.total.add(value)
+        for name, (key_format, _) in self.granularities.items():
+            key = occurred.strftime(key_format)
+            sketch = self.buckets[name].get(key)
+            if sketch is None:
+                sketch = self.buckets[name][key] = HyperLogLog(self.precision)
+            sketch.add(value)
+
+    def add_to_bucket(self, name, key, value):
+        """Add a value to one bucket only (bulk loads add it to total themselves)"""
+        sketch = self.buckets[name].get(key)
+        if sketch is None:
+            sketch = self.buckets[name][key] = HyperLogLog(self.precision)
+        sketch.add(value)
+
+    def prune(self, now):
+        for name, (key_format, retention) in self.granularities.items():
+            if retention is None:
+                continue
+            cutoff = (now - retention).strftime(key_format)
+            for key in [key for key in self.buckets[name] if key < cutoff]:
+                del self.buckets[name][key]
+
+    def _keys_in_range(self, name, since, until):
+        key_format = self.granularities[name][0]
+        low = since.strftime(key_format) if since else None
+        high = until.strftime(key_format) if until else None
+        return [
+            key for key in self.buckets[name]
+            if (low is None or key >= low) and (high is None or key < high)
+        ]
+
+    def estimate(self, since=None, until=None, now=None):
+        """Estimated distinct values seen in [since, until)
+
+        Uses the finest granularity still retained for since, stepping up to a
+        coarser one when a window would need more than MAX_MERGE_BUCKETS merges.
+        """
+        if since is None and until is None:
+            return self.total.count()
+
+        now = now or datetime.now(timezone.utc)
+        names = list(self.granularities)
+        for index, name in enumerate(names):
+            retention = self.granularities[name][1]
+            if retention is not None and (since is None or now - since > retention):
+                continue
+            keys = self._keys_in_range(name, since, until)
+            if len(keys) <= MAX_MERGE_BUCKETS or index == len(names) - 1:
+                break
+
+        merged = HyperLogLog(self.precision)
+        for key in keys:
+            merged.merge(self.buckets[name][key])
+        return merged.count()
+
+    def copy(self):
+        """Independent copy, e.g. to serialize outside a lock"""
+        sketches = BucketedSketches(self.granularities, self.precision)
+        sketches.total = self.total.copy()
+        sketches.buckets = {
+            name: {key: sketch.copy() for key, sketch in buckets.items()}
+            for name, buckets in self.buckets.items()
+        }
+        return sketches
+
+    def to_dict(self):
+        return {
+            'p': self.precision,
+            'total': self.total.to_dict(),
+            'buckets': {
+                name: {key: sketch.to_dict() for key, sketch in sketches.items()}
+                for name, sketches in self.buckets.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, granularities, data):
+        sketches = cls(granularities, data['p'])
+        sketches.total = HyperLogLog.from_dict(data['total'])
+        for name, buckets in data['buckets'].items():
+            if name in sketches.buckets:
+                sketches.buckets[name] = {key: HyperLogLog.from_dict(value) for key, value in buckets.items()}
+        return sketches
@@ -0,0 +1,739 @@
+"""
+Visitor interaction log
+
+Append-only log of user story / sprint planning requests, one JSON object per
+line with typed fields:
+
+{"v": 1, "ts": "2025-08-06T07:00:00.000Z", "event": "user_story",
+ "visitor": "ab12cd34", "ip": "1.2.3.4",
+ "fields": {"target": "admin", "description": "forgot password"}}
+
+Older logs hold free-text lines in the legacy format, which are still read:
+"2025-08-06 07:00:00 | Visitor:ab12cd34 | IP:1.2.3.4 | User Story: admin - forgot password"
+
+The active file (user_interactions.log) is rotated into numbered segments under
+logs/ once it passes a size or age limit. A JSON index records every segment's
+global byte offset and line range plus a sparse line -> offset index, so the
+log can be read from any position, or tailed from the end, without scanning
+files that aren't needed. Offsets are global: they keep increasing across
+rotations, which makes them usable as resume points and cursors.
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from tracking_schema import format_timestamp
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.json as pa_json
+except ImportError:
+    pa = None
+
+LOG_PATH = 'user_interactions.log'
+SEGMENT_DIR = 'logs'
+INDEX_PATH = 'user_interactions.index.json'
+
+MAX_SEGMENT_BYTES = 5 * 1024 * 1024
+MAX_SEGMENT_AGE = 24 * 60 * 60
+INDEX_INTERVAL = 256  # lines between sparse index points
+READ_BLOCK = 64 * 1024
+
+LOG_FORMAT_VERSION = 1
+
+ACTION_USER_STORY = 'User Story'
+ACTION_SPRINT = 'Sprint Planning'
+ACTION_UNKNOWN = 'Unknown'
+
+EVENT_USER_STORY = 'user_story'
+EVENT_SPRINT = 'sprint_planning'
+EVENT_UNKNOWN = 'unknown'
+
+# Event codes used by the columnar parser, in code order
+EVENT_TYPES = (EVENT_UNKNOWN, EVENT_USER_STORY, EVENT_SPRINT)
+
+EVENT_ACTIONS = {
+    EVENT_USER_STORY: ACTION_USER_STORY,
+    EVENT_SPRINT: ACTION_SPRINT,
+    EVENT_UNKNOWN: ACTION_UNKNOWN
+}
+
+LEGACY_PATTERN = re.compile(
+    r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \| Visitor:(\S*) \| IP:(.*?) \| (?:(User Story|Sprint): ?)?(.*)$',
+    re.MULTILINE
+)
+
+
+def format_entry(visitor_id, visitor_ip, event, fields=None, timestamp=None):
+    """Build a JSON log line for an interaction"""
+    record = {
+        'v': LOG_FORMAT_VERSION,
+        'ts': format_timestamp(timestamp),
+        'event': event,
+        'visitor': visitor_id,
+        'ip': visitor_ip,
+        'fields': fields or {}
+    }
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def _entry_from_record(record):
+    fields = record.get('fields') or {}
+    event = record.get('event', EVENT_UNKNOWN)
+    return {
+        'timestamp': record.get('ts'),
+        'visitor_id': record.get('visitor'),
+        'ip': record.get('ip'),
+        'event': event,
+        'action': EVENT_ACTIONS.get(event, ACTION_UNKNOWN),
+        'fields': fields,
+        'detail': ' - '.join(str(value) for value in fields.values())
+    }
+
+
+def parse_legacy_line(line):
+    """Parse a legacy free-text line, or None if it isn't an interaction"""
+    parts = line.strip().split(' | ')
+    if len(parts) < 4:  # timestamp | visitor_info | ip_info | action_info
+        return None
+
+    timestamp, visitor_info, ip_info = parts[0], parts[1], parts[2]
+    # Legacy details could themselves contain " | "
+    action_info = ' | '.join(parts[3:])
+    if 'Visitor:' not in visitor_info:
+        return None
+
+    if action_info.startswith('User Story:'):
+        event = EVENT_USER_STORY
+    elif action_info.startswith('Sprint:'):
+        event = EVENT_SPRINT
+    else:
+        event = EVENT_UNKNOWN
+
+    detail = action_info.split(':', 1)[1].strip() if ':' in action_info else action_info
+    return {
+        'timestamp': timestamp,
+        'visitor_id': visitor_info.split('Visitor:')[1].strip(),
+        'ip': ip_info.split('IP:')[1].strip() if 'IP:' in ip_info else None,
+        'event': event,
+        'action': EVENT_ACTIONS[event],
+        'fields': {'detail': detail},
+        'detail': detail
+    }
+
+
+def parse_line(line):
+    """Parse a JSON or legacy log line into a dict, or None if it isn't an interaction"""
+    line = line.strip()
+    if line.startswith('{'):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        return _entry_from_record(record) if isinstance(record, dict) else None
+    return parse_legacy_line(line)
+
+
+def encode_cursor(offset):
+    """Opaque cursor for a global log offset"""
+    return f"c{offset:x}"
+
+
+def decode_cursor(cursor):
+    if not cursor or not cursor.startswith('c'):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return int(cursor[1:], 16)
+
+
+def _count_lines(path, start=0):
+    """Return (lines, size) for complete lines of a file from a local offset"""
+    lines = 0
+    size = start
+    with open(path, 'rb') as f:
+        f.seek(start)
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                break
+            lines += 1
+            size += len(raw)
+    return lines, size
+
+
+class InteractionLog:
+    def __init__(self, log_path=LOG_PATH, segment_dir=SEGMENT_DIR, index_path=INDEX_PATH,
+                 max_bytes=MAX_SEGMENT_BYTES, max_age=MAX_SEGMENT_AGE, index_interval=INDEX_INTERVAL):
+        self.log_path = log_path
+        self.segment_dir = segment_dir
+        self.index_path = index_path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.index_interval = index_interval
+        self.lock = threading.Lock()
+        self.load_index()
+
+    # Index management
+
+    def load_index(self):
+        """Load the segment index, rebuilding the active segment's line count"""
+        index = None
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+            except Exception as e:
+                print(f"⚠️  Rebuilding unreadable interaction log index: {e}")
+
+        if index is None:
+            index = {
+                'segments': [],
+                'active': {'seq': 1, 'base_offset': 0, 'base_line': 0, 'created_at': time.time(), 'points': []}
+            }
+        self.index = index
+
+        # Lines written since the last index point aren't in the index yet
+        active = self.index['active']
+        points = active['points']
+        line, offset = points[-1] if points else (active['base_line'], active['base_offset'])
+        self.active_lines = line - active['base_line']
+        self.active_size = offset - active['base_offset']
+        if os.path.exists(self.log_path):
+            lines, size = _count_lines(self.log_path, self.active_size)
+            self.active_lines += lines
+            self.active_size = size
+            self._add_index_points()
+
+    def save_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _add_index_points(self):
+        """Record a sparse index point for every index_interval lines"""
+        active = self.index['active']
+        points = active['points']
+        last_line = points[-1][0] if points else active['base_line']
+        target = active['base_line'] + self.active_lines
+        if target - last_line < self.index_interval:
+            return False
+
+        # Walk forward from the last point to find exact line starts
+        local = (points[-1][1] if points else active['base_offset']) - active['base_offset']
+        line = last_line
+        with open(self.log_path, 'rb') as f:
+            f.seek(local)
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break
+                local += len(raw)
+                line += 1
+                if line - last_line == self.index_interval:
+                    points.append([line, active['base_offset'] + local])
+                    last_line = line
+        return True
+
+    def rotate(self):
+        """Seal the active file as a numbered segment and start a new one"""
+        if not os.path.exists(self.log_path) or self.active_size == 0:
+            return None
+        os.makedirs(self.segment_dir, exist_ok=True)
+        active = self.index['active']
+        segment_path = os.path.join(self.segment_dir, f"user_interactions.{active['seq']:06d}.log")
+        os.replace(self.log_path, segment_path)
+
+        self.index['segments'].append({
+            'seq': active['seq'],
+            'path': segment_path,
+            'base_offset': active['base_offset'],
+            'base_line': active['base_line'],
+            'size': self.active_size,
+            'lines': self.active_lines,
+            'created_at': active['created_at'],
+            'sealed_at': time.time(),
+            'points': active['points']
+        })
+        self.index['active'] = {
+            'seq': active['seq'] + 1,
+            'base_offset': active['base_offset'] + self.active_size,
+            'base_line': active['base_line'] + self.active_lines,
+            'created_at': time.time(),
+            'points': []
+        }
+        self.active_lines = 0
+        self.active_size = 0
+        self.save_index()
+        print(f"🔄 Rotated interaction log into {segment_path}")
+        return segment_path
+
+    def _should_rotate(self):
+        if self.active_size >= self.max_bytes:
+            return True
+        age = time.time() - self.index['active']['created_at']
+        return self.active_size > 0 and age >= self.max_age
+
+    # Writing
+
+    def append(self, line):
+        """Append one newline-terminated line, rotating first if needed"""
+        with self.lock:
+            if self._should_rotate():
+                self.rotate()
+            data = line.encode('utf-8')
+            with open(self.log_path, 'ab') as f:
+                f.write(data)
+            self.active_lines += 1
+            self.active_size += len(data)
+            if self._add_index_points():
+                self.save_index()
+
+    # Reading
+
+    def segments(self):
+        """(path, base_offset, size, base_line) for sealed segments then the active file"""
+        result = [
+            (segment['path'], segment['base_offset'], segment['size'], segment['base_line'])
+            for segment in self.index['segments']
+        ]
+        active = self.index['active']
+        if os.path.exists(self.log_path):
+            result.append((self.log_path, active['base_offset'], os.path.getsize(self.log_path), active['base_line']))
+        return result
+
+    def end_offset(self):
+        """Global offset just past the last byte written"""
+        active = self.index['active']
+        size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        return active['base_offset'] + size
+
+    def complete_end_offset(self):
+        """Global offset just past the last complete (newline-terminated) line"""
+        base = self.index['active']['base_offset']
+        if not os.path.exists(self.log_path):
+            return base
+        with open(self.log_path, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            while position > 0:
+                read_size = min(READ_BLOCK, position)
+                position -= read_size
+                f.seek(position)
+                newline = f.read(read_size).rfind(b'\n')
+                if newline >= 0:
+                    return base + position + newline + 1
+        return base
+
+    def line_count(self):
+        return self.index['active']['base_line'] + self.active_lines
+
+    def iter_lines(self, start_offset=0):
+        """Yield (text, end_offset) for every complete line from a global offset"""
+        for path, base, size, _ in self.segments():
+            if base + size <= start_offset:
+                continue
+            position = max(start_offset, base)
+            with open(path, 'rb') as f:
+                f.seek(position - base)
+                for raw in f:
+                    if not raw.endswith(b'\n'):
+                        # Only the active file can end mid-write
+                        return
+                    position += len(raw)
+                    yield raw.decode('utf-8', errors='replace').rstrip('\n'), position
+
+    def iter_entries(self, start_offset=0):
+        """Yield (entry, end_offset) per line; entry is None for non-interaction lines"""
+        for text, offset in self.iter_lines(start_offset):
+            yield parse_line(text), offset
+
+    def read_since(self, offset, limit):
+        """Up to limit lines after a global offset, plus the offset to resume from"""
+        lines = []
+        next_offset = offset
+        for text, end in self.iter_lines(offset):
+            if len(lines) >= limit:
+                break
+            lines.append(text)
+            next_offset = end
+        return lines, next_offset
+
+    def tail(self, limit, before=None):
+        """The last limit complete lines ending at or before a global offset
+
+        Reads backwards in blocks from the end, so cost depends on limit rather
+        than on the size of the log. Returns (lines, start_offset, end_offset).
+        """
+        end = self.complete_end_offset() if before is None else before
+        collected = []
+        start = end
+        if limit <= 0:
+            return collected, start, end
+
+        for path, base, size, _ in reversed(self.segments()):
+            if base >= end:
+                continue
+            local_end = min(end, base + size) - base
+            with open(path, 'rb') as f:
+                buffer = b''
+                position = local_end
+                while position > 0 and buffer.count(b'\n') <= limit - len(collected):
+                    read_size = min(READ_BLOCK, position)
+                    position -= read_size
+                    f.seek(position)
+                    buffer = f.read(read_size) + buffer
+
+            chunk_lines = buffer.split(b'\n')[:-1]
+            if position > 0:
+                # First piece may be the end of an earlier line
+                chunk_start = position + len(chunk_lines[0]) + 1
+                chunk_lines = chunk_lines[1:]
+            else:
+                chunk_start = 0
+            needed = limit - len(collected)
+            if len(chunk_lines) > needed:
+                dropped = chunk_lines[:len(chunk_lines) - needed]
+                chunk_start += sum(len(line) + 1 for line in dropped)
+                chunk_lines = chunk_lines[-needed:]
+
+            collected = [line.decode('utf-8', errors='replace') for line in chunk_lines] + collected
+            start = base + chunk_start
+            if len(collected) >= limit:
+                break
+
+        return collected, start, end
+
+
+# Shared instance used by the server
+interaction_log = InteractionLog()
+
+
+def append_interaction(visitor_id, visitor_ip, event, fields=None, log=None):
+    """Append an interaction to the log and return the written line"""
+    log_entry = format_entry(visitor_id, visitor_ip, event, fields)
+    (log or interaction_log).append(log_entry)
+    return log_entry
+
+
+def iter_entries(start_offset=0, log=None):
+    """Yield (entry, end_offset) for every complete line from a global offset"""
+    return (log or interaction_log).iter_entries(start_offset)
+
+
+# Bulk columnar parsing
+
+# Lines written by format_entry have a fixed key order, so their leading
+# fields can be pulled out by one regex pass instead of a json.loads per line.
+# Values with escapes don't match, which sends the run to the full decode.
+JSON_PATTERN = re.compile(
+    r'\{"v":\d+,"ts":"([^"]*)","event":"([^"]*)","visitor":"([^"\\]*)","ip":("[^"\\]*"|null)'
+)
+OTHER_LINE_START = re.compile(rb'\n[^{\n]')
+
+
+def _parse_json_text(text):
+    """Extract fields from JSON lines, decoding fully only when the fast path misses"""
+    matches = JSON_PATTERN.findall(text)
+    event_codes = {event: code for code, event in enumerate(EVENT_TYPES)}
+    if len(matches) == text.count('\n{') + text.startswith('{'):
+        return {
+            'timestamp': [match[0] for match in matches],
+            'event': [event_codes.get(match[1], 0) for match in matches],
+            'visitor': [match[2] for match in matches],
+            'ip': [None if match[3] == 'null' else match[3][1:-1] for match in matches],
+            'local_time': False
+        }
+
+    # Some lines were written by something else (or reordered); decode them all
+    records = []
+    for line in text.split('\n'):
+        if line.startswith('{'):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                records.append(record)
+    return {
+        'timestamp': [record.get('ts') for record in records],
+        'event': [event_codes.get(record.get('event'), 0) for record in records],
+        'visitor': [record.get('visitor') for record in records],
+        'ip': [record.get('ip') for record in records],
+        'local_time': False
+    }
+
+
+def _parse_legacy_text(text):
+    """Extract legacy fields with one regex pass over the text"""
+    matches = LEGACY_PATTERN.findall(text)
+    legacy_codes = {'User Story': 1, 'Sprint': 2}
+    return {
+        'timestamp': [match[0] for match in matches],
+        'event': [legacy_codes.get(match[3], 0) for match in matches],
+        'visitor': [match[1] for match in matches],
+        'ip': [match[2] for match in matches],
+        'local_time': True
+    }
+
+
+def _format_runs(data):
+    """Split log bytes into consecutive runs of JSON or other (legacy) lines
+
+    Logs switch format once, so this is normally a single run and the data is
+    never split into lines; telling the cases apart takes one scan.
+    """
+    has_json = data.startswith(b'{') or data.find(b'\n{') >= 0
+    has_other = data[:1] not in (b'{', b'\n', b'') or OTHER_LINE_START.search(data) is not None
+    if not (has_json and has_other):
+        return [(has_json, data)]
+
+    runs = []
+    current = []
+    current_json = None
+    for line in data.split(b'\n'):
+        is_json = line[:1] == b'{'
+        if is_json != current_json and current:
+            runs.append((current_json, b'\n'.join(current)))
+            current = []
+        current_json = is_json
+        current.append(line)
+    if current:
+        runs.append((current_json, b'\n'.join(current)))
+    return runs
+
+
+def _legacy_times_to_utc(np, local):
+    """Convert naive local datetime64 values to UTC
+
+    The UTC offset is resolved once per distinct hour rather than per line, so
+    DST changes are still respected.
+    """
+    local = local.astype('datetime64[s]')
+    hours = local.astype('datetime64[h]')
+    unique_hours, inverse = np.unique(hours, return_inverse=True)
+    offsets = np.array([
+        int(datetime.fromisoformat(str(hour)).astimezone().utcoffset().total_seconds())
+        for hour in unique_hours
+    ], dtype='timedelta64[s]')
+    return local - offsets[inverse]
+
+
+def _regex_columns(np, text, is_json):
+    """Stdlib fallback: one regex pass per run, then NumPy conversion"""
+    columns = _parse_json_text(text) if is_json else _parse_legacy_text(text)
+    if columns['local_time']:
+        times = _legacy_times_to_utc(np, np.array(columns['timestamp'], dtype='datetime64[s]'))
+    else:
+        times = np.array([ts.rstrip('Z') if ts else 'NaT' for ts in columns['timestamp']], dtype='datetime64[ms]')
+    return {
+        'timestamp': times.astype('datetime64[ms]'),
+        'event': np.array(columns['event'], dtype=np.int8),
+        'visitor': np.array(columns['visitor'], dtype=object),
+        'ip': np.array(columns['ip'], dtype=object)
+    }
+
+
+def _arrow_json_columns(np, data):
+    """Parse JSON lines with Arrow's multithreaded reader"""
+    schema = pa.schema([('ts', pa.string()), ('event', pa.string()), ('visitor', pa.string()), ('ip', pa.string())])
+    table = pa_json.read_json(
+        io.BytesIO(data),
+        parse_options=pa_json.ParseOptions(explicit_schema=schema, unexpected_field_behavior='ignore')
+    )
+    times = pc.cast(table['ts'], pa.timestamp('ms', tz='UTC'))
+    events = pc.fill_null(pc.index_in(table['event'], value_set=pa.array(EVENT_TYPES)), 0)
+    return {
+        'timestamp': times.to_numpy(zero_copy_only=False).astype('datetime64[ms]'),
+        'event': events.to_numpy(zero_copy_only=False).astype(np.int8),
+        'visitor': table['visitor'].to_numpy(zero_copy_only=False),
+        'ip': table['ip'].to_numpy(zero_copy_only=False)
+    }
+
+
+def _arrow_legacy_columns(np, data):
+    """Parse legacy lines as '|'-delimited text with Arrow's CSV reader
+
+    A line whose detail contains '|' doesn't fit the four columns and makes
+    the reader raise, so the run goes to the regex pass, which keeps the lines
+    in file order.
+    """
+    names = ['ts', 'visitor', 'ip', 'action']
+    table = pa_csv.read_csv(
+        io.BytesIO(data),
+        read_options=pa_csv.ReadOptions(column_names=names),
+        parse_options=pa_csv.ParseOptions(delimiter='|', quote_char=False),
+        convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in names})
+    )
+    visitor = pc.utf8_trim_whitespace(table['visitor'])
+    action = pc.utf8_trim_whitespace(table['action'])
+    is_entry = pc.and_(pc.starts_with(visitor, 'Visitor:'), pc.is_valid(action))
+    table = table.filter(is_entry)
+    visitor = pc.utf8_trim_whitespace(pc.utf8_slice_codeunits(pc.utf8_trim_whitespace(table['visitor']), 8))
+    ip = pc.utf8_trim_whitespace(table['ip'])
+    ip = pc.utf8_trim_whitespace(pc.if_else(pc.starts_with(ip, 'IP:'), pc.utf8_slice_codeunits(ip, 3), ip))
+    action = pc.utf8_trim_whitespace(table['action'])
+    events = pc.if_else(
+        pc.starts_with(action, 'User Story:'), 1,
+        pc.if_else(pc.starts_with(action, 'Sprint:'), 2, 0)
+    )
+    local = pc.cast(pc.utf8_trim_whitespace(table['ts']), pa.timestamp('s'))
+
+    return {
+        'timestamp': _legacy_times_to_utc(np, local.to_numpy(zero_copy_only=False)).astype('datetime64[ms]'),
+        'event': events.to_numpy(zero_copy_only=False).astype(np.int8),
+        'visitor': visitor.to_numpy(zero_copy_only=False),
+        'ip': ip.to_numpy(zero_copy_only=False)
+    }
+
+
+def parse_bulk(data):
+    """Parse log contents (many lines) into columnar NumPy arrays
+
+    Returns a dict with 'timestamp' (datetime64[ms], UTC), 'event' (int8 codes
+    into EVENT_TYPES), 'visitor' and 'ip' (object arrays), and 'event_types'.
+    Non-interaction lines are dropped. Uses Arrow's JSON/CSV readers when
+    pyarrow is installed and a regex pass over the text otherwise.
+    """
+    import numpy as np
+
+    data = data.encode('utf-8') if isinstance(data, str) else data
+    parts = []
+    for is_json, run in _format_runs(data):
+        if not run.strip():
+            continue
+        columns = None
+        if pa is not None:
+            try:
+                columns = _arrow_json_columns(np, run) if is_json else _arrow_legacy_columns(np, run)
+            except (pa.ArrowInvalid, ValueError):
+                columns = None  # malformed input: use the forgiving path
+        if columns is None:
+            columns = _regex_columns(np, run.decode('utf-8', errors='replace'), is_json)
+        parts.append(columns)
+
+    names = ['timestamp', 'event', 'visitor', 'ip']
+    empty = {
+        'timestamp': np.array([], dtype='datetime64[ms]'),
+        'event': np.array([], dtype=np.int8),
+        'visitor': np.array([], dtype=object),
+        'ip': np.array([], dtype=object)
+    }
+    result = {name: np.concatenate([part[name] for part in parts]) if parts else empty[name] for name in names}
+    result['event_types'] = EVENT_TYPES
+    return result
+
+
+def load_columns(log=None):
+    """Read every segment of the log into columnar arrays
+
+    The result also has 'end_offset', the global offset just past the last
+    complete line parsed, to resume reading from.
+    """
+    log = log or interaction_log
+    texts = []
+    end_offset = 0
+    for path, base_offset, size, _ in log.segments():
+        with open(path, 'rb') as f:
+            data = f.read(size)
+        # Drop a partially written last line
+        data = data[:data.rfind(b'\n') + 1]
+        texts.append(data)
+        end_offset = base_offset + len(data)
+    columns = parse_bulk(b''.join(texts))
+    columns['end_offset'] = end_offset
+    return columns
+
+
+def _split_loop(lines):
+    """The original per-line split parser, kept as the benchmark baseline"""
+    visitors = set()
+    user_stories = 0
+    sprint_planning = 0
+    visitor_details = []
+    for line in lines:
+        if line.strip():
+            parts = line.strip().split(' | ')
+            if len(parts) >= 4:
+                timestamp = parts[0]
+                visitor_info = parts[1]
+                action_info = parts[3]
+                if 'Visitor:' in visitor_info:
+                    visitor_id = visitor_info.split('Visitor:')[1].strip()
+                    visitors.add(visitor_id)
+                    if 'User Story:' in action_info:
+                        user_stories += 1
+                        action_type = 'User Story'
+                    elif 'Sprint:' in action_info:
+                        sprint_planning += 1
+                        action_type = 'Sprint Planning'
+                    else:
+                        action_type = 'Unknown'
+                    visitor_details.append({'timestamp': timestamp, 'visitor_id': visitor_id, 'action': action_type})
+    return visitor_details
+
+
+def benchmark(lines_count=1000000, repeat=3):
+    """Compare the split-based loop with the bulk parser on synthetic logs"""
+    now = datetime.now()
+    legacy = []
+    structured = []
+    for i in range(lines_count):
+        visitor = f"{i % 5000:08x}"
+        ip = f"10.0.0.{i % 255}"
+        if i % 2:
+            legacy.append(f"{now:%Y-%m-%d %H:%M:%S} | Visitor:{visitor} | IP:{ip} | Sprint: 2 devs - 2 weeks\n")
+            structured.append(format_entry(visitor, ip, EVENT_SPRINT, {'team': '2 devs', 'timeline': '2 weeks'}, now))
+        else:
+            legacy.append(f"{now:%Y-%m-%d %H:%M:%S} | Visitor:{visitor} | IP:{ip} | User Story: admin - reset\n")
+            structured.append(format_entry(visitor, ip, EVENT_USER_STORY, {'target': 'admin', 'description': 'reset'}, now))
+    legacy_text = ''.join(legacy)
+    structured_text = ''.join(structured)
+
+    def best(func, data):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(data)
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+
+    # Both sides start from the file contents, as get_analytics did with readlines()
+    results = {
+        'lines': lines_count,
+        'split_loop_legacy': best(lambda text: _split_loop(text.splitlines()), legacy_text),
+        'bulk_legacy': best(parse_bulk, legacy_text.encode('utf-8')),
+        'bulk_json': best(parse_bulk, structured_text.encode('utf-8'))
+    }
+    results['speedup_legacy'] = round(results['split_loop_legacy'] / results['bulk_legacy'], 2)
+    results['speedup_json'] = round(results['split_loop_legacy'] / results['bulk_json'], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Interaction log tools')
+    parser.add_argument('command', choices=['benchmark', 'rotate', 'status'])
+    parser.add_argument('--lines', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == 'benchmark':
+        print(f"⏱️  Parsing {args.lines:,} lines...")
+        results = benchmark(args.lines, args.repeat)
+        print(f"   split loop (legacy): {results['split_loop_legacy']:.3f}s")
+        print(f"   bulk parser (legacy): {results['bulk_legacy']:.3f}s ({results['speedup_legacy']}x)")
+        print(f"   bulk parser (JSON):   {results['bulk_json']:.3f}s ({results['speedup_json']}x)")
+    elif args.command == 'rotate':
+        segment = interaction_log.rotate()
+        print(f"✅ Rotated into {segment}" if segment else "ℹ️  Nothing to rotate")
+    else:
+        print(f"📁 Segments: {len(interaction_log.segments())}")
+        print(f"📊 Lines: {interaction_log.line_count():,}")
+        print(f"📍 End offset: {interaction_log.end_offset():,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Server-sent events feed for the admin dashboards
+
+The write paths publish events (new tracking rows, new interactions, with
+the stat deltas they cause) to an EventBroker, which fans each one out to
+every connected dashboard. Publishing never waits on a subscriber. Each one
+has a bounded queue, and a subscriber that falls QUEUE_EVENTS behind is sent
+an "overflow" event and disconnected instead of slowing the others down; the
+dashboards close their EventSource on it and reload before reconnecting.
+
+EventSource reconnects on its own with a Last-Event-ID header. The broker
+keeps the last HISTORY_EVENTS events, so a reconnecting dashboard gets
+everything it missed replayed. If it missed more than that, or the server
+restarted in between, it is sent a "reset" event and should reload the
+full dashboard once.
+"""
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+from flask import Response, stream_with_context
+
+HISTORY_EVENTS = 1000
+QUEUE_EVENTS = 256
+MAX_SUBSCRIBERS = 100
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 3000
+
+
+def format_event(event_id, event_type, data):
+    """One SSE message; data is JSON on a single line"""
+    lines = []
+    if event_id:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscriber:
+    def __init__(self, queue_size, replay):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.replay = replay
+        self.overflowed = False
+        self.connected_at = time.monotonic()
+        self.delivered = 0
+
+
+class EventBroker:
+    def __init__(self, history=HISTORY_EVENTS, queue_size=QUEUE_EVENTS,
+                 max_subscribers=MAX_SUBSCRIBERS, heartbeat=HEARTBEAT_SECONDS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.lock = threading.Lock()
+        # Event IDs are "<boot>-<sequence>" so IDs from before a restart are recognized
+        self.boot = format(int(time.time() * 1000), 'x')
+        self.sequence = 0
+        self.history = deque(maxlen=history)
+        self.subscribers = set()
+        self.metrics = {
+            'published': 0,
+            'delivered': 0,
+            'connections': 0,
+            'rejected': 0,
+            'overflows': 0,
+            'resumes': 0,
+            'replayed': 0,
+            'resets': 0
+        }
+
+    def publish(self, event_type, data):
+        """Record an event and queue it for every subscriber; never blocks"""
+        with self.lock:
+            self.sequence += 1
+            event = (self.sequence, f"{self.boot}-{self.sequence}", event_type, data)
+            self.history.append(event)
+            self.metrics['published'] += 1
+            for subscriber in self.subscribers:
+                if subscriber.overflowed:
+                    continue
+                try:
+                    subscriber.queue.put_nowait(event)
+                except queue.Full:
+                    subscriber.overflowed = True
+                    self.metrics['overflows'] += 1
+        return event[1]
+
+    def replay_after(self, last_event_id):
+        """Events to send a subscriber resuming after last_event_id, or None if it must reset"""
+        boot, _, sequence = (last_event_id or '').partition('-')
+        if boot != self.boot or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        oldest = self.history[0][0] if self.history else self.sequence + 1
+        if sequence > self.sequence or sequence < oldest - 1:
+            return None
+        return [event for event in self.history if event[0] > sequence]
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber (None if at capacity) with any events it missed"""
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                self.metrics['rejected'] += 1
+                return None
+            replay = []
+            if last_event_id:
+                missed = self.replay_after(last_event_id)
+                if missed is None:
+                    self.metrics['resets'] += 1
+                    replay = [(None, None, 'reset', {'reason': 'missed events are no longer available'})]
+                else:
+                    self.metrics['resumes'] += 1
+                    self.metrics['replayed'] += len(missed)
+                    replay = missed
+            subscriber = Subscriber(self.queue_size, replay)
+            self.subscribers.add(subscriber)
+            self.metrics['connections'] += 1
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+            self.metrics['delivered'] += subscriber.delivered
+
+    def stream(self, last_event_id=None):
+        """SSE text for a new subscriber: missed events, then live ones with heartbeats"""
+        # Subscribing on first read means a response that is never sent leaves nothing behind
+        subscriber = self.subscribe(last_event_id)
+        if subscriber is None:
+            return
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            for _, event_id, event_type, data in subscriber.replay:
+                yield format_event(event_id, event_type, data)
+            subscriber.replay = None
+            while True:
+                try:
+                    _, event_id, event_type, data = subscriber.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                subscriber.delivered += 1
+                yield format_event(event_id, event_type, data)
+                if subscriber.overflowed and subscriber.queue.empty():
+                    # Fell too far behind; the client closes the feed and reloads
+                    yield format_event(None, 'overflow', {'reason': 'subscriber queue full'})
+                    return
+        finally:
+            self.unsubscribe(subscriber)
+
+    def response(self, last_event_id=None):
+        """Flask text/event-stream Response for a new subscriber"""
+        with self.lock:
+            full = len(self.subscribers) >= self.max_subscribers
+            if full:
+                self.metrics['rejected'] += 1
+        if full:
+            return Response('Too many live feed subscribers', status=503, headers={'Retry-After': '30'})
+        return Response(
+            stream_with_context(self.stream(last_event_id)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    def stats(self):
+        with self.lock:
+            return dict(
+                self.metrics,
+                subscribers=len(self.subscribers),
+                queued=sum(subscriber.queue.qsize() for subscriber in self.subscribers),
+                history=len(self.history),
+                last_event_id=f"{self.boot}-{self.sequence}"
+            )
@@ -3,54 +3,164 @@
 Migration script to upload existing CSV data to Google Sheets
 """
 
+import argparse
 import csv
+import json
 import os
+import time
 from googleSheetsTracker import sheets_tracker
+from sheets_quota import PRIORITY_BULK, sheets_scheduler
+from tracking_archive import iter_csv_records, normalize_row, read_header, source_fingerprint
+from tracking_schema import TRACKING_HEADERS, format_timestamp
 
-def migrate_behavior_tracking():
-    """Migrate user behavior tracking data from CSV to Google Sheets"""
-    csv_path = '../public/user_behavior_tracking.csv'
+CSV_PATH = '../public/user_behavior_tracking.csv'
+CHECKPOINT_PATH = 'data/sheets_migration.json'
+CHUNK_ROWS = 500
+
+def load_checkpoint(checkpoint_path=CHECKPOINT_PATH):
+    if not os.path.exists(checkpoint_path):
+        return None
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable migration checkpoint: {e}")
+        return None
+
+def save_checkpoint(checkpoint, checkpoint_path=CHECKPOINT_PATH):
+    checkpoint['updated_at'] = format_timestamp()
+    checkpoint_dir = os.path.dirname(checkpoint_path)
+    if checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, checkpoint_path)
+
+def sheet_row(row, width):
+    """CSV row as sheet cells: original ID and times kept, 'null' written as empty"""
+    return [sheets_tracker.escape_value(value) for value in normalize_row(row, width)]
+
+def iter_chunks(csv_path, start_offset, chunk_rows):
+    """Yield (rows, end_offset) chunks of complete CSV records"""
+    file_size = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as f:
+        f.seek(max(0, file_size - 1))
+        ends_with_newline = f.read(1) == b'\n'
+
+    chunk = []
+    end_offset = yielded_offset = start_offset
+    for row, offset in iter_csv_records(csv_path, start_offset):
+        if offset == file_size and not ends_with_newline:
+            break  # last record is still being written
+        if row:
+            chunk.append(row)
+        end_offset = offset
+        if len(chunk) >= chunk_rows:
+            yield chunk, end_offset
+            chunk = []
+            yielded_offset = end_offset
+    if end_offset != yielded_offset:
+        yield chunk, end_offset
+
+def chunk_landed(worksheet, pending):
+    """Whether an append that was in flight when we stopped reached the sheet"""
+    ids = sheets_scheduler.read(PRIORITY_BULK, worksheet.get, 'A:A')
+    return [pending['last_id']] in ids
+
+def migrate_behavior_tracking(csv_path=CSV_PATH, chunk_rows=CHUNK_ROWS, restart=False,
+                              checkpoint_path=CHECKPOINT_PATH):
+    """Stream tracking rows to Google Sheets in append_rows chunks, resumably
     
+    Progress (CSV byte offset and rows written) is checkpointed after every
+    chunk. A chunk is recorded as pending before it is sent, so after a crash
+    the sheet is checked for its last ID and the chunk is either confirmed or
+    sent again, never duplicated.
+    """
     if not os.path.exists(csv_path):
         print("❌ Behavior tracking CSV not found")
         return False
     
     try:
         print("📊 Migrating behavior tracking data...")
+        worksheet = sheets_tracker.worksheet
+        _, header_end = read_header(csv_path)
+        width = len(TRACKING_HEADERS)
         
-        with open(csv_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            rows = list(reader)
+        checkpoint = None if restart else load_checkpoint(checkpoint_path)
+        if checkpoint and (checkpoint.get('source') != os.path.abspath(csv_path)
+                           or checkpoint['csv_offset'] > os.path.getsize(csv_path)
+                           or source_fingerprint(csv_path, checkpoint['csv_offset']) != checkpoint['fingerprint']):
+            print("❌ The CSV changed since the checkpoint was written; rerun with --restart")
+            return False
         
-        if not rows:
-            print("ℹ️  No data to migrate")
-            return True
-        
-        # Convert CSV data to session format
-        for row in rows:
-            session_data = {
-                'playground_convo_id': row.get('playground-convo-id'),
-                'playground_mess_target': row.get('playground-mess-target'),
-                'playground_mess_description': row.get('playground-mess-description'),
-                'playground_step1': row.get('playground-step1'),
-                'playground_mess_team': row.get('playground-mess-team'),
-                'playground_mess_timeline': row.get('playground-mess-timeline'),
-                'playground_step2': row.get('playground-step2'),
-                'chat_bubble_1': row.get('chat-bubble-1'),
-                'chat_bubble_2': row.get('chat-bubble-2'),
-                'chat_bubble_3': row.get('chat-bubble-3'),
-                'chat_bubble_4': row.get('chat-bubble-4'),
-                'chat_bubble_free': row.get('chat-bubble-free')
+        if checkpoint is None:
+            checkpoint = {
+                'source': os.path.abspath(csv_path),
+                'csv_offset': header_end,
+                'fingerprint': source_fingerprint(csv_path, header_end),
+                'rows_migrated': 0,
+                'chunks': 0,
+                'pending': None,
+                'started_at': format_timestamp()
             }
+            # Header row goes first on an empty sheet
+            if not sheets_tracker.get_snapshot():
+                sheets_scheduler.write(PRIORITY_BULK, worksheet.append_rows, [list(TRACKING_HEADERS)])
+        else:
+            print(f"↩️  Resuming after {checkpoint['rows_migrated']} rows (byte {checkpoint['csv_offset']:,})")
+        
+        pending = checkpoint.get('pending')
+        if pending:
+            if chunk_landed(worksheet, pending):
+                print(f"✅ Last chunk ({pending['rows']} rows) reached the sheet before the stop")
+                checkpoint['csv_offset'] = pending['end_offset']
+                checkpoint['rows_migrated'] += pending['rows']
+                checkpoint['chunks'] += 1
+            checkpoint['pending'] = None
+            checkpoint['fingerprint'] = source_fingerprint(csv_path, checkpoint['csv_offset'])
+            save_checkpoint(checkpoint, checkpoint_path)
+        
+        started = time.perf_counter()
+        resumed_rows = checkpoint['rows_migrated']
+        for chunk, end_offset in iter_chunks(csv_path, checkpoint['csv_offset'], chunk_rows):
+            rows = [sheet_row(row, width) for row in chunk]
+            if rows:
+                checkpoint['pending'] = {
+                    'last_id': rows[-1][0],
+                    'rows': len(rows),
+                    'end_offset': end_offset
+                }
+                save_checkpoint(checkpoint, checkpoint_path)
+                sheets_scheduler.write(PRIORITY_BULK, worksheet.append_rows, rows)
+                checkpoint['chunks'] += 1
+            
+            checkpoint['rows_migrated'] += len(rows)
+            checkpoint['csv_offset'] = end_offset
+            checkpoint['fingerprint'] = source_fingerprint(csv_path, end_offset)
+            checkpoint['pending'] = None
+            save_checkpoint(checkpoint, checkpoint_path)
             
-            # Record to Google Sheets
-            sheets_tracker.record_user_session(session_data)
+            elapsed = time.perf_counter() - started
+            migrated = checkpoint['rows_migrated'] - resumed_rows
+            print(f"   ⬆️  {checkpoint['rows_migrated']:,} rows ({migrated / elapsed if elapsed else 0:.0f} rows/s)")
         
-        print(f"✅ Migrated {len(rows)} behavior tracking records")
+        elapsed = time.perf_counter() - started
+        migrated = checkpoint['rows_migrated'] - resumed_rows
+        checkpoint['last_run'] = {
+            'rows': migrated,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(migrated / elapsed, 1) if elapsed else None
+        }
+        save_checkpoint(checkpoint, checkpoint_path)
+        
+        print(f"✅ Migrated {migrated:,} behavior tracking records in {elapsed:.1f}s "
+              f"({checkpoint['last_run']['rows_per_second']} rows/s, {checkpoint['rows_migrated']:,} total)")
         return True
         
     except Exception as e:
         print(f"❌ Error migrating behavior tracking: {e}")
+        print("   Progress is checkpointed; rerun to resume")
         return False
 
 def migrate_chatwidget_qa():
@@ -66,13 +176,15 @@ def migrate_chatwidget_qa():
         
         # Create a new worksheet for Q&A data
         try:
-            qa_worksheet = sheets_tracker.sheet.add_worksheet(title="ChatWidget Q&A", rows=100, cols=10)
+            qa_worksheet = sheets_scheduler.write(
+                PRIORITY_BULK, sheets_tracker.sheet.add_worksheet, title="ChatWidget Q&A", rows=100, cols=10
+            )
         except Exception:
             # Worksheet might already exist
-            qa_worksheet = sheets_tracker.sheet.worksheet("ChatWidget Q&A")
+            qa_worksheet = sheets_scheduler.read(PRIORITY_BULK, sheets_tracker.sheet.worksheet, "ChatWidget Q&A")
         
         # Clear existing data
-        qa_worksheet.clear()
+        sheets_scheduler.write(PRIORITY_BULK, qa_worksheet.clear)
         
         # Read CSV data
         with open(csv_path, 'r', encoding='utf-8') as file:
@@ -94,7 +206,7 @@ def migrate_chatwidget_qa():
             ])
         
         # Write to Google Sheets
-        qa_worksheet.update('A1', data)
+        sheets_scheduler.write(PRIORITY_BULK, qa_worksheet.update, values=data, range_name='A1')
         
         print(f"✅ Migrated {len(rows)} Q&A records to 'ChatWidget Q&A' sheet")
         return True
@@ -105,10 +217,16 @@ def migrate_chatwidget_qa():
 
 def main():
     """Main migration function"""
+    parser = argparse.ArgumentParser(description='Migrate CSV data to Google Sheets')
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Rows per append_rows call')
+    parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start over')
+    args = parser.parse_args()
+    
     print("🚀 Starting migration to Google Sheets...")
     
-    # Check if Google Sheets is available
-    if sheets_tracker.client is None:
+    # Check if Google Sheets is available (the connection is set up in the background)
+    if not sheets_tracker.wait_until_ready(timeout=60):
         print("❌ Google Sheets not available. Please set up credentials first.")
         print("📋 Steps:")
         print("1. Create Google Cloud Project")
@@ -121,7 +239,7 @@ def main():
     print(f"✅ Connected to Google Sheet: {sheets_tracker.get_sheet_url()}")
     
     # Migrate data
-    success1 = migrate_behavior_tracking()
+    success1 = migrate_behavior_tracking(args.csv, args.chunk_rows, args.restart)
     success2 = migrate_chatwidget_qa()
     
     if success1 and success2:
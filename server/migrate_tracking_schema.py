@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Migrate existing tracking rows to ULID user IDs and ISO-8601 UTC timestamps
+
+Legacy rows carry 6-digit IDs that collide and "HH:MM - DDMonYY" times that
+don't sort. This rewrites them in place (keeping a timestamped backup) and can
+apply the same change to the Google Sheet. Rows that are already migrated are
+left untouched, so the script is safe to re-run. Times that can't be parsed
+(including 'null') are kept as they are rather than invented, and counted in
+the report.
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+from datetime import datetime
+from tracking_schema import (
+    TRACKING_HEADERS,
+    format_timestamp,
+    generate_record_id,
+    is_record_id,
+    parse_tracking_time
+)
+
+CSV_PATH = '../public/user_behavior_tracking.csv'
+ID_MAP_PATH = 'data/user_id_migration.json'
+
+
+def migrate_row(row):
+    """Return (migrated_row, changed, has_start_time) for one tracking row"""
+    row = list(row)
+    while len(row) < 3:
+        row.append('null')
+
+    start = parse_tracking_time(row[1])
+    end = parse_tracking_time(row[2])
+    migrated = list(row)
+    if start is not None:
+        migrated[1] = format_timestamp(start)
+    if end is not None:
+        migrated[2] = format_timestamp(end)
+    if not is_record_id(row[0]):
+        # Without a start time the ID is stamped with the migration time
+        migrated[0] = generate_record_id(int(start.timestamp() * 1000) if start is not None else None)
+
+    return migrated, migrated != row, start is not None
+
+
+def migrate_rows(rows):
+    """Migrate data rows, returning (migrated_rows, id_map, changed_count, untimed_count)"""
+    migrated_rows = []
+    id_map = []
+    changed = 0
+    untimed = 0
+
+    for index, row in enumerate(rows):
+        migrated, row_changed, has_start_time = migrate_row(row)
+        migrated_rows.append(migrated)
+        if row_changed:
+            changed += 1
+        if not has_start_time:
+            untimed += 1
+        if migrated[0] != row[0]:
+            id_map.append({'row': index + 1, 'legacy_id': row[0], 'user_id': migrated[0]})
+
+    return migrated_rows, id_map, changed, untimed
+
+
+def normalize_headers(headers):
+    """Use the canonical header names when the file only differs in case"""
+    if [header.lower() for header in headers] == TRACKING_HEADERS:
+        return list(TRACKING_HEADERS)
+    return headers
+
+
+def migrate_csv(csv_path=CSV_PATH, dry_run=False):
+    """Rewrite the tracking CSV with migrated IDs and timestamps"""
+    if not os.path.exists(csv_path):
+        print("❌ Tracking CSV not found")
+        return None
+
+    with open(csv_path, 'r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        headers = next(reader, None)
+        rows = list(reader)
+
+    if headers is None:
+        print("ℹ️  Tracking CSV is empty")
+        return []
+
+    migrated_rows, id_map, changed, untimed = migrate_rows(rows)
+    print(f"📊 {len(rows)} rows, {changed} need migration, {len(id_map)} IDs reassigned")
+    if untimed:
+        print(f"⚠️  {untimed} rows have no parseable start time; left as they are")
+
+    if dry_run or not changed:
+        return id_map
+
+    backup_path = f"{csv_path}.bak-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    shutil.copy2(csv_path, backup_path)
+
+    tmp_path = f"{csv_path}.tmp"
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(normalize_headers(headers))
+        writer.writerows(migrated_rows)
+    os.replace(tmp_path, csv_path)
+
+    os.makedirs(os.path.dirname(ID_MAP_PATH), exist_ok=True)
+    with open(ID_MAP_PATH, 'w', encoding='utf-8') as file:
+        json.dump({'migrated_at': format_timestamp(), 'source': csv_path, 'ids': id_map}, file, indent=2)
+
+    print(f"💾 Backup written to {backup_path}")
+    print(f"🗺️  Legacy ID mapping written to {ID_MAP_PATH}")
+    print(f"✅ Migrated {changed} CSV rows")
+    return id_map
+
+
+def migrate_sheet(dry_run=False):
+    """Apply the same migration to the Google Sheet's ID and time columns"""
+    from googleSheetsTracker import sheets_tracker
+    from sheets_quota import PRIORITY_BULK, sheets_scheduler
+
+    if not sheets_tracker.wait_until_ready(timeout=60):
+        print("❌ Google Sheets not available, skipping sheet migration")
+        return False
+
+    all_values = sheets_scheduler.read(PRIORITY_BULK, sheets_tracker.worksheet.get_all_values)
+    if len(all_values) <= 1:
+        print("ℹ️  Google Sheet has no data rows")
+        return True
+
+    migrated_rows, id_map, changed, untimed = migrate_rows(all_values[1:])
+    print(f"📊 Sheet: {len(migrated_rows)} rows, {changed} need migration")
+    if untimed:
+        print(f"⚠️  Sheet: {untimed} rows have no parseable start time; left as they are")
+
+    if dry_run or not changed:
+        return True
+
+    # One range update for the three key columns instead of a call per row
+    key_columns = [row[:3] for row in migrated_rows]
+    sheets_scheduler.write(PRIORITY_BULK, sheets_tracker.worksheet.update,
+                           values=key_columns, range_name=f"A2:C{len(key_columns) + 1}")
+    print(f"✅ Migrated {changed} sheet rows")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate tracking rows to ULIDs and ISO-8601 timestamps')
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--sheets', action='store_true', help='Also migrate the Google Sheet')
+    parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+    args = parser.parse_args()
+
+    print("🚀 Migrating tracking schema...")
+    migrate_csv(args.csv, args.dry_run)
+    if args.sheets:
+        migrate_sheet(args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Ring buffer of the most recent tracking rows
+
+The "recent activity" views only ever show the last few rows, so instead of
+reading the whole store for them a fixed-size deque holds the newest
+RECENT_CAPACITY rows. Appends and reads are O(1) per row. Listeners added
+to `listeners` are called with every appended row (not with re-seeded ones).
+
+CsvRecentActivity seeds itself with a reverse tail-read of the CSV (only the
+last rows' bytes are read) and then, like the sketches and column stats,
+folds in the records appended since its last catch-up. A CSV that shrank or
+was rewritten is re-seeded.
+
+    python recent_activity.py            # print the latest rows
+    python recent_activity.py --limit 5
+"""
+
+import argparse
+import json
+import os
+import threading
+from collections import deque
+from tracking_archive import iter_csv_records, read_header, source_fingerprint, tail_offset
+
+CSV_PATH = '../public/user_behavior_tracking.csv'
+RECENT_CAPACITY = 100
+
+
+class RecentActivity:
+    def __init__(self, capacity=RECENT_CAPACITY):
+        self.capacity = capacity
+        self.rows = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        self.metrics = {'appended': 0, 'seeds': 0, 'reads': 0}
+        self.listeners = []
+
+    def append(self, row):
+        with self.lock:
+            self.rows.append(row)
+            self.metrics['appended'] += 1
+        for listener in self.listeners:
+            listener(row)
+
+    def replace(self, rows):
+        """Drop the buffer and refill it with the newest of rows"""
+        with self.lock:
+            self.rows.clear()
+            self.rows.extend(rows)
+            self.metrics['seeds'] += 1
+
+    def latest(self, limit=10):
+        """Up to limit newest rows, oldest first (at most capacity)"""
+        with self.lock:
+            self.metrics['reads'] += 1
+            count = min(max(0, limit), len(self.rows))
+            return [self.rows[index] for index in range(len(self.rows) - count, len(self.rows))]
+
+    def stats(self):
+        with self.lock:
+            return dict(self.metrics, capacity=self.capacity, rows=len(self.rows))
+
+
+class CsvRecentActivity(RecentActivity):
+    """RecentActivity kept in step with a tracking CSV; rows are dicts keyed by the header"""
+
+    def __init__(self, csv_path=CSV_PATH, capacity=RECENT_CAPACITY):
+        super().__init__(capacity)
+        self.csv_path = csv_path
+        self.csv_lock = threading.Lock()
+        self.csv_offset = 0
+        self.fingerprint = None
+        self.columns = []
+        self.metrics.update({'bytes_read': 0})
+
+    def record(self, row):
+        # Same shape as csv.DictReader rows
+        values = row[:len(self.columns)] + [None] * (len(self.columns) - len(row))
+        return dict(zip(self.columns, values))
+
+    def read_from(self, offset, file_size):
+        """Rows of the complete records from offset; moves csv_offset past them"""
+        with open(self.csv_path, 'rb') as f:
+            f.seek(max(0, file_size - 1))
+            ends_with_newline = f.read(1) == b'\n'
+        rows = []
+        for row, end in iter_csv_records(self.csv_path, offset):
+            if end == file_size and not ends_with_newline:
+                break  # last record is still being written
+            if row:
+                rows.append(self.record(row))
+            self.metrics['bytes_read'] += end - self.csv_offset
+            self.csv_offset = end
+        return rows
+
+    def seed(self):
+        """Fill the buffer from the last records of the CSV, read backwards"""
+        self.columns, header_end = read_header(self.csv_path)
+        file_size = os.path.getsize(self.csv_path)
+        self.csv_offset = tail_offset(self.csv_path, self.capacity, start=header_end)
+        self.replace(self.read_from(self.csv_offset, file_size))
+        self.fingerprint = source_fingerprint(self.csv_path, self.csv_offset)
+
+    def catch_up(self):
+        """Append CSV records written since the last catch-up"""
+        with self.csv_lock:
+            if not os.path.exists(self.csv_path):
+                return
+            file_size = os.path.getsize(self.csv_path)
+            if not self.columns or file_size < self.csv_offset or \
+                    source_fingerprint(self.csv_path, self.csv_offset) != self.fingerprint:
+                # First use, or the CSV was rewritten (e.g. by a migration)
+                self.seed()
+                return
+            if file_size == self.csv_offset:
+                return
+            for row in self.read_from(self.csv_offset, file_size):
+                self.append(row)
+            self.fingerprint = source_fingerprint(self.csv_path, self.csv_offset)
+
+    def latest(self, limit=10):
+        self.catch_up()
+        return super().latest(limit)
+
+    def stats(self):
+        stats = super().stats()
+        stats['csv_offset'] = self.csv_offset
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the most recent tracking rows')
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    recent = CsvRecentActivity(args.csv, max(args.limit, RECENT_CAPACITY))
+    print(json.dumps(recent.latest(args.limit), indent=2, ensure_ascii=False))
+    print(f"📊 Read {recent.stats()['bytes_read']:,} of {os.path.getsize(args.csv):,} bytes")
+
+
+if __name__ == '__main__':
+    main()
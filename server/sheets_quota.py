@@ -0,0 +1,228 @@
+"""
+Quota-aware scheduling for Google Sheets API calls
+
+The Sheets API allows a fixed number of read and write requests per minute.
+Every call goes through SheetsScheduler, which models each quota as a token
+bucket and hands out tokens by priority:
+
+- PRIORITY_LIVE_WRITE: tracked sessions and other live writes
+- PRIORITY_DASHBOARD_READ: dashboard stats and recent data
+- PRIORITY_BULK: migrations and other bulk jobs
+
+Bulk work only uses tokens while a reserve is left for live traffic. Callers
+queue until a token is free, or are shed with QuotaExceeded once their wait
+limit passes. A 429 response drains the bucket and pauses it with exponential
+backoff before the call is retried.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+PRIORITY_LIVE_WRITE = 0
+PRIORITY_DASHBOARD_READ = 1
+PRIORITY_BULK = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_LIVE_WRITE: 'live_write',
+    PRIORITY_DASHBOARD_READ: 'dashboard_read',
+    PRIORITY_BULK: 'bulk'
+}
+
+# Default per-user Sheets quotas (requests per minute) and burst size
+READ_QUOTA_PER_MINUTE = 60
+WRITE_QUOTA_PER_MINUTE = 60
+BURST = 10
+
+# Share of each bucket that bulk work leaves untouched for live traffic
+BULK_RESERVE = 0.3
+
+# Longest a caller queues before being shed (None waits indefinitely)
+MAX_WAIT = {
+    PRIORITY_LIVE_WRITE: None,
+    PRIORITY_DASHBOARD_READ: 5.0,
+    PRIORITY_BULK: None
+}
+
+THROTTLE_RETRIES = 5
+THROTTLE_BACKOFF = 2.0
+MAX_BACKOFF = 64.0
+
+
+class QuotaExceeded(Exception):
+    """Raised when a call is shed instead of waiting longer for quota"""
+
+
+def is_rate_limited(error):
+    """True for a 429 / RESOURCE_EXHAUSTED response from the API"""
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'code', None)
+    return status == 429 or 'RESOURCE_EXHAUSTED' in str(error)
+
+
+class TokenBucket:
+    def __init__(self, per_minute, capacity=BURST):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now, reserve=0.0):
+        """Seconds until a token is available above the reserve"""
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.refill(now)
+        missing = 1 + reserve - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, now, seconds):
+        """Empty the bucket and stop handing out tokens for a while"""
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.updated = self.paused_until
+
+
+class SheetsScheduler:
+    def __init__(self, read_per_minute=READ_QUOTA_PER_MINUTE, write_per_minute=WRITE_QUOTA_PER_MINUTE,
+                 burst=BURST, bulk_reserve=BULK_RESERVE, max_wait=None):
+        self.buckets = {
+            'read': TokenBucket(read_per_minute, burst),
+            'write': TokenBucket(write_per_minute, burst)
+        }
+        self.bulk_reserve = bulk_reserve
+        self.max_wait = {**MAX_WAIT, **(max_wait or {})}
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.waiting = {kind: [] for kind in self.buckets}
+        self.metrics = {
+            kind: {
+                name: {'granted': 0, 'shed': 0, 'throttled': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+                for name in PRIORITY_NAMES.values()
+            }
+            for kind in self.buckets
+        }
+
+    def reserve_for(self, kind, priority):
+        return self.buckets[kind].capacity * self.bulk_reserve if priority == PRIORITY_BULK else 0.0
+
+    def acquire(self, kind, priority, max_wait=None):
+        """Block until this caller may use one request of the given quota"""
+        bucket = self.buckets[kind]
+        ticket = (priority, next(self.sequence))
+        name = PRIORITY_NAMES[priority]
+        started = time.monotonic()
+        deadline = started + max_wait if max_wait is not None else None
+
+        with self.condition:
+            heapq.heappush(self.waiting[kind], ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self.waiting[kind][0] == ticket:
+                        wait = bucket.wait_time(now, self.reserve_for(kind, priority))
+                        if wait == 0:
+                            bucket.take()
+                            heapq.heappop(self.waiting[kind])
+                            break
+                    else:
+                        wait = None  # woken when the queue ahead moves
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self.metrics[kind][name]['shed'] += 1
+                            raise QuotaExceeded(f"Sheets {kind} quota busy; shed {name} request after {max_wait:.1f}s")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self.condition.wait(wait)
+            except BaseException:
+                if ticket in self.waiting[kind]:
+                    self.waiting[kind].remove(ticket)
+                    heapq.heapify(self.waiting[kind])
+                raise
+            finally:
+                self.condition.notify_all()
+
+            waited = time.monotonic() - started
+            metrics = self.metrics[kind][name]
+            metrics['granted'] += 1
+            metrics['wait_seconds'] += waited
+            metrics['max_wait_seconds'] = max(metrics['max_wait_seconds'], waited)
+
+    def call(self, kind, priority, func, *args, max_wait=None, **kwargs):
+        """Run func(*args, **kwargs) within the read or write quota
+
+        Queues for a token (or raises QuotaExceeded past the priority's wait
+        limit) and retries 429 responses after pausing the whole bucket.
+        """
+        if max_wait is None:
+            max_wait = self.max_wait[priority]
+        for attempt in range(THROTTLE_RETRIES + 1):
+            self.acquire(kind, priority, max_wait)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == THROTTLE_RETRIES:
+                    raise
+                backoff = min(MAX_BACKOFF, THROTTLE_BACKOFF * 2 ** attempt)
+                with self.condition:
+                    self.metrics[kind][PRIORITY_NAMES[priority]]['throttled'] += 1
+                    self.buckets[kind].pause(time.monotonic(), backoff)
+                    self.condition.notify_all()
+                print(f"⏳ Sheets {kind} quota hit (429); backing off {backoff:.1f}s")
+
+    def read(self, priority, func, *args, **kwargs):
+        return self.call('read', priority, func, *args, **kwargs)
+
+    def write(self, priority, func, *args, **kwargs):
+        return self.call('write', priority, func, *args, **kwargs)
+
+    def headroom(self, kind, priority=PRIORITY_LIVE_WRITE):
+        """Requests that could start right now without waiting"""
+        with self.condition:
+            bucket = self.buckets[kind]
+            now = time.monotonic()
+            if now < bucket.paused_until:
+                return 0
+            bucket.refill(now)
+            return max(0, int(bucket.tokens - self.reserve_for(kind, priority)))
+
+    def stats(self):
+        """Current quota headroom, queue depth and per-priority counters"""
+        with self.condition:
+            now = time.monotonic()
+            result = {}
+            for kind, bucket in self.buckets.items():
+                if now >= bucket.paused_until:
+                    bucket.refill(now)
+                queued = {name: 0 for name in PRIORITY_NAMES.values()}
+                for priority, _ in self.waiting[kind]:
+                    queued[PRIORITY_NAMES[priority]] += 1
+                by_priority = {}
+                for name, counters in self.metrics[kind].items():
+                    counters = dict(counters)
+                    counters['avg_wait_seconds'] = round(counters['wait_seconds'] / counters['granted'], 4) if counters['granted'] else None
+                    counters['wait_seconds'] = round(counters['wait_seconds'], 4)
+                    counters['max_wait_seconds'] = round(counters['max_wait_seconds'], 4)
+                    by_priority[name] = counters
+                result[kind] = {
+                    'per_minute': round(bucket.rate * 60),
+                    'capacity': bucket.capacity,
+                    'tokens': round(bucket.tokens, 2),
+                    'headroom_pct': round(100 * bucket.tokens / bucket.capacity, 1),
+                    'paused_seconds': round(max(0.0, bucket.paused_until - now), 2),
+                    'queued': queued,
+                    'by_priority': by_priority
+                }
+            return result
+
+
+sheets_scheduler = SheetsScheduler()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Differential sync of user_behavior_tracking.csv to the Google Sheet
+
+Rows are matched by user ID and compared by content hash. Sheet rows are
+grouped into fixed-size blocks by position, and the manifest keeps one digest
+per block (plus a root digest over the blocks) for the state last synced.
+A sync run:
+
+1. reads column A of the sheet (one range read) to place every ID
+2. appends CSV rows whose IDs are missing from the sheet
+3. recomputes block digests from the CSV and reads back only the blocks whose
+   digest moved, updating the rows in them that differ
+4. re-reads a few unchanged blocks round-robin, so manual edits in the sheet
+   are caught over successive runs without a full download
+
+Rows that exist only in the sheet (including duplicates from a re-run
+migration) are reported, never deleted.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from googleSheetsTracker import LAST_COLUMN, sheets_tracker
+from migrate_to_google_sheets import CHUNK_ROWS, iter_chunks, sheet_row
+from sheets_quota import PRIORITY_BULK, sheets_scheduler
+from tracking_archive import read_header
+from tracking_schema import TRACKING_HEADERS, format_timestamp
+
+CSV_PATH = '../public/user_behavior_tracking.csv'
+MANIFEST_PATH = 'data/sheets_sync.json'
+BLOCK_ROWS = 500
+VERIFY_BLOCKS = 2
+
+
+def row_hash(cells):
+    """Content hash of a row as it appears in the sheet"""
+    return hashlib.blake2b('\x1f'.join(cells).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def digest(parts):
+    return hashlib.blake2b(''.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def keyed(ids):
+    """Match keys for IDs; a repeated ID gets an occurrence suffix"""
+    seen = {}
+    keys = []
+    for row_id in ids:
+        count = seen.get(row_id, 0)
+        seen[row_id] = count + 1
+        keys.append(row_id if count == 0 else f"{row_id}#{count}")
+    return keys
+
+
+def pad(cells, width):
+    cells = list(cells[:width])
+    return cells + [''] * (width - len(cells))
+
+
+def load_csv_rows(csv_path, width):
+    """CSV rows as sheet cells, with their match keys and content hashes"""
+    _, header_end = read_header(csv_path)
+    rows = []
+    for chunk, _ in iter_chunks(csv_path, header_end, CHUNK_ROWS):
+        rows.extend(sheet_row(row, width) for row in chunk)
+    keys = keyed([row[0] for row in rows])
+    return [(key, row, row_hash(row)) for key, row in zip(keys, rows)]
+
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    if not os.path.exists(manifest_path):
+        return {'block_rows': BLOCK_ROWS, 'blocks': [], 'root': None, 'verify_cursor': 0}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️  Ignoring unreadable sync manifest: {e}")
+        return {'block_rows': BLOCK_ROWS, 'blocks': [], 'root': None, 'verify_cursor': 0}
+
+
+def save_manifest(manifest, manifest_path=MANIFEST_PATH):
+    manifest_dir = os.path.dirname(manifest_path)
+    if manifest_dir:
+        os.makedirs(manifest_dir, exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def block_digests(sheet_keys, csv_hashes, block_rows):
+    """Digest per positional block over the CSV rows placed in it"""
+    digests = []
+    for start in range(0, len(sheet_keys), block_rows):
+        parts = [
+            f"{key}:{csv_hashes[key]}" for key in sheet_keys[start:start + block_rows]
+            if key in csv_hashes
+        ]
+        digests.append(digest(parts))
+    return digests
+
+
+def contiguous_runs(updates):
+    """Group (sheet_row, cells) pairs into runs of consecutive rows"""
+    runs = []
+    for sheet_row_number, cells in sorted(updates):
+        if runs and runs[-1][0] + len(runs[-1][1]) == sheet_row_number:
+            runs[-1][1].append(cells)
+        else:
+            runs.append((sheet_row_number, [cells]))
+    return runs
+
+
+def sync(csv_path=CSV_PATH, manifest_path=MANIFEST_PATH, block_rows=BLOCK_ROWS,
+         verify_blocks=VERIFY_BLOCKS, dry_run=False, tracker=None):
+    """Bring the sheet in line with the CSV, transferring only what differs"""
+    tracker = tracker or sheets_tracker
+    worksheet = tracker.worksheet
+    width = len(TRACKING_HEADERS)
+    started = time.perf_counter()
+    reads = writes = 0
+
+    csv_rows = load_csv_rows(csv_path, width)
+    csv_hashes = {key: hashed for key, _, hashed in csv_rows}
+    csv_cells = {key: cells for key, cells, _ in csv_rows}
+
+    manifest = load_manifest(manifest_path)
+    if manifest.get('block_rows') != block_rows:
+        manifest = {'block_rows': block_rows, 'blocks': [], 'root': None, 'verify_cursor': 0}
+
+    # 1. Where every ID sits in the sheet (row 1 is the header)
+    id_column = sheets_scheduler.read(PRIORITY_BULK, worksheet.get, 'A2:A')
+    reads += 1
+    sheet_keys = keyed([values[0] if values else '' for values in id_column])
+    sheet_key_set = set(sheet_keys)
+    missing = [(key, cells) for key, cells, _ in csv_rows if key not in sheet_key_set]
+    sheet_only = [key for key in sheet_keys if key not in csv_hashes]
+
+    # 2. Blocks whose CSV digest moved, plus a few unchanged ones to verify
+    expected = block_digests(sheet_keys, csv_hashes, block_rows)
+    known = manifest['blocks']
+    changed_blocks = [index for index, value in enumerate(expected)
+                      if index >= len(known) or known[index] != value]
+    unchanged = [index for index, value in enumerate(expected)
+                 if index < len(known) and known[index] == value]
+    verify = []
+    if unchanged and verify_blocks:
+        cursor = manifest.get('verify_cursor', 0) % len(unchanged)
+        verify = (unchanged[cursor:] + unchanged[:cursor])[:verify_blocks]
+        manifest['verify_cursor'] = cursor + len(verify)
+
+    # 3. Read those blocks back and collect rows whose content differs
+    updates = []
+    for index in sorted(set(changed_blocks) | set(verify)):
+        first = index * block_rows
+        last = min(first + block_rows, len(sheet_keys))
+        values = sheets_scheduler.read(
+            PRIORITY_BULK, worksheet.get, f"A{first + 2}:{LAST_COLUMN}{last + 1}"
+        )
+        reads += 1
+        for offset, key in enumerate(sheet_keys[first:last]):
+            if key not in csv_hashes:
+                continue
+            actual = pad(values[offset], width) if offset < len(values) else [''] * width
+            if row_hash(actual) != csv_hashes[key]:
+                updates.append((first + offset + 2, csv_cells[key]))
+
+    report = {
+        'csv_rows': len(csv_rows),
+        'sheet_rows': len(sheet_keys),
+        'blocks': len(expected),
+        'blocks_changed': len(changed_blocks),
+        'blocks_verified': len(verify),
+        'rows_appended': len(missing),
+        'rows_updated': len(updates),
+        'sheet_only_rows': len(sheet_only),
+        'duplicate_rows': sum(1 for key in sheet_only if '#' in key and key.split('#', 1)[0] in csv_hashes),
+        'dry_run': dry_run
+    }
+
+    if not dry_run:
+        # 4. Fix changed rows with range updates, then append missing ones
+        for sheet_row_number, rows in contiguous_runs(updates):
+            sheets_scheduler.write(
+                PRIORITY_BULK, worksheet.update, values=rows,
+                range_name=f"A{sheet_row_number}:{LAST_COLUMN}{sheet_row_number + len(rows) - 1}"
+            )
+            writes += 1
+        if not sheet_keys and not tracker.get_snapshot():
+            sheets_scheduler.write(PRIORITY_BULK, worksheet.append_rows, [list(TRACKING_HEADERS)])
+            writes += 1
+        for start in range(0, len(missing), CHUNK_ROWS):
+            chunk = [cells for _, cells in missing[start:start + CHUNK_ROWS]]
+            sheets_scheduler.write(PRIORITY_BULK, worksheet.append_rows, chunk)
+            writes += 1
+
+        final_keys = sheet_keys + [key for key, _ in missing]
+        manifest['blocks'] = block_digests(final_keys, csv_hashes, block_rows)
+        manifest['root'] = digest(manifest['blocks'])
+        manifest['rows'] = len(final_keys)
+        manifest['synced_at'] = format_timestamp()
+        save_manifest(manifest, manifest_path)
+
+    report.update({
+        'api_reads': reads,
+        'api_writes': writes,
+        'root': manifest.get('root'),
+        'seconds': round(time.perf_counter() - started, 3)
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync the tracking CSV to Google Sheets by row and block hashes')
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--block-rows', type=int, default=BLOCK_ROWS)
+    parser.add_argument('--verify-blocks', type=int, default=VERIFY_BLOCKS,
+                        help='Unchanged blocks to re-read per run to catch manual edits')
+    parser.add_argument('--full', action='store_true', help='Verify every block this run')
+    parser.add_argument('--dry-run', action='store_true', help='Report differences without writing')
+    args = parser.parse_args()
+
+    if not sheets_tracker.wait_until_ready(timeout=60):
+        print("❌ Google Sheets not available")
+        return
+
+    print("🔄 Syncing tracking CSV to Google Sheets...")
+    verify_blocks = 10 ** 9 if args.full else args.verify_blocks
+    report = sync(args.csv, block_rows=args.block_rows, verify_blocks=verify_blocks, dry_run=args.dry_run)
+    print(f"   CSV rows: {report['csv_rows']:,}, sheet rows: {report['sheet_rows']:,}")
+    print(f"   Blocks: {report['blocks']} ({report['blocks_changed']} changed, {report['blocks_verified']} verified)")
+    print(f"   Appended: {report['rows_appended']:,}, updated: {report['rows_updated']:,}"
+          f"{' (dry run)' if args.dry_run else ''}")
+    if report['sheet_only_rows']:
+        print(f"⚠️  {report['sheet_only_rows']:,} sheet rows are not in the CSV "
+              f"({report['duplicate_rows']:,} duplicate IDs)")
+    print(f"✅ Done in {report['seconds']}s with {report['api_reads']} reads and {report['api_writes']} writes")
+
+
+if __name__ == '__main__':
+    main()
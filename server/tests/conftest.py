@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# The server modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_data import write_sample_csv  # noqa: E402
+
+
+@pytest.fixture
+def sample_csv(tmp_path):
+    """Path of a synthetic tracking CSV with 300 rows"""
+    path = tmp_path / 'tracking.csv'
+    write_sample_csv(str(path), 300)
+    return str(path)
@@ -0,0 +1,186 @@
+import threading
+from datetime import datetime, timedelta, timezone
+import pytest
+import analytics_rollups
+import interaction_log
+from analytics_rollups import AnalyticsRollups, parse_window
+from interaction_log import EVENT_SPRINT, EVENT_USER_STORY, InteractionLog, format_entry, parse_bulk
+
+
+@pytest.fixture
+def log(tmp_path):
+    log = InteractionLog(str(tmp_path / 'interactions.log'), str(tmp_path / 'logs'),
+                         str(tmp_path / 'interactions.index.json'), max_bytes=4096)
+    now = datetime.now()
+    for index in range(120):
+        local = now - timedelta(minutes=7 * (120 - index))
+        visitor = f"v{index % 9}"
+        if index < 40:
+            action = 'User Story: admin - reset' if index % 3 else 'Sprint: 2 devs | 2 weeks'
+            if index == 5:
+                action = 'Feedback: nice'
+            log.append(f"{local:%Y-%m-%d %H:%M:%S} | Visitor:{visitor} | IP:10.0.0.{index} | {action}\n")
+        else:
+            event = EVENT_SPRINT if index % 2 else EVENT_USER_STORY
+            log.append(format_entry(visitor, None if index % 5 else f"10.0.0.{index}", event,
+                                   {'target': 'admin'}, local.astimezone(timezone.utc)))
+    return log
+
+
+def fold_one_by_one(log, tmp_path):
+    rollups = AnalyticsRollups(log, checkpoint_path=str(tmp_path / 'one_by_one.json'))
+    for entry, offset in log.iter_entries(0):
+        if entry:
+            rollups.apply(entry)
+        rollups.log_offset = offset
+    rollups.prune()
+    return rollups
+
+
+def test_bulk_rebuild_matches_folding_entries(log, tmp_path):
+    expected = fold_one_by_one(log, tmp_path)
+    rollups = AnalyticsRollups(log, checkpoint_path=str(tmp_path / 'bulk.json'))
+    rollups.catch_up()
+
+    assert rollups.log_offset == expected.log_offset
+    assert rollups.totals == expected.totals
+    assert rollups.buckets == expected.buckets
+    assert rollups.visitors.to_dict() == expected.visitors.to_dict()
+    assert rollups.visitor_details == expected.visitor_details
+    assert rollups.visitor_tallies(100) == expected.visitor_tallies(100)
+    assert list(rollups.recent) == list(expected.recent)
+    assert rollups.visitor_sketches.to_dict() == expected.visitor_sketches.to_dict()
+
+
+def test_catch_up_after_rebuild_folds_new_lines(log, tmp_path):
+    rollups = AnalyticsRollups(log, checkpoint_path=str(tmp_path / 'bulk.json'))
+    rollups.catch_up()
+    heard = []
+    rollups.listeners.append(lambda detail, delta, unique: heard.append(detail['visitor_id']))
+    log.append(format_entry('late', '10.0.0.1', EVENT_USER_STORY, {'target': 'guest'}))
+    rollups.catch_up()
+
+    assert heard == ['late']
+    assert rollups.log_offset == log.end_offset()
+    assert rollups.totals == fold_one_by_one(log, tmp_path).totals
+
+
+def test_parse_bulk_keeps_file_order_for_misfit_legacy_lines():
+    lines = [
+        "2025-08-06 09:00:00 | Visitor:a | IP:1.1.1.1 | User Story: admin - reset\n",
+        "2025-08-06 08:00:00 | Visitor:b | IP:1.1.1.2 | Sprint: 2 devs | 2 weeks\n",
+        "2025-08-06 07:00:00 | Visitor:c | IP:1.1.1.3 | User Story: guest - login\n"
+    ]
+    columns = parse_bulk(''.join(lines).encode('utf-8'))
+    assert columns['visitor'].tolist() == ['a', 'b', 'c']
+    assert columns['event'].tolist() == [1, 2, 1]
+
+
+@pytest.mark.parametrize('arrow', [True, False])
+def test_parse_bulk_json_matches_line_parser(monkeypatch, arrow):
+    if not arrow:
+        monkeypatch.setattr(interaction_log, 'pa', None)
+    lines = [format_entry(f"v{index}", None if index % 4 else '1.2.3.4',
+                          EVENT_SPRINT if index % 2 else EVENT_USER_STORY, {'note': 'a "quoted" value'})
+             for index in range(50)]
+    columns = parse_bulk(''.join(lines).encode('utf-8'))
+    entries = [interaction_log.parse_line(line) for line in lines]
+    assert columns['visitor'].tolist() == [entry['visitor_id'] for entry in entries]
+    assert columns['ip'].tolist() == [entry['ip'] for entry in entries]
+    assert [columns['event_types'][code] for code in columns['event'].tolist()] == \
+        [entry['event'] for entry in entries]
+
+
+def test_visitor_tallies_rank_by_interactions(log, tmp_path):
+    rollups = AnalyticsRollups(log, checkpoint_path=str(tmp_path / 'rollups.json'))
+    rollups.catch_up()
+    everyone = rollups.visitor_tallies(100)
+    counts = [tally['interactions'] for tally in everyone]
+    assert counts == sorted(counts, reverse=True)
+    assert rollups.visitor_tallies(3) == everyone[:3]
+
+
+@pytest.mark.parametrize('args', [('90m', None, None), (None, 'yesterday', None), (None, None, '2025-13-40')])
+def test_parse_window_rejects_bad_values(args):
+    with pytest.raises(ValueError):
+        parse_window(*args)
+
+
+def test_parse_window_accepts_iso_bounds():
+    since, until = parse_window(None, '2025-08-06T07:00:00Z', '')
+    assert since == datetime(2025, 8, 6, 7, tzinfo=timezone.utc)
+    assert until is None
+
+
+def test_checkpoint_is_written_without_holding_up_requests(log, tmp_path, monkeypatch):
+    rollups = AnalyticsRollups(log, checkpoint_path=str(tmp_path / 'rollups.json'))
+    write_checkpoint = rollups.write_checkpoint
+    release = threading.Event()
+    written = threading.Event()
+
+    def slow_write(state):
+        release.wait(10)
+        write_checkpoint(state)
+        written.set()
+
+    monkeypatch.setattr(rollups, 'write_checkpoint', slow_write)
+    summary = rollups.summary()
+    # Answered while the checkpoint write is still blocked
+    assert summary['total_interactions'] == 120
+    assert rollups.saving
+
+    release.set()
+    assert written.wait(10)
+    restored = AnalyticsRollups(log, checkpoint_path=str(tmp_path / 'rollups.json'))
+    assert restored.log_offset == rollups.log_offset
+    assert restored.visitor_sketches.to_dict() == rollups.visitor_sketches.to_dict()
+    assert restored.summary()['unique_visitors_by_window'] == summary['unique_visitors_by_window']
+
+
+def test_only_recent_minute_sketches_are_kept(log, tmp_path):
+    rollups = AnalyticsRollups(log, checkpoint_path=str(tmp_path / 'rollups.json'))
+    rollups.catch_up()
+    cutoff = (datetime.now(timezone.utc) - timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M')
+    assert rollups.visitor_sketches.buckets['minute']
+    assert min(rollups.visitor_sketches.buckets['minute']) >= cutoff
+    # The minute counters themselves keep a full day
+    assert min(rollups.buckets['minute']) < cutoff
+
+
+def entry(occurred, visitor_id, action='User Story'):
+    return {'timestamp': occurred.isoformat(), 'visitor_id': visitor_id, 'action': action}
+
+
+def test_visitor_tallies_stay_within_capacity(log, tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics_rollups, 'VISITOR_CAPACITY', 8)
+    rollups = AnalyticsRollups(log, checkpoint_path=str(tmp_path / 'rollups.json'))
+    now = datetime.now(timezone.utc)
+    exact = {}
+    # A few heavy visitors among many one-off ones
+    for index in range(400):
+        visitor_id = f"heavy{index % 3}" if index % 2 else f"once{index}"
+        exact[visitor_id] = exact.get(visitor_id, 0) + 1
+        rollups.apply(entry(now, visitor_id))
+
+    assert len(rollups.visitor_details) == len(rollups.visitors.counters) == 8
+    top = rollups.visitor_tallies(3)
+    assert sorted(tally['visitor_id'] for tally in top) == ['heavy0', 'heavy1', 'heavy2']
+    for tally in rollups.visitor_tallies(8):
+        true_count = exact[tally['visitor_id']]
+        assert tally['interactions'] - tally['interactions_error'] <= true_count <= tally['interactions']
+
+
+def test_old_days_are_compacted_into_months(log, tmp_path):
+    rollups = AnalyticsRollups(log, checkpoint_path=str(tmp_path / 'rollups.json'))
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(days=500)
+    for offset in range(3):
+        rollups.apply(entry(old + timedelta(hours=offset), 'old'))
+    rollups.apply(entry(now, 'new'))
+    rollups.prune(now)
+
+    assert old.strftime('%Y-%m-%d') not in rollups.buckets['day']
+    assert rollups.buckets['month'][old.strftime('%Y-%m')]['interactions'] == 3
+    assert rollups.window_counts(None, now - timedelta(days=30))['interactions'] == 3
+    assert rollups.window_counts(now - timedelta(days=700))['interactions'] == 4
+    assert rollups.window_counts(now - timedelta(days=7))['interactions'] == 1
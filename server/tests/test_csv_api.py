@@ -0,0 +1,113 @@
+import gzip
+import math
+import pytest
+import csv_api
+from benchmark_data import write_sample_csv
+from recent_activity import CsvRecentActivity
+from tracking_cache import TrackingFrameCache
+from tracking_search import TrackingSearchIndex
+from tracking_sketches import TrackingSketches
+from tracking_stats import ColumnStatsCatalog
+
+
+@pytest.fixture
+def client(sample_csv, tmp_path, monkeypatch):
+    monkeypatch.setattr(csv_api, 'CSV_PATH', sample_csv)
+    monkeypatch.setattr(csv_api, 'frame_cache', TrackingFrameCache(sample_csv, archive_dir=str(tmp_path / 'archive')))
+    monkeypatch.setattr(csv_api, 'recent_activity', CsvRecentActivity(sample_csv, capacity=20))
+    monkeypatch.setattr(csv_api, 'search_index', TrackingSearchIndex())
+    monkeypatch.setattr(csv_api, 'user_sketches', TrackingSketches(sample_csv, str(tmp_path / 'sketches.json')))
+    monkeypatch.setattr(csv_api, 'column_stats', ColumnStatsCatalog(sample_csv, str(tmp_path / 'stats.json')))
+    return csv_api.app.test_client()
+
+
+def assert_no_null_strings(records):
+    for record in records:
+        for value in record.values():
+            assert value != 'null'
+            assert not (isinstance(value, float) and math.isnan(value))
+
+
+@pytest.mark.parametrize('limit', [5, 20, 50])
+def test_recent_nulls_are_none_from_ring_and_frame(client, limit):
+    response = client.get(f"/api/csv/recent?limit={limit}")
+    assert response.status_code == 200
+    records = response.get_json()['recent_records']
+    assert len(records) == limit
+    assert [record['user-id'] for record in records] == [f"{index:06d}" for index in range(300 - limit, 300)]
+    assert_no_null_strings(records)
+    assert any(record['chat-bubble-free'] is None for record in records)
+
+
+def test_recent_ring_and_frame_agree(client):
+    ring = client.get('/api/csv/recent?limit=20').get_json()['recent_records']
+    frame = client.get('/api/csv/recent?limit=21').get_json()['recent_records']
+    assert frame[1:] == ring
+
+
+def page_ids(response):
+    return [record['user-id'] for record in response.get_json()['data']]
+
+
+@pytest.mark.parametrize('query', ['page=0', 'page=-1', 'per_page=0', 'per_page=-5', 'page=x', 'per_page=1.5'])
+def test_data_rejects_bad_page_numbers(client, query):
+    response = client.get(f"/api/csv/data?{query}")
+    assert response.status_code == 400
+
+
+def test_cursor_pages_cover_the_snapshot_once(client, sample_csv):
+    response = client.get('/api/csv/data?per_page=70')
+    ids = page_ids(response)
+    cursor = response.get_json()['pagination']['next_cursor']
+
+    # Rows appended mid-walk stay out of the snapshot
+    write_sample_csv(sample_csv, 10, start=300)
+    while cursor:
+        response = client.get(f"/api/csv/data?per_page=70&cursor={cursor}")
+        assert response.status_code == 200
+        ids += page_ids(response)
+        cursor = response.get_json()['pagination']['next_cursor']
+
+    assert ids == [f"{index:06d}" for index in range(300)]
+    assert response.get_json()['pagination']['has_next'] is False
+
+
+def test_cursor_keeps_its_search(client):
+    first = client.get('/api/csv/data?per_page=5&search=admin').get_json()
+    cursor = first['pagination']['next_cursor']
+    response = client.get(f"/api/csv/data?per_page=5&search=admin&cursor={cursor}")
+    assert response.status_code == 200
+    assert page_ids(response)[0] > first['data'][-1]['user-id']
+    assert client.get(f"/api/csv/data?per_page=5&search=guest&cursor={cursor}").status_code == 400
+    assert client.get(f"/api/csv/data?per_page=5&cursor={cursor}").status_code == 400
+
+
+@pytest.mark.parametrize('cursor', ['garbage', 'e30', ''])
+def test_malformed_cursor_is_rejected(client, cursor):
+    response = client.get(f"/api/csv/data?cursor={cursor}")
+    # An empty cursor is the same as none
+    assert response.status_code == (200 if cursor == '' else 400)
+
+
+def test_cursor_expires_when_the_csv_is_rewritten(client, sample_csv):
+    cursor = client.get('/api/csv/data?per_page=5').get_json()['pagination']['next_cursor']
+    with open(sample_csv, 'r', encoding='utf-8') as f:
+        text = f.read()
+    with open(sample_csv, 'w', encoding='utf-8') as f:
+        f.write(text.replace('\n000', '\n900'))
+    assert client.get(f"/api/csv/data?per_page=5&cursor={cursor}").status_code == 410
+
+
+def test_cursor_from_before_a_restart_expires(client, monkeypatch):
+    cursor = client.get('/api/csv/data?per_page=5').get_json()['pagination']['next_cursor']
+    # A restarted server begins again at generation 0 over the same file
+    monkeypatch.setattr(csv_api, 'CURSOR_BOOT', 'restarted')
+    assert client.get(f"/api/csv/data?per_page=5&cursor={cursor}").status_code == 410
+
+
+def test_gzip_download_matches_the_file(client, sample_csv):
+    response = client.get('/api/csv/download', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    with open(sample_csv, 'rb') as f:
+        assert gzip.decompress(response.data) == f.read()
@@ -0,0 +1,15 @@
+import gzip
+from file_responses import CHUNK_BYTES, gzip_chunks
+
+
+def test_gzip_stops_at_the_statted_size(tmp_path):
+    path = tmp_path / 'tracking.csv'
+    body = b'row\n' * (CHUNK_BYTES // 2 + 7)
+    path.write_bytes(body)
+    chunks = gzip_chunks(str(path), len(body))
+
+    # Rows appended while the response streams aren't sent
+    first = next(chunks, b'')
+    with open(path, 'ab') as f:
+        f.write(b'late\n' * 100)
+    assert gzip.decompress(first + b''.join(chunks)) == body
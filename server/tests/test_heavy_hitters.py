@@ -0,0 +1,78 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from heavy_hitters import BucketedTopK, CountMinSketch, SpaceSaving
+
+
+def skewed_stream(length=20000, seed=3):
+    rng = random.Random(seed)
+    values = [f"value{rank}" for rank in range(1, 2001)]
+    weights = [1 / rank ** 1.2 for rank in range(1, 2001)]
+    return rng.choices(values, weights, k=length)
+
+
+def test_space_saving_bounds_hold_on_a_skewed_stream():
+    stream = skewed_stream()
+    exact = Counter(stream)
+    summary = SpaceSaving(64)
+    for value in stream:
+        summary.add(value)
+
+    assert summary.total == len(stream)
+    assert summary.min_count() <= len(stream) / 64
+    for value, count, error in summary.top(64):
+        assert count - error <= exact[value] <= count
+    # Anything seen more than N / capacity times is tracked
+    for value, count in exact.items():
+        if count > len(stream) / 64:
+            assert value in summary.counters
+    assert [value for value, _, _ in summary.top(5)] == [value for value, _ in exact.most_common(5)]
+
+
+def test_eviction_inherits_the_smallest_count():
+    summary = SpaceSaving(2)
+    for value in ['a', 'a', 'a', 'b', 'b']:
+        assert summary.add(value) is None
+    assert summary.add('c') == 'b'
+    assert summary.counters == {'a': [3, 0], 'c': [3, 2]}
+    assert summary.min_count() == 3
+    # The lazy heap skips its stale entries for b and the old count of a
+    assert summary.add('d') in ('a', 'c')
+    assert summary.top(1)[0][1] == 4
+
+
+def test_count_min_never_undercounts():
+    stream = skewed_stream()
+    exact = Counter(stream)
+    sketch = CountMinSketch(width=256, depth=4)
+    for value in stream:
+        sketch.add(value)
+
+    bound, _ = sketch.error_bound()
+    over = [sketch.estimate(value) - count for value, count in exact.items()]
+    assert min(over) >= 0
+    assert sum(1 for error in over if error > bound) <= len(over) * 0.05
+    assert CountMinSketch.from_dict(sketch.to_dict()).estimate('value1') == sketch.estimate('value1')
+
+
+def test_day_buckets_merge_into_windows_and_prune():
+    sketch = BucketedTopK(capacity=8)
+    start = datetime(2025, 8, 1, 12, tzinfo=timezone.utc)
+    for day in range(5):
+        for _ in range(day + 1):
+            sketch.add('rising', start + timedelta(days=day))
+        sketch.add('daily', start + timedelta(days=day))
+        sketch.add('daily', start + timedelta(days=day))
+
+    window = sketch.top(2, start + timedelta(days=3), start + timedelta(days=5))
+    assert [(value['value'], value['count']) for value in window['values']] == [('rising', 9), ('daily', 4)]
+    assert window['total'] == 13
+    assert all(value['guaranteed'] for value in window['values'])
+
+    sketch.prune(start + timedelta(days=3))
+    assert sorted(sketch.buckets) == ['2025-08-04', '2025-08-05']
+    assert sketch.top(2, start)['total'] == 13
+    # The all-time summary keeps the pruned days
+    assert sketch.top(1)['values'][0] == {'value': 'rising', 'count': 15, 'error': 0, 'guaranteed': True}
+    restored = BucketedTopK.from_dict(sketch.to_dict())
+    assert restored.top(2, start) == sketch.top(2, start)
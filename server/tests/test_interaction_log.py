@@ -0,0 +1,135 @@
+import json
+import os
+import pytest
+import interaction_log
+from interaction_log import EVENT_SPRINT, InteractionLog, decode_cursor, encode_cursor, format_entry, parse_line
+
+
+def make_log(tmp_path, **kwargs):
+    return InteractionLog(str(tmp_path / 'interactions.log'), str(tmp_path / 'logs'),
+                          str(tmp_path / 'interactions.index.json'), **kwargs)
+
+
+def line(index):
+    return f"line {index:03d}\n"
+
+
+def fill(log, count, start=0):
+    for index in range(start, start + count):
+        log.append(line(index))
+
+
+def test_active_file_rotates_into_segments_with_global_offsets(tmp_path):
+    log = make_log(tmp_path, max_bytes=100)
+    fill(log, 30)
+
+    segments = log.segments()
+    assert len(segments) == 3
+    assert all(os.path.dirname(path) == str(tmp_path / 'logs') for path, _, _, _ in segments[:-1])
+    assert segments[-1][0] == str(tmp_path / 'interactions.log')
+    # Offsets and line numbers carry on from one segment to the next
+    for (_, base, size, first_line), (_, next_base, _, next_line) in zip(segments, segments[1:]):
+        assert next_base == base + size
+        assert next_line - first_line == size // len(line(0))
+    assert log.end_offset() == 30 * len(line(0))
+    assert log.line_count() == 30
+    assert [text for text, _ in log.iter_lines()] == [line(index).rstrip('\n') for index in range(30)]
+
+
+def test_old_active_file_rotates_by_age(tmp_path, monkeypatch):
+    log = make_log(tmp_path, max_age=60)
+    fill(log, 2)
+    created = log.index['active']['created_at']
+    monkeypatch.setattr(interaction_log.time, 'time', lambda: created + 61)
+    fill(log, 1, start=2)
+    assert len(log.index['segments']) == 1
+    assert log.index['segments'][0]['lines'] == 2
+    assert log.rotate() is not None
+    assert log.rotate() is None  # nothing new to seal
+
+
+def test_sparse_index_is_rebuilt_on_load(tmp_path):
+    log = make_log(tmp_path, index_interval=4)
+    fill(log, 10)
+    points = log.index['active']['points']
+    assert [point[0] for point in points] == [4, 8]
+    assert points[1][1] == 8 * len(line(0))
+
+    # Lines after the last saved point are counted from the file
+    reopened = make_log(tmp_path, index_interval=4)
+    assert reopened.line_count() == 10
+    fill(reopened, 2, start=10)
+    assert [point[0] for point in reopened.index['active']['points']] == [4, 8, 12]
+
+    with open(tmp_path / 'interactions.index.json', 'w') as f:
+        f.write('{not json')
+    rebuilt = make_log(tmp_path, index_interval=4)
+    assert rebuilt.line_count() == 12
+    assert rebuilt.index['active']['points'] == reopened.index['active']['points']
+
+
+def test_partial_last_line_is_not_read(tmp_path):
+    log = make_log(tmp_path)
+    fill(log, 3)
+    with open(log.log_path, 'a') as f:
+        f.write('half a li')
+
+    assert [text for text, _ in log.iter_lines()] == ['line 000', 'line 001', 'line 002']
+    assert log.complete_end_offset() == 3 * len(line(0))
+    assert log.end_offset() == log.complete_end_offset() + len('half a li')
+    assert log.tail(2)[0] == ['line 001', 'line 002']
+
+
+@pytest.mark.parametrize('read_block', [16, 64 * 1024])
+def test_tail_reads_back_across_segments(tmp_path, monkeypatch, read_block):
+    monkeypatch.setattr(interaction_log, 'READ_BLOCK', read_block)
+    log = make_log(tmp_path, max_bytes=100)
+    fill(log, 25)
+    size = len(line(0))
+
+    lines, start, end = log.tail(15)
+    assert lines == [line(index).rstrip('\n') for index in range(10, 25)]
+    assert (start, end) == (10 * size, 25 * size)
+    # Paging backwards from the previous start
+    lines, start, end = log.tail(15, before=start)
+    assert lines == [line(index).rstrip('\n') for index in range(10)]
+    assert (start, end) == (0, 10 * size)
+    assert log.tail(0) == ([], 25 * size, 25 * size)
+
+
+def test_read_since_resumes_across_segments(tmp_path):
+    log = make_log(tmp_path, max_bytes=100)
+    fill(log, 25)
+
+    pages = []
+    offset = 0
+    while True:
+        lines, offset = log.read_since(decode_cursor(encode_cursor(offset)), 7)
+        if not lines:
+            break
+        pages.append(lines)
+    assert [len(page) for page in pages] == [7, 7, 7, 4]
+    assert sum(pages, []) == [line(index).rstrip('\n') for index in range(25)]
+    assert offset == log.end_offset()
+
+    # Nothing is lost across a rotation that happens between reads
+    log.rotate()
+    fill(log, 2, start=25)
+    assert log.read_since(offset, 10) == (['line 025', 'line 026'], offset + 2 * len(line(0)))
+
+
+def test_json_and_legacy_lines_parse_to_the_same_shape(tmp_path):
+    log = make_log(tmp_path)
+    log.append("2025-08-06 07:00:00 | Visitor:ab12 | IP:1.2.3.4 | User Story: admin - reset | again\n")
+    log.append(format_entry('cd34', None, EVENT_SPRINT, {'team': '2 devs', 'timeline': '2 weeks'}))
+    log.append("not an interaction\n")
+
+    legacy, structured, other = [entry for entry, _ in log.iter_entries()]
+    assert (legacy['visitor_id'], legacy['ip'], legacy['action']) == ('ab12', '1.2.3.4', 'User Story')
+    assert legacy['detail'] == 'admin - reset | again'
+    assert (structured['visitor_id'], structured['ip'], structured['action']) == ('cd34', None, 'Sprint Planning')
+    assert structured['detail'] == '2 devs - 2 weeks'
+    assert other is None
+    assert parse_line(json.dumps(['not', 'a', 'record'])) is None
+    with pytest.raises(ValueError):
+        decode_cursor('x12')
@@ -0,0 +1,94 @@
+import json
+from live_feed import EventBroker, RETRY_MS
+
+
+def parse(message):
+    fields = dict(line.split(': ', 1) for line in message.strip().split('\n'))
+    return fields.get('id'), fields['event'], json.loads(fields['data'])
+
+
+def test_resuming_replays_events_after_last_event_id():
+    broker = EventBroker()
+    ids = [broker.publish('session', {'n': n}) for n in range(4)]
+
+    stream = broker.stream(ids[1])
+    assert next(stream) == f"retry: {RETRY_MS}\n\n"
+    assert [parse(next(stream)) for _ in range(2)] == [
+        (ids[2], 'session', {'n': 2}),
+        (ids[3], 'session', {'n': 3})
+    ]
+    broker.publish('session', {'n': 4})
+    assert parse(next(stream))[2] == {'n': 4}
+    stream.close()
+
+    stats = broker.stats()
+    assert (stats['resumes'], stats['replayed'], stats['subscribers']) == (1, 2, 0)
+    # Caught up: nothing to replay
+    assert broker.subscribe(stats['last_event_id']).replay == []
+
+
+def test_ids_from_another_boot_or_outside_history_reset():
+    broker = EventBroker(history=3)
+    ids = [broker.publish('session', {'n': n}) for n in range(5)]
+    restarted = EventBroker()
+    restarted.boot = 'other'
+    restarted.publish('session', {'n': 0})
+
+    assert broker.replay_after(ids[1]) is not None
+    assert broker.replay_after(ids[0]) is None
+    assert broker.replay_after(f"{broker.boot}-99") is None
+    assert broker.replay_after('garbage') is None
+    # Evicted from history, or issued before a restart
+    for source, stale in ((broker, ids[0]), (restarted, ids[4])):
+        stream = source.stream(stale)
+        next(stream)
+        assert parse(next(stream))[:2] == (None, 'reset')
+        stream.close()
+    assert broker.stats()['resets'] == 1 and restarted.stats()['resets'] == 1
+
+
+def test_slow_subscriber_gets_overflow_and_is_dropped():
+    broker = EventBroker(queue_size=2)
+    slow = broker.stream()
+    next(slow)
+    for n in range(3):
+        broker.publish('session', {'n': n})
+    fast = broker.subscribe()
+    broker.publish('session', {'n': 3})
+
+    messages = list(slow)
+    assert [parse(message)[2] for message in messages[:2]] == [{'n': 0}, {'n': 1}]
+    assert parse(messages[2])[:2] == (None, 'overflow')
+    assert len(messages) == 3
+    stats = broker.stats()
+    assert stats['overflows'] == 1
+    assert stats['subscribers'] == 1
+    # Publishing never blocked and other subscribers still get events
+    assert not fast.overflowed
+    assert fast.queue.get_nowait()[3] == {'n': 3}
+
+
+def test_subscribers_are_capped():
+    broker = EventBroker(max_subscribers=1)
+    first = broker.subscribe()
+    assert broker.subscribe() is None
+    response = broker.response()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+    assert broker.stats()['rejected'] == 2
+
+    broker.unsubscribe(first)
+    assert broker.subscribe() is not None
+
+
+def test_idle_stream_sends_heartbeats():
+    broker = EventBroker(heartbeat=0.01)
+    stream = broker.stream()
+    next(stream)
+    assert next(stream) == ": keepalive\n\n"
+    assert next(stream) == ": keepalive\n\n"
+    broker.publish('interaction', {'visitor': 'v1'})
+    assert parse(next(stream))[1:] == ('interaction', {'visitor': 'v1'})
+    stream.close()
+    assert broker.stats()['subscribers'] == 0
+    assert broker.stats()['delivered'] == 1
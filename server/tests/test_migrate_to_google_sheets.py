@@ -0,0 +1,87 @@
+import json
+import pytest
+import fake_gspread
+import migrate_to_google_sheets
+from benchmark_data import write_sample_csv
+from fake_gspread import FakeBehavior, FakeClient
+from googleSheetsTracker import GoogleSheetsTracker
+from migrate_to_google_sheets import migrate_behavior_tracking
+from sheets_quota import SheetsScheduler
+from sheets_sync import load_csv_rows
+from tracking_schema import TRACKING_HEADERS
+
+
+@pytest.fixture
+def behavior():
+    return FakeBehavior()
+
+
+@pytest.fixture
+def tracker(tmp_path, monkeypatch, behavior):
+    fake_gspread.reset()
+    scheduler = SheetsScheduler(read_per_minute=60000, write_per_minute=60000)
+    tracker = GoogleSheetsTracker(
+        scheduler=scheduler,
+        spool_path=str(tmp_path / 'spool.jsonl'),
+        client_factory=lambda: FakeClient(behavior),
+        connect_in_background=False
+    )
+    monkeypatch.setattr(migrate_to_google_sheets, 'sheets_scheduler', scheduler)
+    monkeypatch.setattr(migrate_to_google_sheets, 'sheets_tracker', tracker)
+    yield tracker
+    fake_gspread.reset()
+
+
+def expected_sheet(csv_path):
+    return [list(TRACKING_HEADERS)] + [cells for _, cells, _ in load_csv_rows(csv_path, len(TRACKING_HEADERS))]
+
+
+def fail_chunk(monkeypatch, worksheet, behavior, number, applied):
+    """Make the number-th append_rows call fail, after landing when applied"""
+    calls = []
+    append_rows = worksheet.append_rows
+
+    def failing_append_rows(values, **kwargs):
+        calls.append(len(values))
+        if len(calls) == number:
+            behavior.fail_next(1, 503, 'backendError', applied=applied)
+        return append_rows(values, **kwargs)
+
+    monkeypatch.setattr(worksheet, 'append_rows', failing_append_rows)
+
+
+def test_rows_are_migrated_in_chunks(tracker, tmp_path, behavior):
+    csv_path = str(tmp_path / 'tracking.csv')
+    write_sample_csv(csv_path, 25)
+    checkpoint_path = str(tmp_path / 'migration.json')
+
+    assert migrate_behavior_tracking(csv_path, 10, checkpoint_path=checkpoint_path)
+    assert tracker.worksheet.get_all_values() == expected_sheet(csv_path)
+    assert behavior.stats()['calls']['append_rows'] == 3
+    with open(checkpoint_path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    assert (checkpoint['rows_migrated'], checkpoint['chunks'], checkpoint['pending']) == (25, 3, None)
+
+
+@pytest.mark.parametrize('applied', [True, False])
+def test_resuming_after_a_failed_chunk_does_not_duplicate_rows(tracker, tmp_path, monkeypatch, behavior, applied):
+    csv_path = str(tmp_path / 'tracking.csv')
+    write_sample_csv(csv_path, 30)
+    checkpoint_path = str(tmp_path / 'migration.json')
+    fail_chunk(monkeypatch, tracker.worksheet, behavior, 2, applied)
+
+    assert not migrate_behavior_tracking(csv_path, 10, checkpoint_path=checkpoint_path)
+    with open(checkpoint_path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    assert checkpoint['rows_migrated'] == 10
+    assert checkpoint['pending']['rows'] == 10
+    assert len(tracker.worksheet.get_all_values()) == (21 if applied else 11)
+
+    # The pending chunk is confirmed from the sheet when it landed, resent when it didn't
+    assert migrate_behavior_tracking(csv_path, 10, checkpoint_path=checkpoint_path)
+    values = tracker.worksheet.get_all_values()
+    assert values == expected_sheet(csv_path)
+    assert len({row[0] for row in values[1:]}) == 30
+    with open(checkpoint_path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    assert (checkpoint['rows_migrated'], checkpoint['chunks'], checkpoint['pending']) == (30, 3, None)
@@ -0,0 +1,91 @@
+import csv
+import pytest
+import fake_gspread
+import googleSheetsTracker
+import migrate_tracking_schema
+from fake_gspread import FakeBehavior, FakeClient
+from googleSheetsTracker import GoogleSheetsTracker
+from migrate_tracking_schema import migrate_csv, migrate_rows, migrate_sheet
+from sheets_quota import SheetsScheduler
+from tracking_schema import TRACKING_HEADERS, is_record_id, parse_tracking_time
+
+
+@pytest.fixture(autouse=True)
+def fresh_fake(tmp_path, monkeypatch):
+    fake_gspread.reset()
+    monkeypatch.setattr(migrate_tracking_schema, 'ID_MAP_PATH', str(tmp_path / 'data' / 'id_map.json'))
+    yield
+    fake_gspread.reset()
+
+
+def legacy_row(user_id, start, end):
+    return [user_id, start, end] + ['null'] * (len(TRACKING_HEADERS) - 3)
+
+
+def test_unparseable_times_are_left_as_they_are():
+    rows = [
+        legacy_row('000001', '07:05 - 06Aug25', '07:09 - 06Aug25'),
+        legacy_row('000002', 'null', 'null'),
+        legacy_row('000003', '', 'not a time'),
+        legacy_row('000004', '07:05 - 06Aug25', 'null'),
+    ]
+    migrated, id_map, changed, untimed = migrate_rows(rows)
+
+    assert untimed == 2
+    assert changed == 4
+    assert len(id_map) == 4
+    assert all(is_record_id(row[0]) for row in migrated)
+    assert migrated[0][1] == migrated[3][1]
+    assert parse_tracking_time(migrated[0][1]) == parse_tracking_time('07:05 - 06Aug25')
+    assert parse_tracking_time(migrated[0][2]) == parse_tracking_time('07:09 - 06Aug25')
+    assert migrated[1][1:3] == ['null', 'null']
+    assert migrated[2][1:3] == ['', 'not a time']
+    # No end time is invented from the start either
+    assert migrated[3][2] == 'null'
+
+
+def test_migrated_rows_are_left_alone_on_a_second_run():
+    first, _, _, _ = migrate_rows([legacy_row('000001', '07:05 - 06Aug25', 'null')])
+    again, id_map, changed, untimed = migrate_rows(first)
+    assert again == first
+    assert (id_map, changed, untimed) == ([], 0, 0)
+
+
+def test_csv_keeps_null_times(tmp_path):
+    path = tmp_path / 'tracking.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(TRACKING_HEADERS)
+        writer.writerow(legacy_row('000001', 'null', 'null'))
+        writer.writerow(legacy_row('000002', '07:05 - 06Aug25', '07:06 - 06Aug25'))
+
+    id_map = migrate_csv(str(path))
+    assert [entry['legacy_id'] for entry in id_map] == ['000001', '000002']
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))[1:]
+    assert rows[0][1:3] == ['null', 'null']
+    assert rows[1][1].endswith('Z')
+
+
+def test_sheet_key_columns_are_written_with_one_update(tmp_path, monkeypatch):
+    behavior = FakeBehavior()
+    tracker = GoogleSheetsTracker(
+        scheduler=SheetsScheduler(read_per_minute=60000, write_per_minute=60000),
+        spool_path=str(tmp_path / 'spool.jsonl'),
+        client_factory=lambda: FakeClient(behavior),
+        connect_in_background=False
+    )
+    monkeypatch.setattr(googleSheetsTracker, 'sheets_tracker', tracker)
+    tracker.worksheet.append_rows([
+        legacy_row('000001', '07:05 - 06Aug25', '07:06 - 06Aug25'),
+        legacy_row('000002', 'null', 'null'),
+    ])
+
+    assert migrate_sheet()
+    assert behavior.stats()['calls']['update'] == 1
+    values = tracker.worksheet.get_all_values()
+    assert values[0] == list(TRACKING_HEADERS)
+    assert all(is_record_id(row[0]) for row in values[1:])
+    assert values[1][1].endswith('Z')
+    assert values[2][1:3] == ['null', 'null']
+    assert values[2][3:] == ['null'] * (len(TRACKING_HEADERS) - 3)
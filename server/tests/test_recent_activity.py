@@ -0,0 +1,60 @@
+import os
+from benchmark_data import write_sample_csv
+from recent_activity import CsvRecentActivity, RecentActivity
+
+
+def user_ids(rows):
+    return [row['user-id'] for row in rows]
+
+
+def test_ring_keeps_the_newest_rows_in_order():
+    recent = RecentActivity(capacity=3)
+    for value in range(5):
+        recent.append(value)
+    assert recent.latest(10) == [2, 3, 4]
+    assert recent.latest(2) == [3, 4]
+    assert recent.latest(0) == []
+
+
+def test_seed_reads_only_the_tail(sample_csv):
+    recent = CsvRecentActivity(sample_csv, capacity=10)
+    assert user_ids(recent.latest(3)) == ['000297', '000298', '000299']
+    assert recent.stats()['bytes_read'] < os.path.getsize(sample_csv) // 10
+
+
+def test_appended_rows_reach_listeners(sample_csv):
+    recent = CsvRecentActivity(sample_csv, capacity=10)
+    recent.catch_up()
+    heard = []
+    recent.listeners.append(lambda row: heard.append(row['user-id']))
+
+    write_sample_csv(sample_csv, 4, start=300)
+    assert user_ids(recent.latest(5)) == ['000299', '000300', '000301', '000302', '000303']
+    assert heard == ['000300', '000301', '000302', '000303']
+
+
+def test_partial_last_record_is_not_read(sample_csv):
+    recent = CsvRecentActivity(sample_csv, capacity=10)
+    recent.catch_up()
+    with open(sample_csv, 'a', encoding='utf-8') as f:
+        f.write('999999,07:00 - 06Aug25')
+    assert user_ids(recent.latest(1)) == ['000299']
+
+
+def test_rewritten_csv_is_reseeded(sample_csv):
+    recent = CsvRecentActivity(sample_csv, capacity=10)
+    recent.catch_up()
+    heard = []
+    recent.listeners.append(heard.append)
+
+    # Same number of bytes, different rows
+    with open(sample_csv, 'r', encoding='utf-8') as f:
+        text = f.read()
+    with open(sample_csv, 'w', encoding='utf-8') as f:
+        f.write(text.replace('\n000', '\n900'))
+    assert user_ids(recent.latest(2)) == ['900298', '900299']
+
+    # Shorter file
+    write_sample_csv(sample_csv, 5)
+    assert user_ids(recent.latest(10)) == ['000000', '000001', '000002', '000003', '000004']
+    assert heard == []
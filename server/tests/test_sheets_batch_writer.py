@@ -0,0 +1,175 @@
+import threading
+import time
+import pytest
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+import fake_gspread
+import googleSheetsTracker
+from fake_gspread import FakeBehavior, FakeClient
+from googleSheetsTracker import GoogleSheetsTracker, STATE_READY
+from sheets_quota import SheetsScheduler
+from tracking_schema import TRACKING_HEADERS
+
+
+@pytest.fixture(autouse=True)
+def fresh_fake(monkeypatch):
+    fake_gspread.reset()
+    monkeypatch.setattr(googleSheetsTracker, 'BATCH_RETRY_BACKOFF', 0)
+    yield
+    fake_gspread.reset()
+
+
+def make_tracker(tmp_path, behavior, batch_size=50, batch_interval=0.05, **kwargs):
+    tracker = GoogleSheetsTracker(
+        batch_size=batch_size,
+        batch_interval=batch_interval,
+        scheduler=SheetsScheduler(read_per_minute=60000, write_per_minute=60000),
+        spool_path=str(tmp_path / 'spool.jsonl'),
+        client_factory=lambda: FakeClient(behavior),
+        **kwargs
+    )
+    return tracker
+
+
+def submit(tracker, count):
+    return [tracker.submit_user_session({'chat_bubble_1': f"question {index}"}) for index in range(count)]
+
+
+def sheet_rows(tracker):
+    values = tracker.worksheet.get_all_values()
+    assert values[0] == list(TRACKING_HEADERS)
+    return values[1:]
+
+
+def test_rows_are_batched_and_written_in_order(tmp_path):
+    behavior = FakeBehavior()
+    # Only full batches are written until the flush, however slowly rows arrive
+    tracker = make_tracker(tmp_path, behavior, batch_interval=60, connect_in_background=False)
+    futures = submit(tracker, 120)
+    tracker.flush()
+    ids = [future.result(timeout=10) for future in futures]
+
+    assert ids == [future.user_id for future in futures]
+    assert [row[0] for row in sheet_rows(tracker)] == ids
+    assert [row[10] for row in sheet_rows(tracker)] == [f"question {index}" for index in range(120)]
+    stats = tracker.write_stats()
+    assert stats['rows_written'] == 120
+    assert stats['batches'] == 3
+    assert behavior.stats()['calls']['append_rows'] == 3
+
+
+def test_error_after_the_append_landed_is_not_resent(tmp_path):
+    behavior = FakeBehavior()
+    tracker = make_tracker(tmp_path, behavior, connect_in_background=False)
+    behavior.fail_next(1, 503, 'backendError', applied=True)
+    futures = submit(tracker, 5)
+    ids = [future.result(timeout=10) for future in futures]
+
+    assert [row[0] for row in sheet_rows(tracker)] == ids
+    stats = tracker.write_stats()
+    assert stats['landed_checks'] == 1
+    assert stats['api_calls'] == 1
+    assert behavior.stats()['calls']['append_rows'] == 1
+
+
+def test_error_before_the_append_is_resent_after_checking(tmp_path):
+    behavior = FakeBehavior()
+    tracker = make_tracker(tmp_path, behavior, connect_in_background=False)
+    behavior.fail_next(1, 500, 'backendError')
+    futures = submit(tracker, 5)
+    ids = [future.result(timeout=10) for future in futures]
+
+    assert [row[0] for row in sheet_rows(tracker)] == ids
+    stats = tracker.write_stats()
+    assert stats['landed_checks'] == 1
+    assert stats['retries'] == 1
+
+
+def test_refused_connection_is_resent_without_checking(tmp_path, monkeypatch):
+    behavior = FakeBehavior()
+    tracker = make_tracker(tmp_path, behavior, connect_in_background=False)
+    append_rows = tracker.worksheet.append_rows
+    calls = []
+
+    def refuse_once(rows, **kwargs):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            refused = NewConnectionError(None, 'Failed to establish a new connection: [Errno 111] Connection refused')
+            raise RequestsConnectionError(MaxRetryError(None, '/v4/spreadsheets', reason=refused))
+        return append_rows(rows, **kwargs)
+
+    monkeypatch.setattr(tracker.worksheet, 'append_rows', refuse_once)
+    futures = submit(tracker, 3)
+    ids = [future.result(timeout=10) for future in futures]
+
+    assert calls == [3, 3]
+    assert [row[0] for row in sheet_rows(tracker)] == ids
+    assert tracker.write_stats()['landed_checks'] == 0
+
+
+def test_batch_fails_when_every_attempt_fails(tmp_path):
+    behavior = FakeBehavior()
+    tracker = make_tracker(tmp_path, behavior, connect_in_background=False)
+    # The append, then the landed check on each retry and the final one
+    behavior.fail_next(googleSheetsTracker.BATCH_RETRIES + 1, 500, 'backendError')
+    futures = submit(tracker, 2)
+    for future in futures:
+        with pytest.raises(Exception):
+            future.result(timeout=10)
+    assert sheet_rows(tracker) == []
+    assert tracker.write_stats()['rows_failed'] == 2
+
+
+def test_rows_spooled_before_connecting_are_replayed_in_order(tmp_path):
+    behavior = FakeBehavior()
+    release = threading.Event()
+
+    def slow_client():
+        release.wait(10)
+        return FakeClient(behavior)
+
+    tracker = GoogleSheetsTracker(
+        batch_interval=0.05,
+        scheduler=SheetsScheduler(read_per_minute=60000, write_per_minute=60000),
+        spool_path=str(tmp_path / 'spool.jsonl'),
+        client_factory=slow_client
+    )
+    futures = submit(tracker, 10)
+    assert tracker.status()['spooled_rows'] == 10
+
+    release.set()
+    ids = [future.result(timeout=10) for future in futures]
+    assert tracker.wait_until_ready(10)
+    assert tracker.state == STATE_READY
+    assert [row[0] for row in sheet_rows(tracker)] == ids
+    # The drained spool file is removed right after its futures resolve
+    deadline = time.monotonic() + 10
+    while tracker.status()['spooled_rows'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert tracker.status()['spooled_rows'] == 0
+
+
+def test_rows_fetched_by_a_refresh_before_the_merge_are_not_counted_twice(tmp_path, monkeypatch):
+    behavior = FakeBehavior()
+    tracker = make_tracker(tmp_path, behavior, connect_in_background=False)
+    tracker.fetch_snapshot(full=True)
+    append_rows = tracker.worksheet.append_rows
+
+    def append_then_refresh(rows, **kwargs):
+        result = append_rows(rows, **kwargs)
+        # An incremental refresh lands between the append and the snapshot merge
+        tracker.fetch_snapshot(full=False)
+        return result
+
+    monkeypatch.setattr(tracker.worksheet, 'append_rows', append_then_refresh)
+    ids = [future.result(timeout=10) for future in submit(tracker, 5)]
+
+    snapshot = tracker.snapshot
+    assert snapshot['rows'] == len(sheet_rows(tracker)) == 5
+    assert [row[0] for row in snapshot['values'][1:]] == ids
+    assert snapshot['stats']['total_sessions'] == 5
+    assert [record['user-id'] for record in tracker.recent.latest(10)] == ids
+
+    # The next incremental read starts right after the real last row
+    tracker.worksheet.append_rows([["EXTERNAL"] + [''] * (len(TRACKING_HEADERS) - 1)])
+    assert tracker.fetch_snapshot(full=False)['rows'] == 6
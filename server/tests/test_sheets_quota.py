@@ -0,0 +1,121 @@
+import threading
+import time
+import pytest
+import fake_gspread
+import sheets_quota
+from fake_gspread import FakeAPIError, FakeBehavior, FakeClient
+from sheets_quota import (PRIORITY_BULK, PRIORITY_DASHBOARD_READ, PRIORITY_LIVE_WRITE,
+                          QuotaExceeded, SheetsScheduler)
+
+
+@pytest.fixture(autouse=True)
+def fresh_fake(monkeypatch):
+    fake_gspread.reset()
+    monkeypatch.setattr(sheets_quota, 'THROTTLE_BACKOFF', 0.05)
+    yield
+    fake_gspread.reset()
+
+
+def drain(scheduler, kind):
+    bucket = scheduler.buckets[kind]
+    bucket.tokens = 0.0
+    bucket.updated = time.monotonic()
+
+
+def test_waiting_callers_are_served_by_priority():
+    scheduler = SheetsScheduler(write_per_minute=240, burst=2)
+    drain(scheduler, 'write')
+    granted = []
+
+    def caller(priority):
+        scheduler.acquire('write', priority)
+        granted.append(priority)
+
+    threads = []
+    # Queue the lowest priority first; a token only frees up every 0.25s
+    for priority in (PRIORITY_BULK, PRIORITY_DASHBOARD_READ, PRIORITY_LIVE_WRITE):
+        thread = threading.Thread(target=caller, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        while len(scheduler.waiting['write']) < len(threads):
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join(5)
+
+    assert granted == [PRIORITY_LIVE_WRITE, PRIORITY_DASHBOARD_READ, PRIORITY_BULK]
+    stats = scheduler.stats()['write']
+    assert sum(stats['queued'].values()) == 0
+    assert stats['by_priority']['bulk']['max_wait_seconds'] > stats['by_priority']['live_write']['max_wait_seconds']
+
+
+def test_bulk_work_leaves_a_reserve_for_live_traffic():
+    scheduler = SheetsScheduler(write_per_minute=1, burst=10, bulk_reserve=0.3)
+    assert scheduler.headroom('write') == 10
+    assert scheduler.headroom('write', PRIORITY_BULK) == 7
+
+    scheduler.buckets['write'].tokens = 3.5
+    with pytest.raises(QuotaExceeded):
+        scheduler.acquire('write', PRIORITY_BULK, max_wait=0.05)
+    scheduler.acquire('write', PRIORITY_LIVE_WRITE)
+    assert scheduler.buckets['write'].tokens == pytest.approx(2.5, abs=0.01)
+
+
+def test_callers_past_their_wait_limit_are_shed():
+    scheduler = SheetsScheduler(read_per_minute=1, max_wait={PRIORITY_DASHBOARD_READ: 0.05})
+    drain(scheduler, 'read')
+    started = time.monotonic()
+    with pytest.raises(QuotaExceeded):
+        scheduler.read(PRIORITY_DASHBOARD_READ, lambda: 'never called')
+    assert time.monotonic() - started < 1
+
+    stats = scheduler.stats()['read']
+    assert stats['by_priority']['dashboard_read']['shed'] == 1
+    assert stats['by_priority']['dashboard_read']['granted'] == 0
+    # The shed caller left the queue, so it doesn't block anyone
+    assert scheduler.waiting['read'] == []
+
+
+def test_429_pauses_the_bucket_and_retries():
+    now = [0.0]
+    behavior = FakeBehavior(write_quota=2, clock=lambda: now[0])
+    sheet = FakeClient(behavior).open_by_key('quota').get_worksheet(0)
+    scheduler = SheetsScheduler(write_per_minute=60000)
+    attempts = []
+
+    def append(values):
+        attempts.append(time.monotonic())
+        if behavior.stats()['quota_errors']:
+            now[0] += 60  # the fake's quota window has passed by the retry
+        return sheet.append_row(values)
+
+    for index in range(3):
+        scheduler.write(PRIORITY_LIVE_WRITE, append, [f"row {index}"])
+
+    assert behavior.stats()['quota_errors'] == 1
+    assert len(attempts) == 4
+    assert attempts[3] - attempts[2] >= sheets_quota.THROTTLE_BACKOFF
+    assert sheet.get_all_values() == [['row 0'], ['row 1'], ['row 2']]
+    assert scheduler.stats()['write']['by_priority']['live_write']['throttled'] == 1
+
+
+def test_backoff_doubles_and_gives_up(monkeypatch):
+    monkeypatch.setattr(sheets_quota, 'THROTTLE_BACKOFF', 0.01)
+    behavior = FakeBehavior()
+    sheet = FakeClient(behavior).open_by_key('quota').get_worksheet(0)
+    scheduler = SheetsScheduler(write_per_minute=60000)
+    pauses = []
+    pause = scheduler.buckets['write'].pause
+    monkeypatch.setattr(scheduler.buckets['write'], 'pause',
+                        lambda now, seconds: pauses.append(seconds) or pause(now, seconds))
+
+    behavior.fail_next(sheets_quota.THROTTLE_RETRIES + 1, 429, 'RESOURCE_EXHAUSTED')
+    with pytest.raises(FakeAPIError):
+        scheduler.write(PRIORITY_LIVE_WRITE, sheet.append_row, ['lost'])
+    assert pauses == [0.01 * 2 ** attempt for attempt in range(sheets_quota.THROTTLE_RETRIES)]
+
+    # Other errors are not retried
+    behavior.fail_next(1, 500, 'backendError')
+    with pytest.raises(FakeAPIError):
+        scheduler.write(PRIORITY_LIVE_WRITE, sheet.append_row, ['lost'])
+    assert behavior.stats()['calls']['append_row'] == sheets_quota.THROTTLE_RETRIES + 2
+    assert sheet.get_all_values() == []
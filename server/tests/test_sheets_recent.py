@@ -0,0 +1,61 @@
+import pytest
+import fake_gspread
+from fake_gspread import FakeBehavior, FakeClient
+from googleSheetsTracker import GoogleSheetsTracker
+from sheets_quota import SheetsScheduler
+from tracking_schema import TRACKING_HEADERS
+
+
+@pytest.fixture(autouse=True)
+def fresh_fake():
+    fake_gspread.reset()
+    yield
+    fake_gspread.reset()
+
+
+def make_tracker(tmp_path, **kwargs):
+    return GoogleSheetsTracker(
+        batch_interval=0.01,
+        scheduler=SheetsScheduler(read_per_minute=60000, write_per_minute=60000),
+        spool_path=str(tmp_path / 'spool.jsonl'),
+        client_factory=lambda: FakeClient(FakeBehavior()),
+        connect_in_background=False,
+        **kwargs
+    )
+
+
+def external_row(user_id):
+    return [user_id] + [''] * (len(TRACKING_HEADERS) - 1)
+
+
+def test_recent_rows_follow_the_sheet_once_the_snapshot_expires(tmp_path):
+    tracker = make_tracker(tmp_path, snapshot_ttl=0, snapshot_max_stale=0)
+    ids = [future.result(timeout=10) for future in
+           [tracker.submit_user_session({'chat_bubble_1': 'hi'}) for _ in range(3)]]
+    assert [row['user-id'] for row in tracker.get_recent_data(3)] == ids
+
+    # Another writer appends behind the tracker's back
+    tracker.worksheet.append_rows([external_row('EXTERNAL')])
+    fetches = tracker.snapshot_stats()['fetches']
+    assert [row['user-id'] for row in tracker.get_recent_data(2)] == [ids[-1], 'EXTERNAL']
+    assert tracker.snapshot_stats()['fetches'] == fetches + 1
+
+
+def test_recent_rows_come_from_a_fresh_snapshot_without_fetching(tmp_path):
+    tracker = make_tracker(tmp_path, snapshot_ttl=60)
+    tracker.worksheet.append_rows([external_row('EXTERNAL')])
+    stats = tracker.snapshot_stats()
+    assert tracker.get_recent_data(5) == []
+    after = tracker.snapshot_stats()
+    assert after['fetches'] == stats['fetches']
+    assert after['fresh_hits'] == stats['fresh_hits'] + 1
+
+
+def test_cleared_sheet_empties_recent_rows(tmp_path):
+    # Deletions are only seen by a full reconciliation
+    tracker = make_tracker(tmp_path, snapshot_ttl=0, snapshot_max_stale=0, reconcile_interval=0)
+    tracker.submit_user_session({'chat_bubble_1': 'hi'}).result(timeout=10)
+    assert len(tracker.get_recent_data(5)) == 1
+
+    tracker.worksheet.clear()
+    assert tracker.get_recent_data(5) == []
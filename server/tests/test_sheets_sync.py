@@ -0,0 +1,102 @@
+import csv
+import pytest
+import fake_gspread
+import migrate_to_google_sheets
+import sheets_sync
+from benchmark_data import write_sample_csv
+from fake_gspread import FakeBehavior, FakeClient
+from googleSheetsTracker import GoogleSheetsTracker
+from sheets_quota import SheetsScheduler
+from sheets_sync import load_csv_rows, sync
+from tracking_schema import TRACKING_HEADERS
+
+
+@pytest.fixture
+def tracker(tmp_path, monkeypatch):
+    fake_gspread.reset()
+    scheduler = SheetsScheduler(read_per_minute=60000, write_per_minute=60000)
+    tracker = GoogleSheetsTracker(
+        scheduler=scheduler,
+        spool_path=str(tmp_path / 'spool.jsonl'),
+        client_factory=lambda: FakeClient(FakeBehavior()),
+        connect_in_background=False
+    )
+    monkeypatch.setattr(sheets_sync, 'sheets_scheduler', scheduler)
+    monkeypatch.setattr(migrate_to_google_sheets, 'sheets_tracker', tracker)
+    yield tracker
+    fake_gspread.reset()
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'tracking.csv'
+    write_sample_csv(str(path), 45)
+    return str(path)
+
+
+def run(tracker, csv_path, tmp_path, **kwargs):
+    return sync(csv_path, str(tmp_path / 'sync.json'), block_rows=10, tracker=tracker, **kwargs)
+
+
+def expected_sheet(csv_path):
+    return [list(TRACKING_HEADERS)] + [cells for _, cells, _ in load_csv_rows(csv_path, len(TRACKING_HEADERS))]
+
+
+def edit_csv(csv_path, index, column, value):
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    rows[index + 1][column] = value
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f, lineterminator='\n').writerows(rows)
+
+
+def test_missing_rows_are_appended_and_a_rerun_is_a_no_op(tracker, csv_path, tmp_path):
+    report = run(tracker, csv_path, tmp_path)
+    assert report['rows_appended'] == 45
+    assert tracker.worksheet.get_all_values() == expected_sheet(csv_path)
+
+    again = run(tracker, csv_path, tmp_path)
+    assert (again['rows_appended'], again['rows_updated'], again['blocks_changed']) == (0, 0, 0)
+    assert again['api_writes'] == 0
+    assert again['root'] == report['root']
+
+    write_sample_csv(csv_path, 3, start=45)
+    grown = run(tracker, csv_path, tmp_path)
+    assert (grown['rows_appended'], grown['rows_updated']) == (3, 0)
+    assert tracker.worksheet.get_all_values() == expected_sheet(csv_path)
+
+
+def test_changed_rows_are_updated_in_place(tracker, csv_path, tmp_path):
+    run(tracker, csv_path, tmp_path)
+    edit_csv(csv_path, 12, 4, 'changed target')
+    edit_csv(csv_path, 13, 4, 'changed target')
+
+    report = run(tracker, csv_path, tmp_path, verify_blocks=0)
+    assert (report['blocks_changed'], report['rows_updated'], report['rows_appended']) == (1, 2, 0)
+    # Two adjacent rows go out as one range update
+    assert report['api_writes'] == 1
+    values = tracker.worksheet.get_all_values()
+    assert values == expected_sheet(csv_path)
+    assert values[13][4] == values[14][4] == 'changed target'
+
+
+def test_manual_sheet_edits_are_caught_by_verification(tracker, csv_path, tmp_path):
+    run(tracker, csv_path, tmp_path)
+    tracker.worksheet.update([['edited by hand']], 'E30')
+
+    skipped = run(tracker, csv_path, tmp_path, verify_blocks=0)
+    assert skipped['rows_updated'] == 0
+    report = run(tracker, csv_path, tmp_path, verify_blocks=10)
+    assert (report['blocks_verified'], report['rows_updated']) == (5, 1)
+    assert tracker.worksheet.get_all_values() == expected_sheet(csv_path)
+
+
+def test_duplicate_sheet_rows_are_reported_not_deleted(tracker, csv_path, tmp_path):
+    run(tracker, csv_path, tmp_path)
+    duplicate = tracker.worksheet.get_all_values()[5]
+    tracker.worksheet.append_rows([duplicate, ['not-in-csv'] + duplicate[1:]])
+
+    report = run(tracker, csv_path, tmp_path)
+    assert (report['sheet_only_rows'], report['duplicate_rows']) == (2, 1)
+    assert (report['rows_appended'], report['rows_updated']) == (0, 0)
+    assert len(tracker.worksheet.get_all_values()) == 48
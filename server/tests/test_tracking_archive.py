@@ -0,0 +1,90 @@
+import os
+import pandas as pd
+import pytest
+from benchmark_data import write_sample_csv
+from tracking_archive import (archive_is_current, compact, load_manifest, load_tracking_frame, tail_offset,
+                              tracking_columns)
+from tracking_schema import TRACKING_HEADERS
+
+pytest.importorskip('pyarrow')
+
+
+def plain(frame):
+    """Frame with every null as None, for comparing archive and CSV reads"""
+    frame = frame.astype(object)
+    return frame.where(frame.notna(), None)
+
+
+def read_directly(csv_path, columns=None):
+    return plain(pd.read_csv(csv_path, usecols=columns, dtype=str))
+
+
+def test_segments_plus_csv_tail_round_trip(sample_csv, tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    first = compact(sample_csv, archive_dir)
+    assert (first['segment'], first['rows'], first['malformed_rows']) == ('segment-00001.parquet', 300, 0)
+    write_sample_csv(sample_csv, 40, start=300)
+    assert compact(sample_csv, archive_dir)['rows'] == 40
+    write_sample_csv(sample_csv, 7, start=340)
+
+    manifest = load_manifest(archive_dir)
+    assert [segment['rows'] for segment in manifest['segments']] == [300, 40]
+    assert manifest['total_rows'] == 340
+    assert manifest['segments'][1]['source_start'] == manifest['segments'][0]['source_end']
+
+    frame = plain(load_tracking_frame(sample_csv, archive_dir=archive_dir))
+    assert len(frame) == 347
+    pd.testing.assert_frame_equal(frame, read_directly(sample_csv))
+    # 'null' cells come back as nulls from the archive and the tail alike
+    assert frame[TRACKING_HEADERS[6]].isin(['Completed', None]).all()
+
+    columns = [TRACKING_HEADERS[0], TRACKING_HEADERS[4]]
+    pd.testing.assert_frame_equal(plain(load_tracking_frame(sample_csv, columns, archive_dir)),
+                                  read_directly(sample_csv, columns))
+    assert tracking_columns(sample_csv, archive_dir) == list(TRACKING_HEADERS)
+
+
+def test_a_record_still_being_written_is_not_archived(sample_csv, tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    with open(sample_csv, 'a', encoding='utf-8') as f:
+        f.write('000300,07:00 - 06Aug25')
+    assert compact(sample_csv, archive_dir)['rows'] == 300
+    assert compact(sample_csv, archive_dir, min_rows=1) == {
+        'segment': None, 'rows': 0, 'pending_rows': 0, 'malformed_rows': 0
+    }
+    with open(sample_csv, 'rb') as f:
+        size = len(f.read())
+    assert load_manifest(archive_dir)['source_offset'] == size - len('000300,07:00 - 06Aug25')
+
+
+def test_a_rewritten_csv_is_detected_and_the_archive_rebuilt(sample_csv, tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    compact(sample_csv, archive_dir)
+    write_sample_csv(sample_csv, 300, seed=11)
+
+    manifest = load_manifest(archive_dir)
+    assert not archive_is_current(manifest, sample_csv)
+    # Readers fall back to the CSV rather than serve stale segments
+    pd.testing.assert_frame_equal(plain(load_tracking_frame(sample_csv, archive_dir=archive_dir)),
+                                  read_directly(sample_csv))
+
+    rebuilt = compact(sample_csv, archive_dir)
+    assert (rebuilt['segment'], rebuilt['rows']) == ('segment-00001.parquet', 300)
+    manifest = load_manifest(archive_dir)
+    assert manifest['total_rows'] == 300 and len(manifest['segments']) == 1
+    assert archive_is_current(manifest, sample_csv)
+    assert sorted(os.listdir(archive_dir)) == ['manifest.json', 'segment-00001.parquet']
+    pd.testing.assert_frame_equal(plain(load_tracking_frame(sample_csv, archive_dir=archive_dir)),
+                                  read_directly(sample_csv))
+
+
+def test_tail_offset_skips_newlines_inside_quoted_fields(tmp_path):
+    path = tmp_path / 'quoted.csv'
+    records = ['id,text\n', '1,"one\nline"\n', '2,two\n', '3,"three\n\nlines"\n']
+    path.write_bytes(''.join(records).encode('utf-8'))
+    starts = [sum(len(record) for record in records[:index]) for index in range(len(records))]
+
+    header_end = starts[1]
+    assert tail_offset(str(path), 1, header_end, block_bytes=4) == starts[3]
+    assert tail_offset(str(path), 2, header_end, block_bytes=4) == starts[2]
+    assert tail_offset(str(path), 10, header_end) == header_end
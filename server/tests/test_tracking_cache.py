@@ -0,0 +1,81 @@
+import os
+import pandas as pd
+from benchmark_data import write_sample_csv
+from tracking_cache import TrackingFrameCache
+
+
+def test_only_fixed_choice_columns_are_categorical(sample_csv, tmp_path):
+    cache = TrackingFrameCache(sample_csv, archive_dir=str(tmp_path / 'archive'))
+    frame = cache.get()
+    categorical = [column for column in frame.columns if isinstance(frame[column].dtype, pd.CategoricalDtype)]
+    assert categorical == ['playground-step1', 'playground-step2']
+
+    # Appended free text doesn't widen any categories
+    with open(sample_csv, 'a', encoding='utf-8') as f:
+        f.write('999999,07:00 - 06Aug25,07:00 - 06Aug25,conv-1,a brand new target,x,Completed,'
+                '4 devs,six weeks,null,anything,at,all,here,null\n')
+    frame = cache.get()
+    assert frame['playground-mess-target'].iloc[-1] == 'a brand new target'
+    assert frame['playground-mess-target'].dtype == object
+    assert list(frame['playground-step1'].cat.categories) == ['Completed']
+
+
+def make_cache(sample_csv, tmp_path):
+    return TrackingFrameCache(sample_csv, archive_dir=str(tmp_path / 'archive'))
+
+
+def fresh_frame(sample_csv, tmp_path):
+    return make_cache(sample_csv, tmp_path).get()
+
+
+def test_appended_rows_are_parsed_from_the_tail(sample_csv, tmp_path):
+    cache = make_cache(sample_csv, tmp_path)
+    frame, generation = cache.get_versioned()
+    parsed = cache.stats()['bytes_parsed']
+
+    write_sample_csv(sample_csv, 25, start=300)
+    grown, grown_generation = cache.get_versioned()
+    stats = cache.stats()
+    assert grown_generation == generation
+    assert stats['incremental_loads'] == 1
+    assert stats['rows_appended'] == 25
+    assert stats['bytes_parsed'] - parsed < parsed // 5
+    assert grown.iloc[:len(frame)].equals(frame)
+    pd.testing.assert_frame_equal(grown, fresh_frame(sample_csv, tmp_path))
+
+
+def test_partial_last_record_waits_for_its_newline(sample_csv, tmp_path):
+    cache = make_cache(sample_csv, tmp_path)
+    cache.get()
+    with open(sample_csv, 'a', encoding='utf-8') as f:
+        f.write('999999,07:00 - 06Aug25')
+    assert len(cache.get()) == 300
+
+    with open(sample_csv, 'a', encoding='utf-8') as f:
+        f.write(',07:01 - 06Aug25' + ',null' * 12 + '\n')
+    frame = cache.get()
+    assert len(frame) == 301
+    assert frame['end-time'].iloc[-1] == '07:01 - 06Aug25'
+    assert cache.stats()['full_loads'] == 1
+
+
+def test_rewritten_csv_is_loaded_again(sample_csv, tmp_path):
+    cache = make_cache(sample_csv, tmp_path)
+    _, generation = cache.get_versioned()
+
+    # Same size, same inode, different bytes
+    with open(sample_csv, 'r', encoding='utf-8') as f:
+        text = f.read()
+    with open(sample_csv, 'w', encoding='utf-8') as f:
+        f.write(text.replace('\n000', '\n900'))
+    frame, rewritten = cache.get_versioned()
+    assert rewritten == generation + 1
+    assert frame['user-id'].iloc[0] == '900000'
+
+    # Replaced by a shorter file
+    write_sample_csv(str(tmp_path / 'short.csv'), 5)
+    os.replace(tmp_path / 'short.csv', sample_csv)
+    frame, replaced = cache.get_versioned()
+    assert replaced == rewritten + 1
+    assert list(frame['user-id']) == ['000000', '000001', '000002', '000003', '000004']
+    assert cache.stats()['rewrites'] == 2
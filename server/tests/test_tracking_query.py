@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from tracking_cache import TrackingFrameCache
+from tracking_query import compile_query
+from tracking_schema import TRACKING_HEADERS
+from tracking_search import TrackingSearchIndex
+
+
+@pytest.fixture
+def frame(sample_csv):
+    return TrackingFrameCache(sample_csv).get_versioned()
+
+
+@pytest.mark.parametrize('column, text', [
+    ('playground-mess-description', 'check'),
+    ('playground-mess-description', 'heck'),
+    ('playground-mess-description', 'eck flow, st'),
+    ('playground-mess-description', 'ut flow'),
+    ('playground-mess-description', 'n'),
+    ('playground-mess-description', 'STEP 1'),
+    ('playground-mess-target', 'adm'),
+    ('playground-mess-team', '1 dev'),
+    ('playground-mess-team', ', '),
+    ('start-time', '07:0'),
+    ('chat-bubble-2', 'goals?'),
+    ('playground-mess-timeline', 'nothing like this'),
+])
+def test_text_criteria_match_substrings_with_and_without_index(frame, column, text):
+    df, generation = frame
+    plan = compile_query({column: text}, list(df.columns))
+
+    indexed, explain = plan.select(df, generation, TrackingSearchIndex())
+    scanned, _ = plan.select(df, generation)
+
+    expected = np.flatnonzero(df[column].astype(object).str.contains(text, case=False, na=False, regex=False))
+    assert list(indexed) == list(scanned) == list(expected)
+
+
+def test_substring_matches_inside_words(frame):
+    df, generation = frame
+    plan = compile_query({'playground-mess-target': 'adm'}, list(df.columns))
+    rows, explain = plan.select(df, generation, TrackingSearchIndex())
+    assert len(rows) == (df['playground-mess-target'].astype(object) == 'admin').sum() > 0
+    assert explain['steps'][0]['method'] == 'index+verify'
+
+
+def test_substring_lookups_see_tokens_from_appended_rows(sample_csv):
+    cache = TrackingFrameCache(sample_csv)
+    index = TrackingSearchIndex()
+    plan = compile_query({'playground-mess-target': 'rtne'}, TRACKING_HEADERS)
+    df, generation = cache.get_versioned()
+    assert len(plan.select(df, generation, index)[0]) == 0
+
+    with open(sample_csv, 'a', encoding='utf-8') as f:
+        f.write(','.join(['000300', 'null', 'null', 'conv-300', 'partner'] + ['null'] * (len(TRACKING_HEADERS) - 5)) + '\n')
+    df, generation = cache.get_versioned()
+    rows, _ = plan.select(df, generation, index)
+    assert list(rows) == [300]
+    assert index.tokens_containing('rtne') == ['partner']
+
+
+def test_mask_predicates_combine_with_text(frame):
+    df, generation = frame
+    criteria = {'playground-mess-description': 'check', 'playground-mess-target': ['admin', 'guest']}
+    plan = compile_query(criteria, list(df.columns))
+    rows, _ = plan.select(df, generation, TrackingSearchIndex())
+    result = df.iloc[rows]
+    assert len(result)
+    assert result['playground-mess-description'].str.contains('check').all()
+    assert result['playground-mess-target'].astype(object).isin(['admin', 'guest']).all()
+
+
+def test_bad_range_is_rejected(frame):
+    df, _ = frame
+    with pytest.raises(ValueError):
+        compile_query({'start-time': {'min': 'not a time'}}, list(df.columns))
+    with pytest.raises(ValueError):
+        compile_query({}, list(df.columns), ['no-such-column'])
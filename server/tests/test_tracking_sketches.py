@@ -0,0 +1,93 @@
+import os
+import re
+import threading
+from benchmark_data import write_sample_csv
+from hyperloglog import HyperLogLog, standard_error
+from tracking_sketches import TrackingSketches
+
+
+def sketches_for(sample_csv, tmp_path):
+    return TrackingSketches(sample_csv, str(tmp_path / 'sketches.json'))
+
+
+def test_catch_up_folds_only_appended_rows(sample_csv, tmp_path):
+    sketches = sketches_for(sample_csv, tmp_path)
+    assert abs(sketches.unique_users() - 300) <= 6
+
+    write_sample_csv(sample_csv, 100, start=300)
+    assert abs(sketches.unique_users() - 400) <= 8
+    assert sketches.csv_offset == os.path.getsize(sample_csv)
+
+
+def test_partial_last_record_waits_for_its_newline(sample_csv, tmp_path):
+    sketches = sketches_for(sample_csv, tmp_path)
+    sketches.catch_up()
+    complete = sketches.csv_offset
+    with open(sample_csv, 'a', encoding='utf-8') as f:
+        f.write('999999,07:00 - 06Aug25')
+    sketches.catch_up()
+    assert sketches.csv_offset == complete
+
+
+def test_same_size_rewrite_is_rebuilt(sample_csv, tmp_path):
+    sketches = sketches_for(sample_csv, tmp_path)
+    sketches.catch_up()
+    sketches.checkpoint()
+
+    # A migration merges every row into one user without changing the file size
+    with open(sample_csv, 'r', encoding='utf-8') as f:
+        text = f.read()
+    with open(sample_csv, 'w', encoding='utf-8') as f:
+        f.write(re.sub(r'\n\d{6},', '\n000001,', text))
+
+    reloaded = sketches_for(sample_csv, tmp_path)
+    assert reloaded.csv_offset == os.path.getsize(sample_csv)
+    assert reloaded.unique_users() == 1
+
+
+def test_checkpoint_without_fingerprint_is_rebuilt(sample_csv, tmp_path):
+    sketches = sketches_for(sample_csv, tmp_path)
+    sketches.catch_up()
+    sketches.fingerprint = None
+    sketches.checkpoint()
+
+    reloaded = sketches_for(sample_csv, tmp_path)
+    assert abs(reloaded.unique_users() - 300) <= 6
+    assert reloaded.fingerprint is not None
+
+
+def test_merged_sketches_count_the_union():
+    first, second = HyperLogLog(), HyperLogLog()
+    for value in range(6000):
+        first.add(value)
+    for value in range(4000, 10000):
+        second.add(value)
+    restored = HyperLogLog.from_dict(first.copy().merge(second).to_dict())
+    assert abs(restored.count() - 10000) < 10000 * 4 * standard_error()
+    assert abs(first.count() - 6000) < 6000 * 4 * standard_error()
+
+
+def test_concurrent_checkpoints_to_one_file_stay_whole(sample_csv, tmp_path):
+    # Stand-ins for the csv_api and gemini_server processes sharing a checkpoint
+    writers = [sketches_for(sample_csv, tmp_path) for _ in range(2)]
+    for sketches in writers:
+        sketches.catch_up()
+    errors = []
+
+    def checkpoint_repeatedly(sketches):
+        try:
+            for _ in range(30):
+                sketches.checkpoint()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=checkpoint_repeatedly, args=(sketches,)) for sketches in writers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert 'sketches.json' in os.listdir(tmp_path)
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []
+    assert sketches_for(sample_csv, tmp_path).unique_users() == writers[0].unique_users()
@@ -0,0 +1,111 @@
+import os
+import json
+from benchmark_data import write_sample_csv
+import tracking_stats
+from tracking_stats import ColumnStatsCatalog, check
+
+
+def test_every_column_is_counted_until_it_overflows(sample_csv, tmp_path, monkeypatch):
+    monkeypatch.setattr(tracking_stats, 'MAX_EXACT_VALUES', 50)
+    catalog = ColumnStatsCatalog(sample_csv, str(tmp_path / 'stats.json'))
+    team = catalog.column('playground-mess-team')
+    assert sum(team['value_counts'].values()) == team['rows'] - team['nulls']
+    assert catalog.column('chat-bubble-1')['value_counts']
+
+    user_ids = catalog.column('user-id')
+    assert user_ids['value_counts'] is None and user_ids['overflowed']
+    top = catalog.top('user-id', 5)
+    assert top['total'] == 300
+    assert len(top['values']) == 5
+    # Every ID occurs once; the summary may overcount by at most its error
+    assert all(value['count'] - value['error'] <= 1 for value in top['values'])
+    assert catalog.top('playground-step1') is None
+
+
+def test_overflowed_column_is_answered_from_the_catalog(sample_csv, tmp_path, monkeypatch):
+    import csv_api
+    monkeypatch.setattr(tracking_stats, 'MAX_EXACT_VALUES', 50)
+    monkeypatch.setattr(csv_api, 'CSV_PATH', sample_csv)
+    monkeypatch.setattr(csv_api, 'column_stats', ColumnStatsCatalog(sample_csv, str(tmp_path / 'stats.json')))
+    monkeypatch.setattr(csv_api, 'frame_cache', None)  # any frame read would fail
+    client = csv_api.app.test_client()
+
+    response = client.get('/api/csv/columns/playground-convo-id')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['approximate'] is True
+    assert body['counted_values'] == 300
+
+    body = client.get('/api/csv/columns/playground-mess-team').get_json()
+    assert body['approximate'] is False
+    assert body['value_counts']
+
+
+def test_checkpoint_from_an_older_layout_is_rebuilt(sample_csv, tmp_path):
+    stats_path = tmp_path / 'stats.json'
+    catalog = ColumnStatsCatalog(sample_csv, str(stats_path))
+    catalog.summary()
+    catalog.checkpoint()
+
+    # A checkpoint from when only categorical columns were counted
+    state = json.loads(stats_path.read_text())
+    del state['version']
+    state['stats']['chat-bubble-1'].pop('value_counts')
+    stats_path.write_text(json.dumps(state))
+
+    reloaded = ColumnStatsCatalog(sample_csv, str(stats_path))
+    assert reloaded.column('chat-bubble-1')['value_counts']
+    assert reloaded.summary()['rows'] == 300
+
+
+def test_catch_up_from_a_checkpoint_matches_a_recompute(sample_csv, tmp_path):
+    stats_path = str(tmp_path / 'stats.json')
+    catalog = ColumnStatsCatalog(sample_csv, stats_path)
+    catalog.summary()
+    catalog.checkpoint()
+    offset = catalog.csv_offset
+
+    write_sample_csv(sample_csv, 40, start=300)
+    reloaded = ColumnStatsCatalog(sample_csv, stats_path)
+    assert reloaded.csv_offset == offset
+    assert reloaded.summary()['rows'] == 340
+    reloaded.checkpoint()
+    assert check(sample_csv, stats_path) == []
+
+
+def test_partial_last_record_is_counted_once_complete(sample_csv, tmp_path):
+    catalog = ColumnStatsCatalog(sample_csv, str(tmp_path / 'stats.json'))
+    catalog.summary()
+    with open(sample_csv, 'a', encoding='utf-8') as f:
+        f.write('999999,07:00 - 06Aug25')
+    assert catalog.summary()['rows'] == 300
+
+    with open(sample_csv, 'a', encoding='utf-8') as f:
+        f.write(',07:01 - 06Aug25' + ',null' * 12 + '\n')
+    assert catalog.summary()['rows'] == 301
+    assert catalog.column('end-time')['nulls'] == 0
+
+
+def test_rewritten_csv_is_recounted(sample_csv, tmp_path):
+    catalog = ColumnStatsCatalog(sample_csv, str(tmp_path / 'stats.json'))
+    completed = catalog.column('playground-step1')['value_counts']['Completed']
+
+    # Same size, different values
+    with open(sample_csv, 'r', encoding='utf-8') as f:
+        text = f.read()
+    with open(sample_csv, 'w', encoding='utf-8') as f:
+        f.write(text.replace('Completed', 'Cancelled'))
+    assert catalog.column('playground-step1')['value_counts'] == {'Cancelled': completed}
+
+    write_sample_csv(sample_csv, 5)
+    assert catalog.summary()['rows'] == 5
+
+
+def test_checkpoints_leave_no_temp_files(sample_csv, tmp_path):
+    stats_path = tmp_path / 'data' / 'stats.json'
+    for _ in range(2):
+        catalog = ColumnStatsCatalog(sample_csv, str(stats_path))
+        catalog.summary()
+        catalog.checkpoint()
+    assert os.listdir(stats_path.parent) == ['stats.json']
+    assert ColumnStatsCatalog(sample_csv, str(stats_path)).csv_offset == catalog.csv_offset
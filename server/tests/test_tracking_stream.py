@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+from tracking_schema import TRACKING_HEADERS
+from tracking_stream import (csv_batches, encode_csv, encode_json_array, encode_ndjson, frame_batches,
+                             stream_records)
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'id': ['a', 'b', 'c', 'd', 'e'],
+        'score': [1.5, np.nan, 3.0, np.nan, 5.0],
+        'note': ['x', None, 'z', 'w', None]
+    })
+
+
+def streamed(body, format, columns=None):
+    app = Flask(__name__)
+
+    @app.route('/rows')
+    def rows():
+        return stream_records(iter(body), format, columns, filename=f'rows.{format}')
+
+    response = app.test_client().get('/rows')
+    return response, response.get_data(as_text=True)
+
+
+def test_frame_batches_chunk_rows_and_turn_nan_into_none(frame):
+    batches = list(frame_batches(frame, chunk_rows=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0][1] == {'id': 'b', 'score': None, 'note': None}
+
+    picked = list(frame_batches(frame, np.array([4, 0]), columns=['id', 'score']))
+    assert picked == [[{'id': 'e', 'score': 5.0}, {'id': 'a', 'score': 1.5}]]
+    assert list(frame_batches(frame, np.array([], dtype=int))) == []
+
+
+def test_csv_batches_read_the_file_in_chunks(sample_csv, tmp_path):
+    batches = list(csv_batches(sample_csv, chunk_rows=128))
+    assert [len(batch) for batch in batches] == [128, 128, 44]
+    assert list(batches[0][0]) == list(TRACKING_HEADERS)
+    assert batches[2][-1][TRACKING_HEADERS[0]] == '000299'
+    # Descriptions with commas stay in one field
+    assert batches[0][0][TRACKING_HEADERS[5]].startswith('gen the ')
+
+    short = tmp_path / 'short.csv'
+    short.write_text('a,b,c\n1,2\n\n4,5,6,7\n', encoding='utf-8')
+    assert list(csv_batches(str(short))) == [[{'a': '1', 'b': '2', 'c': None}, {'a': '4', 'b': '5', 'c': '6'}]]
+    empty = tmp_path / 'empty.csv'
+    empty.write_text('', encoding='utf-8')
+    assert list(csv_batches(str(empty))) == []
+
+
+@pytest.mark.parametrize('batches', [[], [[]], [[{'id': 'a'}]], [[{'id': 'a'}], [], [{'id': 'b'}, {'id': 'c'}]]])
+def test_json_array_is_well_formed_for_any_batching(batches):
+    records = [record for batch in batches for record in batch]
+    assert json.loads(''.join(encode_json_array(iter(batches)))) == records
+
+
+def test_encoders_write_nulls_not_nan(frame):
+    batches = list(frame_batches(frame, chunk_rows=2))
+
+    ndjson = ''.join(encode_ndjson(iter(batches)))
+    assert 'NaN' not in ndjson
+    assert [json.loads(text) for text in ndjson.splitlines()] == [record for batch in batches for record in batch]
+
+    array = ''.join(encode_json_array(iter(batches)))
+    assert 'NaN' not in array
+    assert json.loads(array)[3] == {'id': 'd', 'score': None, 'note': 'w'}
+
+    text = ''.join(encode_csv(iter(batches), ['id', 'score', 'note']))
+    assert list(csv.reader(io.StringIO(text))) == [
+        ['id', 'score', 'note'], ['a', '1.5', 'x'], ['b', '', ''], ['c', '3.0', 'z'], ['d', '', 'w'], ['e', '5.0', '']
+    ]
+    assert ''.join(encode_csv(iter([]), ['id'])) == 'id\r\n'
+
+
+def test_csv_quotes_fields_with_separators():
+    text = ''.join(encode_csv(iter([[{'id': 'a', 'note': 'one, "two"\nthree'}]]), ['id', 'note']))
+    assert list(csv.reader(io.StringIO(text))) == [['id', 'note'], ['a', 'one, "two"\nthree']]
+
+
+@pytest.mark.parametrize('format, mimetype', [
+    ('ndjson', 'application/x-ndjson'), ('csv', 'text/csv'), ('json', 'application/json')
+])
+def test_stream_records_sets_type_and_filename(format, mimetype):
+    batches = [[{'id': 'a', 'score': None}], [{'id': 'b', 'score': 2}]]
+    response, body = streamed(batches, format, ['id', 'score'])
+    assert response.status_code == 200
+    assert response.mimetype == mimetype
+    assert response.headers['Content-Disposition'] == f'attachment; filename=rows.{format}'
+    assert 'Content-Length' not in response.headers
+    if format == 'json':
+        assert json.loads(body) == [{'id': 'a', 'score': None}, {'id': 'b', 'score': 2}]
+    elif format == 'ndjson':
+        assert [json.loads(text) for text in body.splitlines()] == [{'id': 'a', 'score': None}, {'id': 'b', 'score': 2}]
+    else:
+        assert body.splitlines() == ['id,score', 'a,', 'b,2']
+
+
+def test_empty_results_stream_valid_documents():
+    assert json.loads(streamed([], 'json')[1]) == []
+    assert streamed([], 'ndjson')[1] == ''
+    assert streamed([], 'csv', ['id'])[1].splitlines() == ['id']
+    with pytest.raises(ValueError):
+        stream_records(iter([]), 'xml', ['id'])
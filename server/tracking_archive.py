@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Columnar archive for user tracking data
+
+Compacts closed segments of user_behavior_tracking.csv into dictionary-encoded,
+zstd-compressed Parquet files. Readers memory-map the segments, load only the
+columns a query needs and parse just the CSV tail that hasn't been archived yet.
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+from datetime import datetime
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+CSV_PATH = '../public/user_behavior_tracking.csv'
+ARCHIVE_DIR = 'data/tracking_archive'
+MANIFEST_NAME = 'manifest.json'
+
+# Bytes hashed on each side of the archived boundary to detect a rewritten CSV
+FINGERPRINT_BYTES = 4096
+
+
+def iter_csv_records(path, start_offset=0):
+    """Yield (row, end_offset) for every CSV record from a byte offset onwards"""
+    with open(path, 'rb') as file:
+        file.seek(start_offset)
+        position = [start_offset]
+
+        def lines():
+            for raw in file:
+                position[0] += len(raw)
+                yield raw.decode('utf-8')
+
+        # csv.reader pulls one physical line at a time, so position always
+        # points at the end of the record that was just returned
+        for row in csv.reader(lines()):
+            yield row, position[0]
+
+
+def read_header(csv_path=CSV_PATH):
+    """Return (columns, header_end_offset) for a tracking CSV"""
+    for row, offset in iter_csv_records(csv_path):
+        return row, offset
+    return [], 0
+
+
+def tail_offset(csv_path, records, start=0, end=None, block_bytes=64 * 1024):
+    """Byte offset where the last `records` complete CSV records begin
+
+    Reads backwards from end (default: just past the last newline) a block
+    at a time. A newline ends a record when an even number of quote
+    characters follow it up to end, since a newline inside a quoted field is
+    always followed by the field's closing quote. Never returns less than
+    start, so pass the header's end offset to skip the header.
+    """
+    with open(csv_path, 'rb') as file:
+        if end is None:
+            end = file.seek(0, os.SEEK_END)
+            while end > start:
+                file.seek(max(start, end - block_bytes))
+                chunk = file.read(end - max(start, end - block_bytes))
+                newline = chunk.rfind(b'\n')
+                if newline >= 0:
+                    end = end - len(chunk) + newline + 1
+                    break
+                end -= len(chunk)
+        quotes = 0
+        found = 0
+        position = end
+        while position > start:
+            read_from = max(start, position - block_bytes)
+            file.seek(read_from)
+            chunk = file.read(position - read_from)
+            right = len(chunk)
+            newline = chunk.rfind(b'\n', 0, right)
+            while newline >= 0:
+                quotes += chunk.count(b'"', newline + 1, right)
+                right = newline
+                boundary = read_from + newline + 1
+                if boundary < end and quotes % 2 == 0:
+                    found += 1
+                    if found == records:
+                        return boundary
+                newline = chunk.rfind(b'\n', 0, right)
+            quotes += chunk.count(b'"', 0, right)
+            position = read_from
+    return start
+
+
+def source_fingerprint(csv_path, offset):
+    """Hash the head of the file and the bytes just before the archived boundary"""
+    digest = hashlib.sha1()
+    with open(csv_path, 'rb') as file:
+        digest.update(file.read(FINGERPRINT_BYTES))
+        file.seek(max(0, offset - FINGERPRINT_BYTES))
+        digest.update(file.read(min(offset, FINGERPRINT_BYTES)))
+    return digest.hexdigest()
+
+
+def empty_manifest():
+    return {
+        'columns': [],
+        'source_offset': 0,
+        'source_fingerprint': None,
+        'total_rows': 0,
+        'segments': []
+    }
+
+
+def load_manifest(archive_dir=ARCHIVE_DIR):
+    """Load the archive manifest, or an empty one if nothing was compacted yet"""
+    path = os.path.join(archive_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return empty_manifest()
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_manifest(manifest, archive_dir=ARCHIVE_DIR):
+    path = os.path.join(archive_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, path)
+
+
+def archive_is_current(manifest, csv_path=CSV_PATH):
+    """Check the archive still describes a prefix of the CSV file"""
+    if not manifest['segments'] or not os.path.exists(csv_path):
+        return False
+    if os.path.getsize(csv_path) < manifest['source_offset']:
+        return False
+    return source_fingerprint(csv_path, manifest['source_offset']) == manifest['source_fingerprint']
+
+
+def normalize_row(row, width):
+    """Map 'null'/empty cells to None and pad or trim to the header width"""
+    values = [None if value in ('', 'null') else value for value in row[:width]]
+    values.extend([None] * (width - len(values)))
+    return values
+
+
+def compact(csv_path=CSV_PATH, archive_dir=ARCHIVE_DIR, min_rows=1):
+    """Archive every closed CSV record that isn't in a segment yet"""
+    if pa is None:
+        raise RuntimeError("pyarrow is required for compaction (pip install pyarrow)")
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(csv_path)
+
+    os.makedirs(archive_dir, exist_ok=True)
+    manifest = load_manifest(archive_dir)
+    columns, header_end = read_header(csv_path)
+
+    if manifest['segments'] and not archive_is_current(manifest, csv_path):
+        print("⚠️  CSV was rewritten since the last compaction, rebuilding archive")
+        for segment in manifest['segments']:
+            segment_path = os.path.join(archive_dir, segment['file'])
+            if os.path.exists(segment_path):
+                os.remove(segment_path)
+        manifest = empty_manifest()
+
+    start = manifest['source_offset'] or header_end
+    file_size = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as file:
+        file.seek(max(0, file_size - 1))
+        ends_with_newline = file.read(1) == b'\n'
+
+    rows = []
+    offsets = []
+    malformed = 0
+    for row, offset in iter_csv_records(csv_path, start):
+        if len(row) != len(columns):
+            malformed += 1
+        rows.append(normalize_row(row, len(columns)))
+        offsets.append(offset)
+
+    # A final record without a trailing newline may still be mid-write
+    if rows and offsets[-1] == file_size and not ends_with_newline:
+        rows.pop()
+        offsets.pop()
+
+    if not rows or len(rows) < min_rows:
+        return {'segment': None, 'rows': 0, 'pending_rows': len(rows), 'malformed_rows': 0}
+
+    end = offsets[-1]
+    table = pa.table({
+        name: pa.array([row[i] for row in rows], type=pa.string())
+        for i, name in enumerate(columns)
+    })
+
+    segment_name = f"segment-{len(manifest['segments']) + 1:05d}.parquet"
+    segment_path = os.path.join(archive_dir, segment_name)
+    pq.write_table(table, segment_path, compression='zstd', use_dictionary=True)
+
+    csv_bytes = end - start
+    parquet_bytes = os.path.getsize(segment_path)
+    manifest['columns'] = columns
+    manifest['segments'].append({
+        'file': segment_name,
+        'rows': len(rows),
+        'source_start': start,
+        'source_end': end,
+        'csv_bytes': csv_bytes,
+        'parquet_bytes': parquet_bytes,
+        'created_at': datetime.now().isoformat()
+    })
+    manifest['source_offset'] = end
+    manifest['source_fingerprint'] = source_fingerprint(csv_path, end)
+    manifest['total_rows'] += len(rows)
+    save_manifest(manifest, archive_dir)
+
+    return {
+        'segment': segment_name,
+        'rows': len(rows),
+        'malformed_rows': malformed,
+        'csv_bytes': csv_bytes,
+        'parquet_bytes': parquet_bytes,
+        'compression_ratio': round(csv_bytes / parquet_bytes, 2) if parquet_bytes else None
+    }
+
+
+def read_csv_tail(csv_path, offset, names, columns=None):
+    """Parse the CSV from a byte offset using known header names"""
+    with open(csv_path, 'rb') as file:
+        file.seek(offset)
+        data = file.read()
+    if not data.strip():
+        return pd.DataFrame(columns=columns or names)
+    return pd.read_csv(io.BytesIO(data), header=None, names=names, usecols=columns, dtype=str)
+
+
+def load_tracking_frame(csv_path=CSV_PATH, columns=None, archive_dir=ARCHIVE_DIR):
+    """Load tracking data from archived segments plus the un-archived CSV tail
+
+    Every column comes back as strings (with nulls as NaN/None) whether it was
+    read from the archive or the CSV, so results don't depend on compaction.
+    """
+    manifest = load_manifest(archive_dir)
+    if pq is None or not archive_is_current(manifest, csv_path):
+        return pd.read_csv(csv_path, usecols=columns, dtype=str)
+
+    frames = []
+    for segment in manifest['segments']:
+        segment_path = os.path.join(archive_dir, segment['file'])
+        table = pq.read_table(segment_path, columns=columns, memory_map=True)
+        frames.append(table.to_pandas())
+
+    tail = read_csv_tail(csv_path, manifest['source_offset'], manifest['columns'], columns)
+    if len(tail):
+        frames.append(tail)
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def tracking_columns(csv_path=CSV_PATH, archive_dir=ARCHIVE_DIR):
+    """Column names of the tracking data without loading any rows"""
+    manifest = load_manifest(archive_dir)
+    if manifest['columns'] and archive_is_current(manifest, csv_path):
+        return list(manifest['columns'])
+    return read_header(csv_path)[0]
+
+
+def _best_time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def benchmark(csv_path=CSV_PATH, archive_dir=ARCHIVE_DIR, columns=None, repeat=5):
+    """Compare full CSV parsing with archived full and column-projected scans"""
+    manifest = load_manifest(archive_dir)
+    if not archive_is_current(manifest, csv_path):
+        raise RuntimeError("Archive is missing or stale, run compaction first")
+
+    columns = columns or manifest['columns'][:2]
+    csv_bytes = sum(segment['csv_bytes'] for segment in manifest['segments'])
+    parquet_bytes = sum(segment['parquet_bytes'] for segment in manifest['segments'])
+
+    csv_full = _best_time(lambda: pd.read_csv(csv_path, dtype=str), repeat)
+    csv_projected = _best_time(lambda: pd.read_csv(csv_path, usecols=columns, dtype=str), repeat)
+    archive_full = _best_time(lambda: load_tracking_frame(csv_path, archive_dir=archive_dir), repeat)
+    archive_projected = _best_time(
+        lambda: load_tracking_frame(csv_path, columns=columns, archive_dir=archive_dir), repeat
+    )
+
+    return {
+        'rows': manifest['total_rows'],
+        'segments': len(manifest['segments']),
+        'csv_bytes': csv_bytes,
+        'parquet_bytes': parquet_bytes,
+        'compression_ratio': round(csv_bytes / parquet_bytes, 2) if parquet_bytes else None,
+        'projected_columns': columns,
+        'seconds': {
+            'csv_full': csv_full,
+            'csv_projected': csv_projected,
+            'archive_full': archive_full,
+            'archive_projected': archive_projected
+        },
+        'speedup': {
+            'full': round(csv_full / archive_full, 2) if archive_full else None,
+            'projected': round(csv_projected / archive_projected, 2) if archive_projected else None
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact tracking CSV into a columnar archive')
+    parser.add_argument('command', choices=['compact', 'benchmark', 'status'])
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR)
+    parser.add_argument('--columns', help='Comma-separated columns for the projected benchmark')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-rows', type=int, default=1000,
+                        help='Leave the tail in the CSV until at least this many rows are closed')
+    args = parser.parse_args()
+
+    if args.command == 'compact':
+        print("🗜️  Compacting tracking data...")
+        report = compact(args.csv, args.archive_dir, args.min_rows)
+        if report['segment'] is None:
+            print(f"ℹ️  {report['pending_rows']} closed records pending, below --min-rows {args.min_rows}")
+            return
+        print(f"✅ Wrote {report['segment']}: {report['rows']:,} rows")
+        print(f"📦 {report['csv_bytes']:,} CSV bytes -> {report['parquet_bytes']:,} Parquet bytes "
+              f"({report['compression_ratio']}x)")
+        if report['malformed_rows']:
+            print(f"⚠️  {report['malformed_rows']} rows had the wrong number of fields and were padded/trimmed")
+
+    elif args.command == 'benchmark':
+        columns = args.columns.split(',') if args.columns else None
+        report = benchmark(args.csv, args.archive_dir, columns, args.repeat)
+        print(f"📊 {report['rows']:,} rows in {report['segments']} segments")
+        print(f"📦 Compression ratio: {report['compression_ratio']}x")
+        for name, seconds in report['seconds'].items():
+            print(f"   {name:18s} {seconds * 1000:8.2f} ms")
+        print(f"🚀 Full scan speedup: {report['speedup']['full']}x")
+        print(f"🚀 Projected scan speedup ({', '.join(report['projected_columns'])}): "
+              f"{report['speedup']['projected']}x")
+
+    else:
+        manifest = load_manifest(args.archive_dir)
+        print(f"📁 Segments: {len(manifest['segments'])}")
+        print(f"📊 Archived rows: {manifest['total_rows']:,}")
+        print(f"📍 Archived up to byte {manifest['source_offset']:,}")
+        print(f"✅ Current: {archive_is_current(manifest, args.csv)}")
+
+
+if __name__ == '__main__':
+    main()
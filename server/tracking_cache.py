@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Shared in-memory cache of the tracking DataFrame
+
+csv_api endpoints used to parse user_behavior_tracking.csv on every request.
+TrackingFrameCache keeps one parsed frame keyed on the file's identity
+(device, inode), mtime and size, and reloads it only when one of those
+changes. Concurrent requests that find the cache stale wait on a single
+reload instead of each parsing the file. Columns are typed per
+TRACKING_DTYPES, so low-cardinality columns are held as categoricals.
+
+The tracking CSV is append-only in practice, so a refresh normally parses
+only the bytes written since the last one and appends them to the cached
+frame; see refresh() for how rewrites are detected.
+
+Frames returned by get() are shared between requests and must not be
+modified in place; filtering, slicing and copying are fine.
+"""
+
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import pandas as pd
+from benchmark_data import write_sample_csv
+from tracking_archive import ARCHIVE_DIR, load_tracking_frame, source_fingerprint
+from tracking_schema import TRACKING_DTYPES, TRACKING_HEADERS
+
+CSV_PATH = '../public/user_behavior_tracking.csv'
+
+
+def file_key(csv_path):
+    """Identity, mtime and size of the file; changes whenever its content may have"""
+    stat = os.stat(csv_path)
+    return (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def ends_with_newline(csv_path, size):
+    if size == 0:
+        return True
+    with open(csv_path, 'rb') as f:
+        f.seek(size - 1)
+        return f.read(1) == b'\n'
+
+
+def apply_dtypes(df, dtypes=None):
+    """Cast known tracking columns to their in-memory dtypes"""
+    dtypes = TRACKING_DTYPES if dtypes is None else dtypes
+    return df.astype({column: dtype for column, dtype in dtypes.items() if column in df.columns})
+
+
+def append_frame(frame, tail):
+    """Concatenate newly parsed rows, keeping categorical columns categorical
+
+    New categories are added to the existing ones instead of re-encoding the
+    whole column, so the work done is proportional to the tail.
+    """
+    tail = tail.reindex(columns=frame.columns)
+    widened = {}
+    for column in frame.columns:
+        values = frame[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            new = pd.Index(tail[column].dropna().unique()).difference(values.cat.categories)
+            if len(new):
+                values = widened[column] = values.cat.add_categories(new)
+            tail[column] = pd.Categorical(tail[column], dtype=values.dtype)
+    if widened:
+        frame = frame.copy(deep=False)
+        for column, values in widened.items():
+            frame[column] = values
+    return pd.concat([frame, tail], ignore_index=True)
+
+
+class TrackingFrameCache:
+    def __init__(self, csv_path=CSV_PATH, archive_dir=ARCHIVE_DIR, dtypes=None):
+        self.csv_path = csv_path
+        self.archive_dir = archive_dir
+        self.dtypes = dtypes
+        self.frame = None
+        self.key = None
+        self.offset = None  # end of the last complete record parsed
+        self.fingerprint = None
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.loading = None  # Event set when the in-flight load finishes
+        self.load_error = None
+        self.metrics = {
+            'hits': 0,
+            'misses': 0,
+            'waits': 0,
+            'loads': 0,
+            'full_loads': 0,
+            'incremental_loads': 0,
+            'rewrites': 0,
+            'rows_appended': 0,
+            'bytes_parsed': 0,
+            'load_errors': 0,
+            'last_load_seconds': None,
+            'total_load_seconds': 0.0,
+            'loaded_at': None
+        }
+
+    def get(self, columns=None):
+        """Current tracking frame (optionally projected), loading it if the file changed"""
+        return self.get_versioned(columns)[0]
+
+    def get_versioned(self, columns=None):
+        """(frame, generation) where generation changes only on a full reload
+
+        Within one generation each frame extends the previous one, so row
+        positions stay valid and derived indexes can be updated from the tail.
+        """
+        while True:
+            key = file_key(self.csv_path)
+            with self.lock:
+                if self.frame is not None and self.key == key:
+                    self.metrics['hits'] += 1
+                    return self.project(self.frame, columns), self.generation
+                if self.loading is None:
+                    # This caller loads; everyone else waits for it
+                    self.metrics['misses'] += 1
+                    self.loading = threading.Event()
+                    loading = self.loading
+                    leader = True
+                else:
+                    self.metrics['waits'] += 1
+                    loading = self.loading
+                    leader = False
+
+            if not leader:
+                loading.wait()
+                with self.lock:
+                    error = self.load_error
+                    if error is None and self.frame is not None:
+                        return self.project(self.frame, columns), self.generation
+                if error is not None:
+                    raise error
+                continue
+
+            started = time.perf_counter()
+            try:
+                frame, mode = self.refresh(key)
+            except Exception as e:
+                with self.lock:
+                    self.metrics['load_errors'] += 1
+                    self.load_error = e
+                    self.loading = None
+                loading.set()
+                raise
+            elapsed = time.perf_counter() - started
+
+            with self.lock:
+                # Keyed on the stat taken before reading, so a write during the load
+                # makes the next call refresh again rather than serve a stale frame
+                self.frame = frame
+                self.key = key
+                if mode == 'full':
+                    self.generation += 1
+                generation = self.generation
+                self.load_error = None
+                self.loading = None
+                self.metrics['loads'] += 1
+                self.metrics[f"{mode}_loads"] += 1
+                self.metrics['last_load_seconds'] = elapsed
+                self.metrics['total_load_seconds'] += elapsed
+                self.metrics['loaded_at'] = time.time()
+            loading.set()
+            return self.project(frame, columns), generation
+
+    def refresh(self, key):
+        """Bring the cached frame up to date with the file; returns (frame, mode)
+
+        Appends are parsed from the last offset onwards. A new inode, a file
+        shorter than that offset or a changed fingerprint of the bytes before
+        it means the file was rewritten, and everything is loaded again.
+        """
+        if self.frame is not None and self.offset is not None:
+            same_file = key[:2] == self.key[:2]
+            if not same_file or key[3] < self.offset:
+                self.metrics['rewrites'] += 1
+            elif source_fingerprint(self.csv_path, self.offset) != self.fingerprint:
+                self.metrics['rewrites'] += 1
+            else:
+                return self.load_tail(key), 'incremental'
+        return self.load_full(key), 'full'
+
+    def load_full(self, key):
+        frame = apply_dtypes(load_tracking_frame(self.csv_path, archive_dir=self.archive_dir), self.dtypes)
+        after = file_key(self.csv_path)
+        if after == key and ends_with_newline(self.csv_path, key[3]):
+            self.offset = key[3]
+            self.fingerprint = source_fingerprint(self.csv_path, self.offset)
+        else:
+            # Written to while loading (or mid-record): the frame may hold bytes
+            # past key's size, so the next change can't safely append from there
+            self.offset = None
+            self.fingerprint = None
+        self.metrics['bytes_parsed'] += key[3]
+        return frame
+
+    def load_tail(self, key):
+        """Parse the complete records written since the last load and append them"""
+        with open(self.csv_path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(key[3] - self.offset)
+        # Leave a partially written last record for the next refresh
+        data = data[:data.rfind(b'\n') + 1]
+        if not data.strip():
+            if data:
+                self.offset += len(data)
+                self.fingerprint = source_fingerprint(self.csv_path, self.offset)
+            return self.frame
+
+        tail = pd.read_csv(io.BytesIO(data), header=None, names=list(self.frame.columns),
+                           dtype=str, index_col=False)
+        frame = append_frame(self.frame, tail)
+        self.offset += len(data)
+        self.fingerprint = source_fingerprint(self.csv_path, self.offset)
+        self.metrics['bytes_parsed'] += len(data)
+        self.metrics['rows_appended'] += len(tail)
+        return frame
+
+    @staticmethod
+    def project(frame, columns):
+        if columns is None:
+            return frame
+        return frame[[column for column in columns if column in frame.columns]]
+
+    def invalidate(self):
+        with self.lock:
+            self.frame = None
+            self.key = None
+            self.offset = None
+            self.fingerprint = None
+
+    def stats(self):
+        """Hit rate, load timings and size of the cached frame"""
+        with self.lock:
+            metrics = dict(self.metrics)
+            frame = self.frame
+        lookups = metrics['hits'] + metrics['misses'] + metrics['waits']
+        loads = metrics['loads']
+        return {
+            'cached': frame is not None,
+            'rows': len(frame) if frame is not None else 0,
+            'memory_bytes': int(frame.memory_usage(deep=True).sum()) if frame is not None else 0,
+            'lookups': lookups,
+            'hits': metrics['hits'],
+            'misses': metrics['misses'],
+            'waits': metrics['waits'],
+            'hit_rate': round(metrics['hits'] / lookups, 4) if lookups else None,
+            'loads': loads,
+            'full_loads': metrics['full_loads'],
+            'incremental_loads': metrics['incremental_loads'],
+            'rewrites': metrics['rewrites'],
+            'rows_appended': metrics['rows_appended'],
+            'bytes_parsed': metrics['bytes_parsed'],
+            'offset': self.offset,
+            'load_errors': metrics['load_errors'],
+            'last_load_ms': round(metrics['last_load_seconds'] * 1000, 2) if metrics['last_load_seconds'] is not None else None,
+            'avg_load_ms': round(metrics['total_load_seconds'] * 1000 / loads, 2) if loads else None,
+            'loaded_at': metrics['loaded_at']
+        }
+
+
+def _per_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2]
+
+
+def benchmark(rows=100_000, repeat=5, append_rows=100):
+    """Median per-request frame access, parsing every time vs the shared cache"""
+    work_dir = tempfile.mkdtemp(prefix='tracking_cache_')
+    try:
+        csv_path = os.path.join(work_dir, 'tracking.csv')
+        archive_dir = os.path.join(work_dir, 'archive')
+        write_sample_csv(csv_path, rows)
+        cache = TrackingFrameCache(csv_path, archive_dir=archive_dir)
+
+        started = time.perf_counter()
+        cache.get()
+        cold = time.perf_counter() - started
+
+        uncached = _per_call(lambda: load_tracking_frame(csv_path, archive_dir=archive_dir), repeat)
+        cached = _per_call(cache.get, repeat * 20)
+        projected = _per_call(lambda: cache.get(['start-time']), repeat * 20)
+
+        # A dashboard page hitting three endpoints at once
+        threads = [threading.Thread(target=cache.get) for _ in range(3)]
+        cache.invalidate()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        concurrent = time.perf_counter() - started
+
+        # Refresh after new rows are appended, parsing only the tail
+        appends = []
+        total = rows
+        for _ in range(repeat):
+            write_sample_csv(csv_path, append_rows, start=total)
+            total += append_rows
+            started = time.perf_counter()
+            cache.get()
+            appends.append(time.perf_counter() - started)
+        appended = sorted(appends)[len(appends) // 2]
+        if len(cache.get()) != total:
+            raise RuntimeError(f"Incremental refresh has {len(cache.get())} rows, expected {total}")
+
+        stats = cache.stats()
+        return {
+            'rows': rows,
+            'csv_bytes': os.path.getsize(csv_path),
+            'memory_bytes': stats['memory_bytes'],
+            'seconds': {
+                'uncached_request': uncached,
+                'cold_load': cold,
+                'cached_request': cached,
+                'cached_projected': projected,
+                'three_concurrent_after_change': concurrent,
+                f'refresh_after_{append_rows}_appended': appended
+            },
+            'speedup': round(uncached / cached, 1) if cached else None,
+            'refresh_speedup': round(uncached / appended, 1) if appended else None,
+            'incremental_loads': stats['incremental_loads'],
+            'loads': stats['loads'],
+            'hit_rate': stats['hit_rate']
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the cached tracking DataFrame loader')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--append-rows', type=int, default=100,
+                        help='Rows appended per step when timing incremental refreshes')
+    args = parser.parse_args()
+
+    print(f"⏱️  Benchmarking {args.rows:,} synthetic tracking rows...")
+    report = benchmark(args.rows, args.repeat, args.append_rows)
+    print(f"📊 {report['csv_bytes']:,} CSV bytes -> {report['memory_bytes']:,} bytes in memory")
+    for name, seconds in report['seconds'].items():
+        print(f"   {name:30s} {seconds * 1000:10.3f} ms")
+    print(f"🚀 Per-request speedup: {report['speedup']}x "
+          f"({report['loads']} loads, hit rate {report['hit_rate']})")
+    print(f"🚀 Refresh after an append vs full parse: {report['refresh_speedup']}x "
+          f"({report['incremental_loads']} incremental loads)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Compiled queries over the cached tracking frame
+
+/api/csv/search criteria are compiled once into a QueryPlan instead of being
+applied as a chain of filtered copies. Criteria forms:
+
+    "column": "text"                     case-insensitive substring of that column
+    "column": ["a", "b"]                 value is one of the list
+    "column": 42 / true                  value equals it
+    "column": {"min": ..., "max": ...}   range; either bound may be left out
+
+Range bounds are normalized per column: start/end times compare as UTC
+instants, numeric bounds compare numerically, anything else as strings.
+With a search index, text predicates use it to narrow the rows to candidates
+and then check only those with the same substring test used without one, so
+both give identical results. The rest are ordered by selectivity (estimated on a row sample) and evaluated as
+vectorized masks over the row positions still matching, so no frame is
+copied until the final projection.
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from tracking_schema import parse_tracking_time, parse_tracking_times
+
+TIME_COLUMNS = ('start-time', 'end-time')
+SAMPLE_ROWS = 1000
+
+
+def is_number(value):
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+class Predicate:
+    def __init__(self, column, kind, value):
+        self.column = column
+        self.kind = kind  # text, in or range
+        self.value = value
+        self.compare_as = 'string'
+        self.low = self.high = None
+        if kind == 'range':
+            self.normalize_range()
+
+    def normalize_range(self):
+        low, high = self.value.get('min'), self.value.get('max')
+        if self.column in TIME_COLUMNS:
+            self.compare_as = 'time'
+            self.low, self.high = (self.parse_time(bound) for bound in (low, high))
+        elif all(bound is None or is_number(bound) for bound in (low, high)):
+            self.compare_as = 'number'
+            self.low, self.high = (None if bound is None else float(bound) for bound in (low, high))
+        else:
+            self.low, self.high = (None if bound is None else str(bound) for bound in (low, high))
+
+    def parse_time(self, bound):
+        if bound is None:
+            return None
+        parsed = parse_tracking_time(bound)
+        if parsed is None:
+            raise ValueError(f"Cannot parse {bound!r} as a time for {self.column}")
+        return pd.Timestamp(parsed)
+
+    def mask(self, series):
+        """Boolean numpy mask of the rows in series that satisfy the predicate"""
+        if self.kind == 'in':
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Compare category codes instead of strings
+                wanted = series.cat.categories.get_indexer(self.value)
+                return np.isin(series.cat.codes.to_numpy(), wanted[wanted >= 0])
+            return series.isin(self.value).to_numpy()
+
+        if self.compare_as == 'time':
+            values = parse_tracking_times(series.astype(object))
+        elif self.compare_as == 'number':
+            values = pd.to_numeric(series.astype(object), errors='coerce')
+        else:
+            values = series.astype(object)
+        mask = values.notna().to_numpy().copy()
+        if self.low is not None:
+            mask &= (values >= self.low).to_numpy()
+        if self.high is not None:
+            mask &= (values <= self.high).to_numpy()
+        return mask
+
+    def describe(self):
+        step = {'column': self.column, 'kind': self.kind}
+        if self.kind == 'range':
+            step['compare_as'] = self.compare_as
+            step['min'] = None if self.low is None else str(self.low)
+            step['max'] = None if self.high is None else str(self.high)
+        else:
+            step['value'] = self.value
+        return step
+
+
+class QueryPlan:
+    def __init__(self, predicates, projection, ignored):
+        self.predicates = predicates
+        self.projection = projection
+        self.ignored = ignored
+
+    def execute(self, frame, generation=None, search_index=None):
+        """Run the plan; returns (projected frame of matching rows, explain dict)"""
+        rows, explain = self.select(frame, generation, search_index)
+        result = frame.iloc[rows]
+        if self.projection is not None:
+            result = result[self.projection]
+        return result, explain
+
+    def select(self, frame, generation=None, search_index=None):
+        """Run the predicates only; returns (matching row positions, explain dict)"""
+        started = time.perf_counter()
+        steps = []
+        rows = None
+
+        text = [predicate for predicate in self.predicates if predicate.kind == 'text']
+        masks = [predicate for predicate in self.predicates if predicate.kind != 'text']
+
+        if search_index is not None:
+            unindexed = []
+            for predicate in text:
+                step_started = time.perf_counter()
+                candidates = search_index.substring_candidates(predicate.value, predicate.column, frame, generation)
+                if candidates is None:
+                    unindexed.append(predicate)  # no word characters to look up
+                    continue
+                if rows is not None:
+                    candidates = np.intersect1d(rows, candidates, assume_unique=True)
+                if len(candidates):
+                    candidates = candidates[self.evaluate(predicate, frame[predicate.column].take(candidates))]
+                rows = candidates
+                selectivity = len(rows) / len(frame) if len(frame) else 0.0
+                steps.append(dict(predicate.describe(), method='index+verify', selectivity=round(selectivity, 4),
+                                  rows_out=len(rows), ms=round((time.perf_counter() - step_started) * 1000, 3)))
+            masks = unindexed + masks
+        else:
+            masks = text + masks  # no index: case-insensitive substring masks
+
+        if rows is None:
+            rows = np.arange(len(frame), dtype=np.int64)
+
+        # Most selective first, so later predicates only see the rows still matching
+        estimates = self.estimate(frame, rows, masks)
+        for predicate, selectivity in sorted(zip(masks, estimates), key=lambda item: item[1]):
+            step_started = time.perf_counter()
+            rows_in = len(rows)
+            if rows_in:
+                series = frame[predicate.column]
+                if rows_in < len(frame):
+                    series = series.take(rows)
+                rows = rows[self.evaluate(predicate, series)]
+            steps.append(dict(predicate.describe(), method='mask', estimated_selectivity=round(selectivity, 4),
+                              rows_in=rows_in, rows_out=len(rows),
+                              ms=round((time.perf_counter() - step_started) * 1000, 3)))
+
+        explain = {
+            'steps': steps,
+            'projection': self.projection or list(frame.columns),
+            'ignored_criteria': self.ignored,
+            'rows_scanned': len(frame),
+            'rows_returned': len(rows),
+            'ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+        return rows, explain
+
+    @staticmethod
+    def evaluate(predicate, series):
+        if predicate.kind == 'text':
+            return series.astype(object).str.contains(predicate.value, case=False, na=False, regex=False).to_numpy()
+        return predicate.mask(series)
+
+    def estimate(self, frame, rows, predicates):
+        """Fraction of rows each predicate keeps, measured on an even sample"""
+        if not predicates or not len(rows):
+            return [0.0] * len(predicates)
+        sample = rows[::max(1, len(rows) // SAMPLE_ROWS)]
+        return [
+            float(self.evaluate(predicate, frame[predicate.column].take(sample)).mean())
+            for predicate in predicates
+        ]
+
+
+def compile_query(criteria, columns, projection=None):
+    """Compile search criteria into a QueryPlan for a frame with these columns
+
+    Criteria on unknown columns or with empty values are skipped (as before)
+    and listed in the plan; malformed values raise ValueError.
+    """
+    if not isinstance(criteria, dict):
+        raise ValueError('criteria must be an object of column: value pairs')
+    predicates = []
+    ignored = []
+    for column, value in criteria.items():
+        if column not in columns or value in (None, '', [], {}):
+            ignored.append(column)
+        elif isinstance(value, str):
+            predicates.append(Predicate(column, 'text', value))
+        elif isinstance(value, list):
+            predicates.append(Predicate(column, 'in', [str(item) for item in value]))
+        elif isinstance(value, dict):
+            if 'min' not in value and 'max' not in value:
+                raise ValueError(f"Range for {column} needs min and/or max")
+            predicates.append(Predicate(column, 'range', value))
+        elif isinstance(value, bool):
+            predicates.append(Predicate(column, 'in', [str(value).lower()]))
+        else:
+            value = int(value) if isinstance(value, float) and value.is_integer() else value
+            predicates.append(Predicate(column, 'in', [str(value)]))
+
+    if projection is not None:
+        if not isinstance(projection, list):
+            raise ValueError('columns must be a list of column names')
+        unknown = [column for column in projection if column not in columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    return QueryPlan(predicates, projection, ignored)
@@ -0,0 +1,161 @@
+"""
+Shared schema helpers for user tracking records
+
+Record IDs are ULIDs (48-bit millisecond timestamp + 80 random bits, Crockford
+base32) that stay strictly increasing within a process, and timestamps are
+ISO-8601 UTC strings with millisecond precision. Both sort lexicographically in
+time order, so string comparisons, range scans and cursors behave correctly.
+"""
+
+import os
+import threading
+from datetime import datetime, timezone
+
+TRACKING_HEADERS = [
+    'user-id',
+    'start-time',
+    'end-time',
+    'playground-convo-id',
+    'playground-mess-target',
+    'playground-mess-description',
+    'playground-step1',
+    'playground-mess-team',
+    'playground-mess-timeline',
+    'playground-step2',
+    'chat-bubble-1',
+    'chat-bubble-2',
+    'chat-bubble-3',
+    'chat-bubble-4',
+    'chat-bubble-free'
+]
+
+# In-memory dtypes for tracking frames. Only the step states, which come from
+# a fixed set of choices, are categorical. IDs, times and anything a visitor
+# can type (targets, team sizes, timelines, chat bubbles) stay plain strings,
+# so unbounded values never grow a column's categories.
+TRACKING_DTYPES = {
+    'user-id': 'object',
+    'start-time': 'object',
+    'end-time': 'object',
+    'playground-convo-id': 'object',
+    'playground-mess-target': 'object',
+    'playground-mess-description': 'object',
+    'playground-step1': 'category',
+    'playground-mess-team': 'object',
+    'playground-mess-timeline': 'object',
+    'playground-step2': 'category',
+    'chat-bubble-1': 'object',
+    'chat-bubble-2': 'object',
+    'chat-bubble-3': 'object',
+    'chat-bubble-4': 'object',
+    'chat-bubble-free': 'object'
+}
+
+# Format written by the original trackers, e.g. "07:00 - 06Aug25"
+LEGACY_TIME_FORMAT = '%H:%M - %d%b%y'
+
+CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+ULID_LENGTH = 26
+RANDOM_BITS = 80
+
+_ulid_lock = threading.Lock()
+_last_ulid = [0, 0]  # [timestamp_ms, random]
+
+
+def _encode_ulid(value):
+    chars = []
+    for _ in range(ULID_LENGTH):
+        chars.append(CROCKFORD_ALPHABET[value & 0x1F])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+def generate_record_id(timestamp_ms=None):
+    """Generate a monotonic, time-ordered ULID
+
+    IDs generated in the same millisecond increment the random part instead of
+    drawing a new one, so they never collide and always sort after each other.
+    Passing timestamp_ms (e.g. when back-filling historical rows) skips the
+    monotonic sequence and just embeds that time.
+    """
+    if timestamp_ms is not None:
+        return _encode_ulid((int(timestamp_ms) << RANDOM_BITS) | int.from_bytes(os.urandom(10), 'big'))
+
+    with _ulid_lock:
+        timestamp_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        last_ms, last_random = _last_ulid
+        if timestamp_ms <= last_ms and last_random + 1 < (1 << RANDOM_BITS):
+            timestamp_ms = last_ms
+            random_part = last_random + 1
+        else:
+            random_part = int.from_bytes(os.urandom(10), 'big')
+
+        _last_ulid[0] = timestamp_ms
+        _last_ulid[1] = random_part
+        return _encode_ulid((timestamp_ms << RANDOM_BITS) | random_part)
+
+
+def record_id_timestamp(record_id):
+    """Return the UTC datetime embedded in a ULID, or None for legacy IDs"""
+    if not is_record_id(record_id):
+        return None
+    value = 0
+    for char in record_id.upper():
+        value = (value << 5) | CROCKFORD_ALPHABET.index(char)
+    return datetime.fromtimestamp((value >> RANDOM_BITS) / 1000, tz=timezone.utc)
+
+
+def is_record_id(value):
+    """Check whether a value looks like a ULID rather than a legacy 6-digit ID"""
+    return (
+        isinstance(value, str)
+        and len(value) == ULID_LENGTH
+        and all(char in CROCKFORD_ALPHABET for char in value.upper())
+    )
+
+
+def format_timestamp(date=None):
+    """Format a datetime as ISO-8601 UTC with milliseconds, e.g. 2025-08-06T07:00:00.000Z"""
+    if date is None:
+        date = datetime.now(timezone.utc)
+    elif date.tzinfo is None:
+        date = date.astimezone()
+    date = date.astimezone(timezone.utc)
+    return date.strftime('%Y-%m-%dT%H:%M:%S.') + f"{date.microsecond // 1000:03d}Z"
+
+
+def parse_tracking_time(value):
+    """Parse an ISO-8601 or legacy "HH:MM - DDMonYY" value into an aware UTC datetime
+
+    Legacy values were written with the server's local datetime.now(), so they
+    are interpreted in the local timezone (set TZ when migrating elsewhere).
+    Returns None for empty or unparseable values.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value or value == 'null':
+        return None
+
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = datetime.strptime(value, LEGACY_TIME_FORMAT)
+        except ValueError:
+            return None
+
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()
+    return parsed.astimezone(timezone.utc)
+
+
+def parse_tracking_times(series):
+    """Vectorized parse_tracking_time for a pandas Series, returning datetime64[UTC]"""
+    import pandas as pd
+
+    parsed = pd.to_datetime(series, utc=True, errors='coerce', format='ISO8601')
+    legacy = parsed.isna() & series.notna()
+    if legacy.any():
+        parsed.loc[legacy] = series[legacy].map(parse_tracking_time)
+    return pd.to_datetime(parsed, utc=True)
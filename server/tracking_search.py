@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Inverted full-text index over tracking data
+
+Every cell is split into lowercase word tokens, and each token, as well as
+each pair of adjacent tokens, keeps one posting list of row positions per
+column. Pairs answer phrase queries without re-reading cell text. The index follows a
+TrackingFrameCache frame: rows appended to the frame are tokenized and added
+to the postings, and a new cache generation (the CSV was rewritten) rebuilds
+it from scratch. Tokens are also indexed by their character trigrams, so
+substring lookups only check the tokens that share the substring's trigrams.
+
+Query syntax (all parts must match):
+
+    admin                       rows with the token "admin" in any column
+    check*                      tokens starting with "check"
+    "checkout fl*"              a phrase whose last token is a prefix
+    "checkout flow"             the tokens next to each other, in this order
+    playground-mess-target:admin    restrict a part to one column
+    chat-bubble-1:"career goals"
+
+A part with several tokens (e.g. 07:00 or dev-qc) is matched as a phrase.
+"""
+
+import argparse
+import bisect
+import re
+import threading
+import time
+from array import array
+import numpy as np
+import pandas as pd
+from tracking_schema import TRACKING_HEADERS
+
+TOKEN_PATTERN = re.compile(r'\w+')
+QUERY_PATTERN = re.compile(r'(?:([\w-]+):)?("[^"]*"?|\S+)')
+
+EMPTY = np.array([], dtype=np.int64)
+
+GRAM_SIZE = 3
+SUBSTRING_CACHE_SIZE = 256
+
+
+def tokenize(value):
+    return TOKEN_PATTERN.findall(value.lower())
+
+
+def trigrams(token):
+    return {token[index:index + GRAM_SIZE] for index in range(len(token) - GRAM_SIZE + 1)}
+
+
+def cell_keys(value):
+    """Distinct tokens and adjacent token pairs of a cell"""
+    tokens = tokenize(value)
+    return set(tokens) | {f"{first} {second}" for first, second in zip(tokens, tokens[1:])}
+
+
+def phrase_pattern(tokens, prefix=False):
+    """Regex matching the tokens as one run, separated by non-word characters"""
+    pattern = r'(?<!\w)' + r'\W+'.join(re.escape(token) for token in tokens)
+    return pattern if prefix else pattern + r'(?!\w)'
+
+
+def parse_query(query, columns):
+    """Split a query into clauses: {'tokens', 'prefix', 'columns'}"""
+    clauses = []
+    for column, text in QUERY_PATTERN.findall(query):
+        if column and column not in columns:
+            # Not a column name, so the colon was part of the text (e.g. 07:00)
+            text = f"{column}:{text}"
+            column = ''
+        prefix = text.strip('"').endswith('*')
+        tokens = tokenize(text)
+        if not tokens:
+            continue
+        clauses.append({
+            'tokens': tokens,
+            'prefix': prefix,
+            'columns': [column] if column else list(columns)
+        })
+    return clauses
+
+
+class TrackingSearchIndex:
+    def __init__(self, columns=None):
+        self.columns = list(columns or TRACKING_HEADERS)
+        self.lock = threading.Lock()
+        self.metrics = {'builds': 0, 'rows_indexed': 0, 'searches': 0,
+                        'last_update_seconds': None, 'last_search_seconds': None}
+        self.reset(None)
+
+    def reset(self, generation):
+        self.generation = generation
+        self.rows = 0
+        self.postings = {}  # token or "token token" pair -> {column: array of row positions}
+        self.vocabulary = {'token': [], 'pair': []}  # sorted keys, for prefix lookups
+        self.grams = {}  # trigram -> set of tokens containing it, for substring lookups
+        self.substring_keys = {}  # (word, suffix) -> matching tokens, until the vocabulary grows
+
+    def update(self, frame, generation):
+        """Index rows appended to frame since the last update"""
+        with self.lock:
+            self._update(frame, generation)
+
+    def _update(self, frame, generation):
+        if generation != self.generation:
+            self.reset(generation)
+            self.metrics['builds'] += 1
+        if len(frame) <= self.rows:
+            return  # an older frame of this generation; results are clipped to it
+
+        started = time.perf_counter()
+        start = self.rows
+        new_keys = set()
+        for column in self.columns:
+            if column not in frame.columns:
+                continue
+            values = frame[column].iloc[start:]
+            codes, uniques = pd.factorize(values)
+            if len(uniques) * 2 < len(codes):
+                # Few distinct values (categoricals): tokenize each once, add rows in bulk
+                order = np.argsort(codes, kind='stable')
+                bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+                batches = {}
+                for code, value in enumerate(uniques):
+                    rows = order[bounds[code]:bounds[code + 1]] + start
+                    for key in cell_keys(value):
+                        batches.setdefault(key, []).append(rows)
+                for key, parts in batches.items():
+                    rows = np.sort(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+                    self.positions_for(key, column, new_keys).frombytes(rows.astype(np.uint32).tobytes())
+                continue
+
+            for row, value in enumerate(values.tolist(), start):
+                if not isinstance(value, str):
+                    continue
+                for key in cell_keys(value):
+                    self.positions_for(key, column, new_keys).append(row)
+
+        for kind in ('token', 'pair'):
+            added = [key for key in new_keys if (' ' in key) == (kind == 'pair')]
+            vocabulary = self.vocabulary[kind]
+            if len(added) > len(vocabulary) // 8:
+                self.vocabulary[kind] = sorted(vocabulary + added)
+            else:
+                for key in added:
+                    bisect.insort(vocabulary, key)
+        for key in new_keys:
+            if ' ' not in key:
+                for gram in trigrams(key):
+                    self.grams.setdefault(gram, set()).add(key)
+        if new_keys:
+            self.substring_keys.clear()
+        self.rows = len(frame)
+        self.metrics['rows_indexed'] += self.rows - start
+        self.metrics['last_update_seconds'] = time.perf_counter() - started
+
+    def positions_for(self, key, column, new_keys):
+        by_column = self.postings.get(key)
+        if by_column is None:
+            by_column = self.postings[key] = {}
+            new_keys.add(key)
+        positions = by_column.get(column)
+        if positions is None:
+            positions = by_column[column] = array('I')
+        return positions
+
+    def search(self, query, frame, generation):
+        """Sorted row positions in frame matching every clause of the query"""
+        with self.lock:
+            self._update(frame, generation)
+            started = time.perf_counter()
+            result = None
+            for clause in parse_query(query, self.columns):
+                rows = self.match(clause, frame)
+                result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+                if not len(result):
+                    break
+            if result is None:
+                result = np.arange(len(frame), dtype=np.int64)
+            else:
+                result = result[:np.searchsorted(result, len(frame))]
+            self.metrics['searches'] += 1
+            self.metrics['last_search_seconds'] = time.perf_counter() - started
+            return result
+
+    def substring_candidates(self, text, column, frame, generation):
+        """Rows of frame whose column may contain text as a case-insensitive substring
+
+        A superset: the caller confirms each candidate against the cell text.
+        Inside the substring, the first word can be the end of a cell token,
+        the words between are whole tokens and the last word can be the start
+        of one. Returns None when text has no word characters to look up.
+        """
+        tokens = tokenize(text)
+        if not tokens:
+            return None
+        with self.lock:
+            self._update(frame, generation)
+            candidates = self.union(self.tokens_containing(tokens[0], suffix=len(tokens) > 1), column)
+            for position, token in enumerate(tokens[1:], 1):
+                if not len(candidates):
+                    break
+                prefix = position == len(tokens) - 1
+                candidates = np.intersect1d(candidates, self.positions(token, column, prefix), assume_unique=True)
+            return candidates[:np.searchsorted(candidates, len(frame))]
+
+    def tokens_containing(self, word, suffix=False):
+        """Vocabulary tokens containing word (or ending with it, with suffix)"""
+        cached = self.substring_keys.get((word, suffix))
+        if cached is not None:
+            return cached
+        if len(word) >= GRAM_SIZE:
+            sets = sorted((self.grams.get(gram, set()) for gram in trigrams(word)), key=len)
+            pool = sets[0].intersection(*sets[1:])
+        else:
+            pool = self.vocabulary['token']  # too short for trigrams
+        keys = [key for key in pool if (key.endswith(word) if suffix else word in key)]
+        if len(self.substring_keys) >= SUBSTRING_CACHE_SIZE:
+            self.substring_keys.clear()
+        self.substring_keys[(word, suffix)] = keys
+        return keys
+
+    def union(self, keys, column):
+        parts = [self.postings[key][column] for key in keys if column in self.postings[key]]
+        if not parts:
+            return EMPTY
+        return np.unique(np.concatenate([np.array(part, dtype=np.int64) for part in parts]))
+
+    def positions(self, key, column, prefix=False):
+        """Rows whose column holds the token or pair (or one starting with it)"""
+        if not prefix:
+            postings = self.postings.get(key, {}).get(column)
+            return np.array(postings, dtype=np.int64) if postings is not None else EMPTY
+        vocabulary = self.vocabulary['pair' if ' ' in key else 'token']
+        first = bisect.bisect_left(vocabulary, key)
+        last = bisect.bisect_left(vocabulary, key + '\U0010ffff')
+        parts = [self.postings[match][column] for match in vocabulary[first:last]
+                 if column in self.postings[match]]
+        if not parts:
+            return EMPTY
+        if len(parts) == 1:
+            return np.array(parts[0], dtype=np.int64)
+        return np.unique(np.concatenate([np.array(part, dtype=np.int64) for part in parts]))
+
+    def match(self, clause, frame):
+        tokens = clause['tokens']
+        if len(tokens) == 1:
+            keys = tokens
+        else:
+            keys = [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+        matches = []
+        for column in clause['columns']:
+            candidates = None
+            for position, key in enumerate(keys):
+                prefix = clause['prefix'] and position == len(keys) - 1
+                rows = self.positions(key, column, prefix)
+                candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+                if not len(candidates):
+                    break
+            if not len(candidates):
+                continue
+            if len(tokens) > 2:
+                # Every adjacent pair matched; check they line up as one run
+                candidates = candidates[:np.searchsorted(candidates, len(frame))]
+                values = frame[column].take(candidates).astype(object)
+                found = values.str.contains(phrase_pattern(tokens, clause['prefix']), case=False, na=False)
+                candidates = candidates[found.to_numpy()]
+            matches.append(candidates)
+        if not matches:
+            return EMPTY
+        return matches[0] if len(matches) == 1 else np.unique(np.concatenate(matches))
+
+    def stats(self):
+        with self.lock:
+            return {
+                'rows': self.rows,
+                'tokens': len(self.vocabulary['token']),
+                'pairs': len(self.vocabulary['pair']),
+                'generation': self.generation,
+                'builds': self.metrics['builds'],
+                'rows_indexed': self.metrics['rows_indexed'],
+                'searches': self.metrics['searches'],
+                'last_update_ms': round(self.metrics['last_update_seconds'] * 1000, 2)
+                if self.metrics['last_update_seconds'] is not None else None,
+                'last_search_ms': round(self.metrics['last_search_seconds'] * 1000, 3)
+                if self.metrics['last_search_seconds'] is not None else None
+            }
+
+
+def benchmark(rows=200_000, queries=None, repeat=20):
+    """Index build time and median query time vs the substring scan it replaces"""
+    import os
+    import shutil
+    import tempfile
+    from benchmark_data import write_sample_csv
+    from tracking_cache import TrackingFrameCache
+
+    queries = queries or ['admin', 'check*', '"checkout flow"', 'playground-mess-target:guest',
+                          'chat-bubble-1:"career goals"', '"the checkout flow step"', '007123']
+    work_dir = tempfile.mkdtemp(prefix='tracking_search_')
+    try:
+        csv_path = os.path.join(work_dir, 'tracking.csv')
+        write_sample_csv(csv_path, rows)
+        cache = TrackingFrameCache(csv_path, archive_dir=os.path.join(work_dir, 'archive'))
+        frame, generation = cache.get_versioned()
+
+        index = TrackingSearchIndex()
+        started = time.perf_counter()
+        index.update(frame, generation)
+        build = time.perf_counter() - started
+
+        results = []
+        for query in queries:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                matches = index.search(query, frame, generation)
+                timings.append(time.perf_counter() - started)
+            results.append({'query': query, 'matches': len(matches),
+                            'seconds': sorted(timings)[len(timings) // 2]})
+
+        started = time.perf_counter()
+        frame.astype(str).apply(lambda x: x.str.lower().str.contains('admin', na=False)).any(axis=1)
+        scan = time.perf_counter() - started
+        return {'rows': rows, 'tokens': len(index.vocabulary['token']),
+                'pairs': len(index.vocabulary['pair']), 'build_seconds': build,
+                'scan_seconds': scan, 'queries': results}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the tracking full-text index')
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--query', action='append', help='Query to time (repeatable)')
+    args = parser.parse_args()
+
+    print(f"⏱️  Indexing {args.rows:,} synthetic tracking rows...")
+    report = benchmark(args.rows, args.query)
+    print(f"📚 {report['tokens']:,} tokens and {report['pairs']:,} pairs indexed in {report['build_seconds']:.2f}s")
+    print(f"🐢 Substring scan for 'admin': {report['scan_seconds'] * 1000:.1f} ms")
+    for result in report['queries']:
+        print(f"   {result['query']:32s} {result['matches']:8,} rows {result['seconds'] * 1000:8.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Unique-user sketches for the tracking CSV
+
+Keeps HyperLogLog sketches of user IDs per minute/hour/day bucket (by start
+time), updated from the CSV bytes appended since the last catch-up. The write
+path catches up right after appending a row and csv_api catches up before
+answering, so both processes share one checkpoint without re-reading history.
+The checkpoint keeps a fingerprint of the CSV bytes it covers; a CSV that
+shrank or was rewritten in place (e.g. by a migration) is re-read from the
+start.
+Re-adding a user ID to a sketch is a no-op, so overlapping catch-ups from
+different processes never double count.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from analytics_rollups import SKETCH_GRANULARITIES, WINDOWS
+from checkpoint_files import write_json_checkpoint
+from hyperloglog import BucketedSketches, standard_error
+from tracking_archive import iter_csv_records, read_header, source_fingerprint
+from tracking_schema import parse_tracking_time
+
+CSV_PATH = '../public/user_behavior_tracking.csv'
+SKETCH_PATH = 'data/tracking_sketches.json'
+
+
+class TrackingSketches:
+    def __init__(self, csv_path=CSV_PATH, sketch_path=SKETCH_PATH,
+                 checkpoint_every=50, checkpoint_interval=30):
+        self.csv_path = csv_path
+        self.sketch_path = sketch_path
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.lock = threading.Lock()
+        self.reset()
+        self.load()
+
+    def reset(self):
+        self.csv_offset = 0
+        self.fingerprint = None
+        self.users = BucketedSketches(SKETCH_GRANULARITIES)
+        self.pending = 0
+        self.last_checkpoint = time.monotonic()
+
+    def load(self):
+        if not os.path.exists(self.sketch_path):
+            return
+        try:
+            with open(self.sketch_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self.csv_offset = state['csv_offset']
+            # Checkpoints from before fingerprints were kept are rebuilt once
+            self.fingerprint = state.get('fingerprint')
+            self.users = BucketedSketches.from_dict(SKETCH_GRANULARITIES, state['users'])
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable tracking sketches: {e}")
+            self.reset()
+
+    def checkpoint(self):
+        state = {
+            'csv_offset': self.csv_offset,
+            'fingerprint': self.fingerprint,
+            'users': self.users.to_dict(),
+            'saved_at': datetime.now(timezone.utc).isoformat()
+        }
+        write_json_checkpoint(self.sketch_path, state)
+        self.pending = 0
+        self.last_checkpoint = time.monotonic()
+
+    def catch_up(self):
+        """Add user IDs from CSV records written since the last catch-up"""
+        with self.lock:
+            if not os.path.exists(self.csv_path):
+                return
+            file_size = os.path.getsize(self.csv_path)
+            if self.csv_offset and (file_size < self.csv_offset or
+                                    source_fingerprint(self.csv_path, self.csv_offset) != self.fingerprint):
+                # CSV was rewritten (e.g. by a migration); rebuild
+                self.reset()
+            if self.csv_offset == 0:
+                self.csv_offset = read_header(self.csv_path)[1]
+            if file_size == self.csv_offset:
+                return
+
+            with open(self.csv_path, 'rb') as f:
+                f.seek(max(0, file_size - 1))
+                ends_with_newline = f.read(1) == b'\n'
+
+            now = datetime.now(timezone.utc)
+            for row, offset in iter_csv_records(self.csv_path, self.csv_offset):
+                if offset == file_size and not ends_with_newline:
+                    break  # last record is still being written
+                if row:
+                    occurred = parse_tracking_time(row[1] if len(row) > 1 else None) or now
+                    self.users.add(row[0], occurred)
+                    self.pending += 1
+                self.csv_offset = offset
+            self.fingerprint = source_fingerprint(self.csv_path, self.csv_offset)
+
+            due = time.monotonic() - self.last_checkpoint >= self.checkpoint_interval
+            if self.pending >= self.checkpoint_every or (self.pending and due):
+                self.users.prune(now)
+                self.checkpoint()
+
+    def unique_users(self, since=None, until=None):
+        """Estimated distinct user IDs in [since, until)"""
+        self.catch_up()
+        with self.lock:
+            return self.users.estimate(since, until)
+
+    def summary(self):
+        """Unique users overall and for the standard windows"""
+        self.catch_up()
+        with self.lock:
+            now = datetime.now(timezone.utc)
+            return {
+                'unique_users': self.users.estimate(),
+                'unique_users_by_window': {
+                    name: self.users.estimate(now - span, None, now) for name, span in WINDOWS.items()
+                },
+                'unique_users_error': round(standard_error(self.users.precision), 4)
+            }
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Per-column statistics catalog for the tracking CSV
+
+Keeps, for every column, the number of rows and nulls; exact value counts
+until a column has more than MAX_EXACT_VALUES distinct values, after which
+its counts become a Space-Saving top-K summary; and min/max of the parsed
+start/end times. It also counts rows with any chat message, and keeps
+bounded-memory top-K sketches, overall and per day (for SKETCH_RETENTION),
+for the columns people rank (targets, descriptions, timelines), so their
+top values come with error bounds instead of an exact count per distinct
+value.
+
+Like the unique-user sketches it is updated from the CSV bytes appended
+since the last catch-up: the write path catches up right after appending a
+row, readers catch up before answering, and the state is checkpointed to
+data/tracking_stats.json. A CSV that shrank or whose bytes before the
+checkpoint changed is treated as rewritten and rebuilt.
+
+    python tracking_stats.py show      # catalog as JSON
+    python tracking_stats.py rebuild   # recompute from scratch and save
+    python tracking_stats.py check     # compare against a full recompute
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from checkpoint_files import write_json_checkpoint
+from heavy_hitters import BucketedTopK, SpaceSaving
+from tracking_archive import iter_csv_records, normalize_row, read_header, source_fingerprint
+from tracking_schema import parse_tracking_time
+
+CSV_PATH = '../public/user_behavior_tracking.csv'
+STATS_PATH = 'data/tracking_stats.json'
+
+TIME_COLUMNS = ('start-time', 'end-time')
+
+# A column with more distinct values than this switches from exact counts to
+# a Space-Saving summary of OVERFLOW_CAPACITY values
+MAX_EXACT_VALUES = 1000
+OVERFLOW_CAPACITY = 256
+
+# Checkpoints saved with a different layout are rebuilt
+STATS_VERSION = 2
+
+# Columns with top-K sketches (Space-Saving + Count-Min), bucketed by start day
+SKETCHED_COLUMNS = ('playground-mess-target', 'playground-mess-description', 'playground-mess-timeline')
+SKETCH_BUCKET_FORMAT = '%Y-%m-%d'
+SKETCH_RETENTION = timedelta(days=400)
+
+# Rows with a value in at least one of the group's columns
+ROW_GROUPS = {
+    'chat': ('chat-bubble-1', 'chat-bubble-2', 'chat-bubble-3', 'chat-bubble-4', 'chat-bubble-free')
+}
+
+
+def empty_column(column):
+    stats = {'rows': 0, 'nulls': 0, 'value_counts': {}, 'overflowed': False}
+    if column in TIME_COLUMNS:
+        stats.update({'min': None, 'max': None, 'unparsed': 0})
+    return stats
+
+
+class ColumnStatsCatalog:
+    def __init__(self, csv_path=CSV_PATH, stats_path=STATS_PATH,
+                 checkpoint_every=50, checkpoint_interval=30):
+        self.csv_path = csv_path
+        self.stats_path = stats_path
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.lock = threading.Lock()
+        self.reset()
+        if stats_path:
+            self.load()
+
+    def reset(self):
+        self.csv_offset = 0
+        self.fingerprint = None
+        self.columns = []
+        self.stats = {}
+        self.sketches = {}
+        self.overflow = {}  # column -> SpaceSaving once value_counts overflowed
+        self.groups = {group: 0 for group in ROW_GROUPS}
+        self.rows = 0
+        self.pending = 0
+        self.last_checkpoint = time.monotonic()
+
+    def load(self):
+        if not os.path.exists(self.stats_path):
+            return
+        try:
+            with open(self.stats_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') != STATS_VERSION:
+                # Saved when only some columns kept value counts; recount from scratch
+                print("ℹ️  Column stats checkpoint is from an older layout, rebuilding")
+                return
+            self.csv_offset = state['csv_offset']
+            self.fingerprint = state['fingerprint']
+            self.columns = state['columns']
+            self.rows = state['rows']
+            self.groups = state['groups']
+            self.stats = state['stats']
+            self.sketches = {column: BucketedTopK.from_dict(data) for column, data in state['sketches'].items()}
+            self.overflow = {column: SpaceSaving.from_dict(data) for column, data in state['overflow'].items()}
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable column stats: {e}")
+            self.reset()
+
+    def checkpoint(self):
+        if not self.stats_path:
+            return
+        state = {
+            'csv_offset': self.csv_offset,
+            'fingerprint': self.fingerprint,
+            'columns': self.columns,
+            'version': STATS_VERSION,
+            'rows': self.rows,
+            'groups': self.groups,
+            'stats': self.stats,
+            'sketches': {column: sketch.to_dict() for column, sketch in self.sketches.items()},
+            'overflow': {column: summary.to_dict() for column, summary in self.overflow.items()},
+            'saved_at': datetime.now(timezone.utc).isoformat()
+        }
+        write_json_checkpoint(self.stats_path, state)
+        self.pending = 0
+        self.last_checkpoint = time.monotonic()
+
+    def add_row(self, row):
+        values = normalize_row(row, len(self.columns))
+        self.rows += 1
+        started = None
+        if self.sketches and 'start-time' in self.columns:
+            started = parse_tracking_time(values[self.columns.index('start-time')])
+        present = {column for column, value in zip(self.columns, values) if value is not None}
+        for group, columns in ROW_GROUPS.items():
+            if not present.isdisjoint(columns):
+                self.groups[group] += 1
+        for column, value in zip(self.columns, values):
+            stats = self.stats[column]
+            stats['rows'] += 1
+            if value is None:
+                stats['nulls'] += 1
+                continue
+            counts = stats['value_counts']
+            if counts is not None:
+                counts[value] = counts.get(value, 0) + 1
+                if len(counts) > MAX_EXACT_VALUES:
+                    # High-cardinality column: keep its heaviest values in bounded memory
+                    self.overflow[column] = SpaceSaving.from_counts(counts, OVERFLOW_CAPACITY)
+                    stats['value_counts'] = None
+                    stats['overflowed'] = True
+            else:
+                self.overflow[column].add(value)
+            sketch = self.sketches.get(column)
+            if sketch is not None:
+                sketch.add(value, started)
+            if column in TIME_COLUMNS:
+                parsed = started if column == 'start-time' and self.sketches else parse_tracking_time(value)
+                if parsed is None:
+                    stats['unparsed'] += 1
+                    continue
+                # ISO-8601 UTC strings compare in time order
+                iso = parsed.isoformat()
+                if stats['min'] is None or iso < stats['min']:
+                    stats['min'] = iso
+                if stats['max'] is None or iso > stats['max']:
+                    stats['max'] = iso
+
+    def catch_up(self):
+        """Fold CSV records written since the last catch-up into the catalog"""
+        with self.lock:
+            if not os.path.exists(self.csv_path):
+                return
+            file_size = os.path.getsize(self.csv_path)
+            if self.csv_offset and (file_size < self.csv_offset or
+                                    source_fingerprint(self.csv_path, self.csv_offset) != self.fingerprint):
+                # CSV was rewritten (e.g. by a migration); rebuild
+                self.reset()
+            if self.csv_offset == 0:
+                self.columns, self.csv_offset = read_header(self.csv_path)
+                self.stats = {column: empty_column(column) for column in self.columns}
+                self.sketches = {column: BucketedTopK(SKETCH_BUCKET_FORMAT)
+                                 for column in self.columns if column in SKETCHED_COLUMNS}
+            if file_size == self.csv_offset:
+                return
+
+            with open(self.csv_path, 'rb') as f:
+                f.seek(max(0, file_size - 1))
+                ends_with_newline = f.read(1) == b'\n'
+
+            for row, offset in iter_csv_records(self.csv_path, self.csv_offset):
+                if offset == file_size and not ends_with_newline:
+                    break  # last record is still being written
+                if row:
+                    self.add_row(row)
+                    self.pending += 1
+                self.csv_offset = offset
+            self.fingerprint = source_fingerprint(self.csv_path, self.csv_offset)
+
+            due = time.monotonic() - self.last_checkpoint >= self.checkpoint_interval
+            if self.pending >= self.checkpoint_every or (self.pending and due):
+                before = datetime.now(timezone.utc) - SKETCH_RETENTION
+                for sketch in self.sketches.values():
+                    sketch.prune(before)
+                self.checkpoint()
+
+    def column(self, column):
+        """Stats for one column (None if unknown), sorted value counts included"""
+        self.catch_up()
+        with self.lock:
+            if column not in self.stats:
+                return None
+            stats = dict(self.stats[column])
+            if stats.get('value_counts') is not None:
+                stats['value_counts'] = dict(sorted(stats['value_counts'].items(), key=lambda item: -item[1]))
+            return stats
+
+    def top(self, column, limit=10, since=None, until=None):
+        """Approximate top values of a sketched or overflowed column (None otherwise)
+
+        since/until select whole start-time days of a sketched column; an
+        overflowed column only has all-time counts. Each value carries its
+        overcount bound and whether its place in the ranking is certain.
+        """
+        self.catch_up()
+        with self.lock:
+            sketch = self.sketches.get(column)
+            if sketch is not None:
+                return sketch.top(limit, since, until)
+            summary = self.overflow.get(column)
+            return None if summary is None else summary.ranked(limit)
+
+    def estimate(self, column, value):
+        """Count-Min estimate of how often value occurs in a sketched column"""
+        self.catch_up()
+        with self.lock:
+            sketch = self.sketches.get(column)
+            return None if sketch is None else sketch.estimate(value)
+
+    def summary(self):
+        """Row count, per-column nulls and the time range"""
+        self.catch_up()
+        with self.lock:
+            start = self.stats.get('start-time', {})
+            return {
+                'rows': self.rows,
+                'columns': list(self.columns),
+                'null_counts': {column: stats['nulls'] for column, stats in self.stats.items()},
+                'row_groups': dict(self.groups),
+                'date_range': {'earliest': start.get('min'), 'latest': start.get('max')}
+            }
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'rows': self.rows,
+                'columns': list(self.columns),
+                'groups': dict(self.groups),
+                'stats': json.loads(json.dumps(self.stats)),
+                'top_values': {column: sketch.top(10)['values'] for column, sketch in self.sketches.items()} |
+                              {column: summary.ranked(10)['values'] for column, summary in self.overflow.items()}
+            }
+
+
+def rebuild(csv_path=CSV_PATH, stats_path=STATS_PATH):
+    """Recompute the catalog from the whole CSV and save it"""
+    catalog = ColumnStatsCatalog(csv_path, stats_path=None)
+    catalog.catch_up()
+    catalog.stats_path = stats_path
+    catalog.checkpoint()
+    return catalog
+
+
+def check(csv_path=CSV_PATH, stats_path=STATS_PATH):
+    """Differences between the maintained catalog and a full recompute"""
+    maintained = ColumnStatsCatalog(csv_path, stats_path)
+    maintained.catch_up()
+    fresh = ColumnStatsCatalog(csv_path, stats_path=None)
+    fresh.catch_up()
+
+    expected, actual = fresh.snapshot(), maintained.snapshot()
+    problems = []
+    if expected['rows'] != actual['rows']:
+        problems.append(f"rows: catalog {actual['rows']}, recomputed {expected['rows']}")
+    if expected['groups'] != actual['groups']:
+        problems.append(f"row groups: catalog {actual['groups']}, recomputed {expected['groups']}")
+    for column, stats in expected['stats'].items():
+        kept = actual['stats'].get(column)
+        if kept is None:
+            problems.append(f"{column}: missing from catalog")
+            continue
+        for key, value in stats.items():
+            if kept.get(key) != value:
+                if key == 'value_counts' and value and kept.get(key):
+                    differing = sorted(k for k in set(value) | set(kept[key]) if value.get(k) != kept[key].get(k))
+                    problems.append(f"{column}.value_counts differ for {len(differing)} values, e.g. {differing[:3]}")
+                else:
+                    problems.append(f"{column}.{key}: catalog {kept.get(key)!r}, recomputed {value!r}")
+    for column, top_values in expected['top_values'].items():
+        if actual['top_values'].get(column) != top_values:
+            problems.append(f"{column}: top-K sketch differs from a recompute")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the tracking column statistics catalog')
+    parser.add_argument('command', choices=['show', 'rebuild', 'check'])
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--stats', default=STATS_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'rebuild':
+        started = time.perf_counter()
+        catalog = rebuild(args.csv, args.stats)
+        print(f"✅ Rebuilt stats for {catalog.rows:,} rows in {time.perf_counter() - started:.2f}s")
+    elif args.command == 'check':
+        problems = check(args.csv, args.stats)
+        if problems:
+            print(f"❌ {len(problems)} differences from a full recompute:")
+            for problem in problems:
+                print(f"   {problem}")
+            print("   Run 'python tracking_stats.py rebuild' to fix")
+            sys.exit(1)
+        print("✅ Column stats match a full recompute")
+    else:
+        catalog = ColumnStatsCatalog(args.csv, args.stats)
+        catalog.catch_up()
+        print(json.dumps(catalog.snapshot(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
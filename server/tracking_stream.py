@@ -0,0 +1,109 @@
+"""
+Streaming responses for tracking rows
+
+Rows are produced in small batches, either from the cached frame (by row
+position) or straight from the CSV file, and encoded as they go:
+
+- ndjson: one JSON object per line (application/x-ndjson)
+- csv: a header line, then chunked CSV rows
+- json: a JSON array written element by element
+
+Only one batch is held in memory at a time, so memory stays flat whatever
+the result size and the first bytes go out as soon as the first batch is
+encoded.
+"""
+
+import csv
+import io
+import json
+import numpy as np
+from flask import Response, stream_with_context
+from tracking_archive import iter_csv_records
+
+STREAM_FORMATS = ('ndjson', 'csv', 'json')
+CHUNK_ROWS = 1000
+
+MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'json': 'application/json'
+}
+
+
+def frame_batches(frame, positions=None, columns=None, chunk_rows=CHUNK_ROWS):
+    """Yield lists of row dicts from frame (nulls as None), chunk_rows at a time"""
+    if positions is None:
+        positions = np.arange(len(frame))
+    for start in range(0, len(positions), chunk_rows):
+        chunk = frame.iloc[positions[start:start + chunk_rows]]
+        if columns is not None:
+            chunk = chunk[columns]
+        chunk = chunk.astype(object)
+        yield chunk.where(chunk.notna(), None).to_dict('records')
+
+
+def csv_batches(csv_path, chunk_rows=CHUNK_ROWS):
+    """Yield lists of row dicts read from the CSV file, keyed by its header"""
+    records = iter_csv_records(csv_path)
+    header = next(records, (None, 0))[0]
+    if not header:
+        return
+    batch = []
+    for row, _ in records:
+        if not row:
+            continue
+        values = row[:len(header)] + [None] * (len(header) - len(row))
+        batch.append(dict(zip(header, values)))
+        if len(batch) >= chunk_rows:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def encode_ndjson(batches):
+    for batch in batches:
+        yield ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in batch)
+
+
+def encode_json_array(batches):
+    yield '['
+    first = True
+    for batch in batches:
+        if not batch:
+            continue
+        text = ','.join(json.dumps(record, ensure_ascii=False) for record in batch)
+        yield text if first else ',' + text
+        first = False
+    yield ']'
+
+
+def encode_csv(batches, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        for record in batch:
+            writer.writerow(['' if record.get(column) is None else record[column] for column in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_records(batches, format, columns, filename=None, headers=None):
+    """Flask streaming Response encoding the batches in the given format"""
+    if format == 'ndjson':
+        body = encode_ndjson(batches)
+    elif format == 'csv':
+        body = encode_csv(batches, columns)
+    elif format == 'json':
+        body = encode_json_array(batches)
+    else:
+        raise ValueError(f"Unsupported stream format {format!r}; use one of {', '.join(STREAM_FORMATS)}")
+
+    headers = dict(headers or {})
+    if filename:
+        headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return Response(stream_with_context(body), mimetype=MIMETYPES[format], headers=headers)
@@ -3,11 +3,27 @@
 Terminal-based CSV viewer for user tracking data
 """
 
+import argparse
 import csv
 import os
 import sys
 from datetime import datetime
-import pandas as pd
+from tracking_archive import tracking_columns
+from tracking_cache import TrackingFrameCache
+from tracking_schema import parse_tracking_times
+from tracking_search import TrackingSearchIndex
+from tracking_stats import ColumnStatsCatalog
+
+CSV_PATH = '../public/user_behavior_tracking.csv'
+
+# Kept across menu actions; only rows appended since the last action are parsed
+frame_cache = TrackingFrameCache(CSV_PATH)
+search_index = TrackingSearchIndex()
+
+# Top-K sketches for targets and timelines; --exact counts every value instead
+column_stats = ColumnStatsCatalog(CSV_PATH)
+EXACT_COUNTS = False
+TOP_VALUES = 20
 
 def print_header():
     """Print application header"""
@@ -37,19 +53,23 @@ def view_statistics():
     print("-" * 40)
     
     try:
-        df = pd.read_csv('../public/user_behavior_tracking.csv')
+        columns = tracking_columns(CSV_PATH)
+        needed = [column for column in ('user-id', 'playground-mess-target', 'start-time') if column in columns]
+        df = frame_cache.get(needed or columns[:1])
         
         print(f"📁 Total Records: {len(df):,}")
-        print(f"📊 Total Columns: {len(df.columns)}")
+        print(f"📊 Total Columns: {len(columns)}")
         print(f"👥 Unique Users: {df['user-id'].nunique() if 'user-id' in df.columns else 'N/A'}")
         print(f"🎯 Unique Targets: {df['playground-mess-target'].nunique() if 'playground-mess-target' in df.columns else 'N/A'}")
         
         if 'start-time' in df.columns:
-            print(f"📅 Date Range:")
-            print(f"   Earliest: {df['start-time'].min()}")
-            print(f"   Latest: {df['start-time'].max()}")
+            start_times = parse_tracking_times(df['start-time']).dropna()
+            if len(start_times):
+                print(f"📅 Date Range:")
+                print(f"   Earliest: {start_times.min().isoformat()}")
+                print(f"   Latest: {start_times.max().isoformat()}")
         
-        print(f"💾 File Size: {os.path.getsize('../public/user_behavior_tracking.csv') / 1024:.2f} KB")
+        print(f"💾 File Size: {os.path.getsize(CSV_PATH) / 1024:.2f} KB")
         
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -60,7 +80,7 @@ def view_all_data():
     print("-" * 40)
     
     try:
-        df = pd.read_csv('../public/user_behavior_tracking.csv')
+        df = frame_cache.get()
         
         page = 1
         per_page = 10
@@ -104,16 +124,16 @@ def search_data():
     print("-" * 40)
     
     try:
-        df = pd.read_csv('../public/user_behavior_tracking.csv')
+        df, generation = frame_cache.get_versioned()
         
+        print("💡 Words match whole tokens; use check* for prefixes, \"quotes\" for phrases, column:term")
         search_term = input("Enter search term: ").strip()
         if not search_term:
             print("❌ No search term provided")
             return
         
         # Search across all columns
-        mask = df.astype(str).apply(lambda x: x.str.lower().str.contains(search_term.lower(), na=False)).any(axis=1)
-        results = df[mask]
+        results = df.iloc[search_index.search(search_term, df, generation)]
         
         print(f"\n🔍 Search Results for '{search_term}': {len(results)} records found")
         print("-" * 60)
@@ -138,7 +158,7 @@ def view_recent_records():
     print("-" * 40)
     
     try:
-        df = pd.read_csv('../public/user_behavior_tracking.csv')
+        df = frame_cache.get()
         
         limit = input("How many recent records? (default 10): ").strip()
         limit = int(limit) if limit.isdigit() else 10
@@ -161,34 +181,54 @@ def view_recent_records():
     except Exception as e:
         print(f"❌ Error: {e}")
 
+def print_distribution(column, label):
+    """Print a column's value distribution; returns the number of values listed"""
+    if EXACT_COUNTS:
+        series = frame_cache.get([column])[column]
+        counts = series.value_counts()
+        for value, count in counts.items():
+            if value != 'null':
+                print(f"  {value}: {count} records ({count / len(series) * 100:.1f}%)")
+        return len(counts)
+    
+    rows = column_stats.summary()['rows']
+    top = column_stats.top(column, TOP_VALUES)
+    for item in top['values']:
+        if item['value'] == 'null':
+            continue
+        percentage = item['count'] / rows * 100 if rows else 0
+        bound = f" ±{item['error']}" if item['error'] else ""
+        print(f"  {item['value']}: {item['count']}{bound} records ({percentage:.1f}%)")
+    if top['max_error']:
+        print(f"\n  ℹ️  Approximate top {TOP_VALUES} {label}: any value not listed has at most "
+              f"{top['max_error']} records (run with --exact for exact counts)")
+    return len(top['values'])
+
 def analyze_by_target():
     """Analyze data by target"""
     print("\n👥 Analysis by Target")
     print("-" * 40)
     
     try:
-        df = pd.read_csv('../public/user_behavior_tracking.csv')
-        
-        if 'playground-mess-target' not in df.columns:
+        columns = tracking_columns(CSV_PATH)
+        if 'playground-mess-target' not in columns:
             print("❌ Target column not found")
             return
         
-        target_counts = df['playground-mess-target'].value_counts()
-        
         print("🎯 Target Distribution:")
         print("-" * 40)
         
-        for target, count in target_counts.items():
-            percentage = (count / len(df)) * 100
-            print(f"  {target}: {count} records ({percentage:.1f}%)")
+        listed = print_distribution('playground-mess-target', 'targets')
         
-        print(f"\n📊 Total unique targets: {len(target_counts)}")
+        print(f"\n📊 {'Total unique' if EXACT_COUNTS else 'Top'} targets: {listed}")
         
         # Show details for a specific target
         print("\n🔍 View details for specific target:")
         target_choice = input("Enter target name (or press Enter to skip): ").strip()
         
         if target_choice:
+            needed = [column for column in ('playground-mess-target', 'playground-mess-description', 'start-time') if column in columns]
+            df = frame_cache.get(needed)
             target_data = df[df['playground-mess-target'] == target_choice]
             if len(target_data) > 0:
                 print(f"\n📋 Details for '{target_choice}':")
@@ -207,23 +247,16 @@ def timeline_analysis():
     print("-" * 40)
     
     try:
-        df = pd.read_csv('../public/user_behavior_tracking.csv')
-        
-        if 'playground-mess-timeline' not in df.columns:
+        if 'playground-mess-timeline' not in tracking_columns(CSV_PATH):
             print("❌ Timeline column not found")
             return
         
-        timeline_counts = df['playground-mess-timeline'].value_counts()
-        
         print("⏰ Timeline Distribution:")
         print("-" * 40)
         
-        for timeline, count in timeline_counts.items():
-            if pd.notna(timeline) and timeline != 'null':
-                percentage = (count / len(df)) * 100
-                print(f"  {timeline}: {count} records ({percentage:.1f}%)")
+        listed = print_distribution('playground-mess-timeline', 'timelines')
         
-        print(f"\n📊 Total timeline records: {len(timeline_counts)}")
+        print(f"\n📊 Total timeline records: {listed}")
         
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -234,9 +267,9 @@ def chat_interactions_summary():
     print("-" * 40)
     
     try:
-        df = pd.read_csv('../public/user_behavior_tracking.csv')
-        
         chat_columns = ['chat-bubble-1', 'chat-bubble-2', 'chat-bubble-3', 'chat-bubble-4', 'chat-bubble-free']
+        available = tracking_columns(CSV_PATH)
+        df = frame_cache.get([col for col in chat_columns if col in available] or available[:1])
         
         total_interactions = 0
         for col in chat_columns:
@@ -269,7 +302,7 @@ def export_filtered_data():
     print("-" * 40)
     
     try:
-        df = pd.read_csv('../public/user_behavior_tracking.csv')
+        df, generation = frame_cache.get_versioned()
         
         print("🔍 Apply filters:")
         search_term = input("Search term (or press Enter to skip): ").strip()
@@ -277,8 +310,7 @@ def export_filtered_data():
         filtered_df = df.copy()
         
         if search_term:
-            mask = df.astype(str).apply(lambda x: x.str.lower().str.contains(search_term.lower(), na=False)).any(axis=1)
-            filtered_df = df[mask]
+            filtered_df = df.iloc[search_index.search(search_term, df, generation)]
             print(f"📊 Filtered to {len(filtered_df)} records")
         
         if len(filtered_df) > 0:
@@ -296,7 +328,12 @@ def export_filtered_data():
 
 def main():
     """Main application loop"""
-    csv_path = '../public/user_behavior_tracking.csv'
+    global EXACT_COUNTS
+    parser = argparse.ArgumentParser(description='Browse the user tracking CSV')
+    parser.add_argument('--exact', action='store_true',
+                        help='Count every target/timeline value instead of using top-K sketches')
+    EXACT_COUNTS = parser.parse_args().exact
+    csv_path = CSV_PATH
     
     if not os.path.exists(csv_path):
         print("❌ CSV file not found at:", csv_path)
@@ -331,7 +368,13 @@ def main():
             export_filtered_data()
         elif choice == '9':
             print("\n🔄 Refreshing data...")
-            print("✅ Data refreshed!")
+            try:
+                df = frame_cache.get()
+                stats = frame_cache.stats()
+                print(f"✅ Data refreshed! {len(df):,} records ({stats['last_load_ms']} ms last load, "
+                      f"{stats['rows_appended']:,} rows appended incrementally)")
+            except Exception as e:
+                print(f"❌ Error: {e}")
         else:
             print("❌ Invalid choice. Please try again.")
         